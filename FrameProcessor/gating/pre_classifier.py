@@ -0,0 +1,219 @@
+import os
+import json
+import random
+import threading
+import numpy as np
+from typing import List, Dict, Any, Optional, Tuple
+from config.paths import PRE_CLASSIFIER_FILE
+from checkpoint.manifest import is_complete
+
+# Frame features used by the classifier, in the order of its coefficients
+FEATURE_NAMES = ["contrast", "brightness", "dark_ratio", "color_variance", "blur", "text_density", "face_count"]
+
+# Heavy-tailed features are compared on a log scale
+_LOG_FEATURES = {"color_variance", "blur"}
+
+# Reasons of results that were not decided by the LLM, so they are not usable as labels
+_LOCAL_REASONS = ("Frame is mostly black", "Could not properly analyze frame", "Pre-classifier")
+
+def feature_vector(frame_features: Dict[str, Any]) -> np.ndarray:
+    """Turn the `frame_features` of a frame into the classifier's input vector."""
+    values = [float(frame_features.get(name, 0) or 0) for name in FEATURE_NAMES]
+    return np.array([np.log1p(max(v, 0.0)) if name in _LOG_FEATURES else v for name, v in zip(FEATURE_NAMES, values)])
+
+class PreClassifier:
+    """Logistic regression over cheap frame features that decides clear-cut frames without the LLM.
+
+    A frame is decided locally when the predicted probability of being important is at least
+    `confidence` ("important") or at most `1 - confidence` ("not_important"); every other frame
+    is sent to the LLM. With `audit_rate` > 0, that share of locally decided frames is still sent
+    to the LLM and the answers are compared, to track how often the two disagree.
+    """
+
+    def __init__(self, mean: List[float], scale: List[float], coef: List[float], intercept: float,
+                 confidence: float = 0.95, audit_rate: float = 0.0, calibration: Optional[Dict[str, Any]] = None):
+        self.mean = np.asarray(mean, dtype=float)
+        self.scale = np.asarray(scale, dtype=float)
+        self.coef = np.asarray(coef, dtype=float)
+        self.intercept = float(intercept)
+        self.confidence = confidence
+        self.audit_rate = audit_rate
+        self.calibration = calibration or {}
+
+        self._lock = threading.Lock()
+        self.evaluated = 0
+        self.decided = 0
+        self.audited = 0
+        self.disagreements = 0
+
+    def probability(self, frame_features: Dict[str, Any]) -> float:
+        """Return the predicted probability that a frame is important."""
+        z = (feature_vector(frame_features) - self.mean) / self.scale
+        return float(1.0 / (1.0 + np.exp(-(z @ self.coef + self.intercept))))
+
+    def decide(self, frame_features: Dict[str, Any]) -> Optional[Tuple[str, float]]:
+        """Return (importance, probability) if the frame is clear-cut, otherwise None."""
+        p = self.probability(frame_features)
+        label = "important" if p >= self.confidence else "not_important" if p <= 1 - self.confidence else None
+
+        with self._lock:
+            self.evaluated += 1
+            if label is not None:
+                self.decided += 1
+        return (label, p) if label is not None else None
+
+    def should_audit(self) -> bool:
+        """Return True if a locally decided frame should be checked against the LLM."""
+        return self.audit_rate > 0 and random.random() < self.audit_rate
+
+    def record_audit(self, local_label: str, llm_label: str):
+        """Count an audited frame; audited frames cost an LLM call, so they are not counted as saved."""
+        with self._lock:
+            self.decided -= 1
+            self.audited += 1
+            if local_label != llm_label:
+                self.disagreements += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Return how many LLM calls were saved and how often audits disagreed with the LLM."""
+        with self._lock:
+            return {
+                "evaluated": self.evaluated,
+                "calls_saved": self.decided,
+                "saved_rate": self.decided / self.evaluated if self.evaluated else 0.0,
+                "audited": self.audited,
+                "disagreements": self.disagreements,
+                "disagreement_rate": self.disagreements / self.audited if self.audited else None,
+                "calibrated_disagreement_rate": self.calibration.get("disagreement_rate"),
+            }
+
+    @classmethod
+    def fit(cls, features: List[Dict[str, Any]], labels: List[str], confidence: float = 0.95, folds: int = 5) -> "PreClassifier":
+        """Fit the classifier on frames labelled by the LLM.
+
+        The calibration report is computed from cross-validated predictions, so it estimates how
+        the classifier behaves on frames it has not seen.
+        """
+        from sklearn.linear_model import LogisticRegression
+        from sklearn.model_selection import StratifiedKFold, cross_val_predict
+        from sklearn.pipeline import make_pipeline
+        from sklearn.preprocessing import StandardScaler
+
+        X = np.stack([feature_vector(f) for f in features])
+        y = np.array([label == "important" for label in labels], dtype=int)
+
+        smallest = min(np.bincount(y, minlength=2))
+        if smallest < 2:
+            raise ValueError("Calibration needs at least two important and two not_important frames")
+
+        model = make_pipeline(StandardScaler(), LogisticRegression(class_weight="balanced", max_iter=1000))
+        cv = StratifiedKFold(n_splits=min(folds, smallest), shuffle=True, random_state=0)
+        held_out = cross_val_predict(model, X, y, cv=cv, method="predict_proba")[:, 1]
+        model.fit(X, y)
+
+        scaler, regression = model[0], model[1]
+        calibration = {
+            "frames": int(len(y)),
+            "important": int(y.sum()),
+            **_coverage(held_out, y, confidence),
+            "by_confidence": {str(c): _coverage(held_out, y, c) for c in (0.8, 0.9, 0.95, 0.99)},
+        }
+        return cls(scaler.mean_.tolist(), scaler.scale_.tolist(), regression.coef_[0].tolist(),
+                   float(regression.intercept_[0]), confidence=confidence, calibration=calibration)
+
+    def save(self, path: str = PRE_CLASSIFIER_FILE):
+        """Write the coefficients and the calibration report to a JSON file."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "features": FEATURE_NAMES,
+                "mean": self.mean.tolist(),
+                "scale": self.scale.tolist(),
+                "coef": self.coef.tolist(),
+                "intercept": self.intercept,
+                "confidence": self.confidence,
+                "calibration": self.calibration,
+            }, f, indent=2)
+
+    @classmethod
+    def load(cls, path: str = PRE_CLASSIFIER_FILE, confidence: Optional[float] = None, audit_rate: float = 0.0) -> "PreClassifier":
+        """Load a classifier saved by `save`; `confidence` overrides the calibrated threshold."""
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+
+        if data.get("features") != FEATURE_NAMES:
+            raise ValueError(f"{path} was calibrated on different features; recalibrate it")
+
+        return cls(data["mean"], data["scale"], data["coef"], data["intercept"],
+                   confidence=confidence if confidence is not None else data.get("confidence", 0.95),
+                   audit_rate=audit_rate, calibration=data.get("calibration"))
+
+def _coverage(probabilities: np.ndarray, y: np.ndarray, confidence: float) -> Dict[str, float]:
+    """Share of frames decided locally at `confidence`, and how often those decisions differ from the labels."""
+    important = probabilities >= confidence
+    decided = important | (probabilities <= 1 - confidence)
+    disagreements = np.count_nonzero(important[decided] != y[decided].astype(bool))
+    return {
+        "confidence": confidence,
+        "decided_rate": float(decided.mean()),
+        "disagreement_rate": float(disagreements / decided.sum()) if decided.any() else 0.0,
+    }
+
+def load_labelled_frames(results_paths: List[str]) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """Collect (frame_features, importance) pairs from recorded results files (JSONL, Parquet, Arrow or JSON).
+
+    Only frames classified by the LLM are used; failed evaluations, which default to
+    "not_important", are skipped. Features are measured from each frame's saved keyframe image
+    (results of older runs may carry them already); frames whose image is gone are skipped.
+    """
+    import cv2
+    from FrameProcessor.graph.steps.extract_features import compute_frame_features
+    from FrameProcessor.utils.result_sinks import read_results
+
+    features, labels = [], []
+    for results_path in results_paths:
+        for result in read_results(results_path):
+            if not is_complete(result) or str(result.get("reason", "")).startswith(_LOCAL_REASONS):
+                continue
+
+            frame_features = result.get("frame_features")
+            if not frame_features:
+                img = cv2.imread(result.get("path", ""))
+                if img is None:
+                    continue
+                frame_features = compute_frame_features(img)
+
+            features.append(frame_features)
+            labels.append(result["importance"])
+
+    return features, labels
+
+_active = None
+
+def configure(classifier: Optional[PreClassifier]):
+    """Set the classifier used by `evaluate_importance`; None sends every frame to the LLM."""
+    global _active
+    _active = classifier
+
+def get_pre_classifier() -> Optional[PreClassifier]:
+    """Return the configured classifier, or None."""
+    return _active
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Calibrate the local pre-classifier on recorded LLM labels.")
+    parser.add_argument("results", nargs="+", help="Results files (e.g. results.jsonl) written by earlier runs.")
+    parser.add_argument("--confidence", type=float, default=0.95,
+                        help="Probability needed to decide a frame without the LLM.")
+    parser.add_argument("--output", default=PRE_CLASSIFIER_FILE, help="Where the calibrated classifier is written.")
+    args = parser.parse_args()
+
+    features, labels = load_labelled_frames(args.results)
+    classifier = PreClassifier.fit(features, labels, confidence=args.confidence)
+    classifier.save(args.output)
+
+    print(f"Calibrated on {len(labels)} frames, saved to {args.output}")
+    for confidence, report in classifier.calibration["by_confidence"].items():
+        print(f"  confidence {confidence}: decides {report['decided_rate']:.0%} of frames locally, "
+              f"disagrees with the LLM on {report['disagreement_rate']:.1%} of those")
@@ -0,0 +1,78 @@
+# graph/steps/classify_and_describe.py
+
+from langchain_core.messages import HumanMessage, SystemMessage
+from llm.client import invoke_model
+from langgraph.graph import END
+from types_.state import GraphState
+from tracing.tracer import traced, one_frame
+from FrameProcessor.graph.steps.evaluate_importance import IMPORTANCE_CRITERIA, _precheck, _record_audit, _image_part, is_labelled_json, label_from_text, parse_json_answer
+
+CLASSIFY_AND_DESCRIBE_PROMPT = IMPORTANCE_CRITERIA + """
+If the frame is important, also extract and analyze its text and informative visual elements:
+- Extract all textual content.
+- If text is in Arabic, copy it in Arabic and provide an English translation in quotes immediately after the Arabic text.
+- If text is entirely in English, copy it as is.
+- If text is primarily Arabic with some English words, copy the Arabic text and place the English words in quotes within the Arabic text.
+- Identify any informative visual elements that convey data or information, such as charts, diagrams, text tables, histograms, flowcharts, illustrations, or other visual representations of data.
+- Do not describe the general image design, background, or purely decorative elements.
+- Translate the visual description to Arabic if needed.
+
+Return a JSON containing:
+{
+  "importance": "important" or "not_important",
+  "reason": "reason for your classification",
+  "extracted_text": "copied text with translations, or an empty string if not important",
+  "visual_description": "description in Arabic of any informative visuals, or an empty string if not important"
+}
+"""
+
+@traced(counts=one_frame)
+def classify_and_describe(state: GraphState) -> GraphState:
+    """Use a single LLM call to classify the frame and, if important, describe it."""
+
+    if _precheck(state):
+        # Frames decided locally as important still need their description
+        return state
+
+    file_name = state["frame_data"]["file_name"]
+    try:
+        messages = [
+            SystemMessage(content=CLASSIFY_AND_DESCRIBE_PROMPT),
+            HumanMessage(
+                content=[
+                    {"type": "text", "text": "Evaluate the importance of this video frame and describe it if it is important."},
+                    _image_part(state)
+                ]
+            )
+        ]
+
+        response = invoke_model(messages, validate=is_labelled_json)
+        output_text = response.content.strip()
+
+        result = parse_json_answer(output_text)
+        if result is not None:
+            state["importance"] = result.get("importance", "not_important")
+            state["reason"] = result.get("reason", "No reason provided")
+            state["next_step"] = END
+
+            if state["importance"] == "important":
+                state["description"] = {
+                    "image_name": file_name,
+                    "extracted_text": result.get("extracted_text") or "No text found",
+                    "visual_description": result.get("visual_description") or "No visual description",
+                    "raw_output": output_text
+                }
+        else:
+            state["importance"] = label_from_text(output_text)
+            state["reason"] = output_text
+            # No structured answer, so the description is requested separately
+            state["next_step"] = "describe_frame" if state["importance"] == "important" else END
+
+    except Exception as e:
+        print(f"Error classifying and describing frame: {str(e)}")
+        state["importance"] = "not_important"
+        state["reason"] = f"Failed to evaluate: {str(e)}"
+        state["next_step"] = END
+
+    _record_audit(state)
+    return state
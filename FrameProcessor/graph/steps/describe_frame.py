@@ -3,10 +3,17 @@
 import os
 import re
 from langchain_core.messages import HumanMessage
-from llm.model import model
+from llm.client import invoke_model
 from langgraph.graph import END
 from types_.state import GraphState
+from tracing.tracer import traced, one_frame
 
+def has_description(text: str) -> bool:
+    """Return True if a description response has the expected sections (worth caching)."""
+    return bool(re.search(r'Extracted Text:.*Visual Description:', text, re.DOTALL) or
+                re.search(r'النص المستخرج:.*الوصف المرئي:', text, re.DOTALL))
+
+@traced(counts=one_frame)
 def describe_frame(state: GraphState) -> GraphState:
     """Extract detailed description and OCR from important frame."""
     frame_path = state["frame_path"]
@@ -38,12 +45,12 @@ Visual Description: [description in Arabic of any informative visuals]
             HumanMessage(
                 content=[
                     {"type": "text", "text": prompt},
-                    {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{state['frame_data']['base64_image']}"}}
+                    {"type": "image_url", "image_url": {"url": state["frame_data"]["image"].data_url()}}
                 ]
             )
         ]
 
-        response = model.invoke(messages)
+        response = invoke_model(messages, cache_vars={"image_name": os.path.basename(frame_path)}, validate=has_description)
         output_text = response.content.strip()
 
         image_name_match = re.search(r'Image Name:\s*(.*?)\s*Extracted Text:', output_text, re.DOTALL) or \
@@ -1,28 +1,14 @@
 import json
 import re
+from typing import List
 from langchain_core.messages import HumanMessage, SystemMessage
-from llm.model import model
+from llm.client import invoke_model
+from FrameProcessor.gating.pre_classifier import get_pre_classifier
 from langgraph.graph import END
 from types_.state import GraphState
+from tracing.tracer import traced, one_frame
 
-def evaluate_importance(state: GraphState) -> GraphState:
-    """Use LLM to determine whether the frame is important."""
-
-    if state["frame_features"].get("dark_ratio", 0) > 0.9:
-        state["importance"] = "not_important"
-        state["reason"] = "Frame is mostly black (over 90%)"
-        state["next_step"] = END
-        return state
-
-    if "error" in state["frame_features"]:
-        state["importance"] = "not_important"
-        state["reason"] = f"Could not properly analyze frame: {state['frame_features']['error']}"
-        state["next_step"] = END
-        return state
-
-    try:
-        messages = [
-            SystemMessage(content="""You are an expert in video summarization. Your task is to evaluate the importance of a video frame for inclusion in a video summary.
+IMPORTANCE_CRITERIA = """You are an expert in video summarization. Your task is to evaluate the importance of a video frame for inclusion in a video summary.
 
 Evaluate the frame and classify it as either "important" or "not_important" based on the following criteria:
 
@@ -37,31 +23,141 @@ Unimportant frames:
 - Regular portrait shots unrelated to video content
 - Transitional or blurry frames
 - Frames very similar to previous ones
+"""
 
+IMPORTANCE_PROMPT = IMPORTANCE_CRITERIA + """
 Return a JSON containing:
 {
   "importance": "important" or "not_important",
   "reason": "reason for your classification"
 }
-"""),
+"""
+
+BATCH_IMPORTANCE_PROMPT = IMPORTANCE_CRITERIA + """
+You will receive several frames at once. Each image is preceded by its image name.
+Evaluate every frame independently and return a JSON array containing exactly one object per frame:
+[
+  {"image_name": "name of the frame", "importance": "important" or "not_important", "reason": "reason for your classification"}
+]
+"""
+
+def _precheck(state: GraphState) -> bool:
+    """Classify frames that need no LLM call. Returns True if the frame was decided."""
+    if state["frame_features"].get("dark_ratio", 0) > 0.9:
+        state["importance"] = "not_important"
+        state["reason"] = "Frame is mostly black (over 90%)"
+        state["next_step"] = END
+        return True
+
+    if "error" in state["frame_features"]:
+        state["importance"] = "not_important"
+        state["reason"] = f"Could not properly analyze frame: {state['frame_features']['error']}"
+        state["next_step"] = END
+        return True
+
+    return _gate(state)
+
+def _gate(state: GraphState) -> bool:
+    """Let the local pre-classifier decide clear-cut frames. Returns True if the frame was decided."""
+    classifier = get_pre_classifier()
+    if classifier is None:
+        return False
+
+    decision = classifier.decide(state["frame_features"])
+    if decision is None:
+        return False
+
+    importance, probability = decision
+    if classifier.should_audit():
+        # Sent to the LLM anyway; the answers are compared in `_record_audit`
+        state["gate_decision"] = importance
+        return False
+
+    state["importance"] = importance
+    state["reason"] = f"Pre-classifier: {importance} with probability {max(probability, 1 - probability):.2f}"
+    state["next_step"] = "describe_frame" if importance == "important" else END
+    return True
+
+def _record_audit(state: GraphState):
+    local = state.pop("gate_decision", None)
+    if local is not None:
+        get_pre_classifier().record_audit(local, state["importance"])
+
+_LABELS = ("important", "not_important")
+
+def parse_json_answer(text: str):
+    """Return the JSON object of a response, or None if it has none; raises ValueError if it is malformed.
+
+    The one parser of single-frame answers, shared by the callers and the cache validator, so a
+    response is only cached if the caller can read it.
+    """
+    match = re.search(r'({.*})', text, re.DOTALL)
+    return json.loads(match.group(1), strict=False) if match else None
+
+def is_labelled_json(text: str) -> bool:
+    """Return True if a response holds a JSON object with a valid importance label (worth caching)."""
+    try:
+        result = parse_json_answer(text)
+    except ValueError:
+        return False
+    return isinstance(result, dict) and result.get("importance") in _LABELS
+
+def label_from_text(text: str) -> str:
+    """Read the label of a free-text answer; the first mention decides, and answers without one count as not important."""
+    match = re.search(r"\b(not[_ ])?important\b", text, re.IGNORECASE)
+    if match is None or match.group(1):
+        return "not_important"
+    return "important"
+
+def _batch_answers(text: str) -> dict:
+    """Map image names to the valid answers of a batch importance response."""
+    answers = {}
+    json_match = re.search(r'(\[.*\])', text, re.DOTALL)
+    if json_match:
+        for item in json.loads(json_match.group(1), strict=False):
+            if isinstance(item, dict) and item.get("importance") in _LABELS:
+                answers[str(item.get("image_name", "")).strip()] = item
+    return answers
+
+def _answers_all(text: str, names: List[str]) -> bool:
+    try:
+        return set(names) <= set(_batch_answers(text))
+    except ValueError:
+        return False
+
+def _image_part(state: GraphState) -> dict:
+    return {"type": "image_url", "image_url": {"url": state["frame_data"]["image"].data_url()}}
+
+@traced(counts=one_frame)
+def evaluate_importance(state: GraphState) -> GraphState:
+    """Use LLM to determine whether the frame is important."""
+
+    if _precheck(state):
+        return state
+
+    return _evaluate_with_llm(state)
+
+def _evaluate_with_llm(state: GraphState) -> GraphState:
+    try:
+        messages = [
+            SystemMessage(content=IMPORTANCE_PROMPT),
             HumanMessage(
                 content=[
                     {"type": "text", "text": "Evaluate the importance of this video frame."},
-                    {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{state['frame_data']['base64_image']}"}}
+                    _image_part(state)
                 ]
             )
         ]
 
-        response = model.invoke(messages)
+        response = invoke_model(messages, validate=is_labelled_json)
 
         try:
-            json_match = re.search(r'({.*})', response.content.replace('\n', ' '))
-            if json_match:
-                result = json.loads(json_match.group(1))
+            result = parse_json_answer(response.content)
+            if result is not None:
                 state["importance"] = result.get("importance", "not_important")
                 state["reason"] = result.get("reason", "No reason provided")
             else:
-                state["importance"] = "important" if "important" in response.content.lower() else "not_important"
+                state["importance"] = label_from_text(response.content)
                 state["reason"] = response.content
 
         except Exception as e:
@@ -74,5 +170,48 @@ Return a JSON containing:
         state["importance"] = "not_important"
         state["reason"] = f"Failed to evaluate: {str(e)}"
 
+    _record_audit(state)
     state["next_step"] = "describe_frame" if state["importance"] == "important" else END
     return state
+
+@traced(counts=lambda args, kwargs, result: {"frames": len(result)})
+def evaluate_importance_batch(states: List[GraphState]) -> List[GraphState]:
+    """Evaluate the importance of several frames with a single LLM request.
+
+    Frames that are decided locally (dark, unreadable or clear-cut for the pre-classifier) are
+    not sent. If the response is malformed or misses a frame, the affected frames fall back to
+    one request each.
+    """
+    pending = [state for state in states if not _precheck(state)]
+    if not pending:
+        return states
+
+    names = [state["frame_data"].get("file_name", f"frame_{i + 1}") for i, state in enumerate(pending)]
+    if len(set(names)) < len(names):
+        names = [f"{i + 1}_{name}" for i, name in enumerate(names)]
+
+    content = [{"type": "text", "text": f"Evaluate the importance of each of these {len(pending)} video frames."}]
+    for name, state in zip(names, pending):
+        content.append({"type": "text", "text": f"Image Name: {name}"})
+        content.append(_image_part(state))
+
+    answers = {}
+    try:
+        response = invoke_model([SystemMessage(content=BATCH_IMPORTANCE_PROMPT), HumanMessage(content=content)],
+                                validate=lambda text: _answers_all(text, names))
+        answers = _batch_answers(response.content)
+    except Exception as e:
+        print(f"Error evaluating importance batch, falling back to single frames: {str(e)}")
+
+    for name, state in zip(names, pending):
+        answer = answers.get(name)
+        if answer is None:
+            _evaluate_with_llm(state)
+            continue
+
+        state["importance"] = answer["importance"]
+        state["reason"] = answer.get("reason", "No reason provided")
+        _record_audit(state)
+        state["next_step"] = "describe_frame" if state["importance"] == "important" else END
+
+    return states
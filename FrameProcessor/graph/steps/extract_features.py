@@ -1,62 +1,148 @@
 # graph/steps/extract_features.py
 
-import os
 import cv2
-import base64
+import threading
 import numpy as np
-from PIL import Image
-from io import BytesIO
-from typing import Dict, Any
+from typing import Dict, Any, List
 from langgraph.graph import StateGraph, END
 from types_.state import GraphState
+from FrameProcessor.utils.image_utils import FrameImage
+from tracing.tracer import traced, one_frame
 
-def extract_frame_features(state: GraphState) -> GraphState:
-    """Extracts visual features from the frame image."""
-    frame_path = state["frame_path"]
+# Face detection runs on a copy whose longer side is at most this many pixels
+FACE_DETECTION_MAX_SIDE = 640
 
-    try:
-        img = cv2.imread(frame_path)
-        if img is None:
-            state["frame_features"] = {"error": "Failed to load frame"}
-            state["next_step"] = "evaluate_importance"
-            return state
+_local = threading.local()
+
+def _face_cascade() -> cv2.CascadeClassifier:
+    """Return this thread's face cascade, loading it from disk on first use."""
+    if not hasattr(_local, "face_cascade"):
+        _local.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+    return _local.face_cascade
+
+def _count_faces(gray: np.ndarray) -> int:
+    scale = FACE_DETECTION_MAX_SIDE / max(gray.shape)
+    if scale < 1:
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return len(_face_cascade().detectMultiScale(gray, 1.1, 4))
+
+def _batch_stats(images: List[np.ndarray], grays: List[np.ndarray]) -> List[Dict[str, float]]:
+    """Compute brightness, contrast, dark ratio and color variance of same-sized frames at once.
+
+    Means and variances come from integer sums of values and squared values, so the batch
+    needs no float copy of the pixels.
+    """
+    pixels = np.stack(images).reshape(len(images), -1, 3)
+    gray = np.stack(grays).reshape(len(grays), -1)
+    n = gray.shape[1]
 
+    gray_mean = gray.sum(axis=1, dtype=np.int64) / n
+    gray_var = np.square(gray, dtype=np.uint16).sum(axis=1, dtype=np.int64) / n - gray_mean ** 2
+    channel_mean = pixels.sum(axis=1, dtype=np.int64) / n
+    channel_var = np.square(pixels, dtype=np.uint16).sum(axis=1, dtype=np.int64) / n - channel_mean ** 2
+    dark_ratio = np.count_nonzero(gray < 30, axis=1) / n
+
+    return [
+        {
+            "contrast": float(np.sqrt(max(gray_var[i], 0.0))),
+            "brightness": float(gray_mean[i]),
+            "dark_ratio": float(dark_ratio[i]),
+            "color_variance": float(channel_var[i].sum()),
+        }
+        for i in range(len(images))
+    ]
+
+def compute_batch_features(images: List[np.ndarray]) -> List[Dict[str, Any]]:
+    """Compute the visual statistics of several BGR frames.
+
+    Frame statistics are computed for each group of same-sized frames in one pass; blur, text
+    density and faces are measured per frame, with the face cascade loaded once per thread.
+    """
+    grays = [cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) for img in images]
+
+    stats = [None] * len(images)
+    by_shape = {}
+    for i, img in enumerate(images):
+        by_shape.setdefault(img.shape, []).append(i)
+    for indices in by_shape.values():
+        for i, frame_stats in zip(indices, _batch_stats([images[i] for i in indices], [grays[i] for i in indices])):
+            stats[i] = frame_stats
+
+    features = []
+    for img, gray, frame_stats in zip(images, grays, stats):
         height, width, channels = img.shape
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        contrast = np.std(gray)
-        brightness = np.mean(gray)
-        dark_pixels = np.sum(gray < 30) / (height * width)
-        color_variance = np.var(img.reshape(-1, 3), axis=0).sum()
 
-        face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-        faces = face_cascade.detectMultiScale(gray, 1.1, 4)
-        has_faces = len(faces) > 0
+        # Variance of the Laplacian: low values mean few sharp edges, i.e. a blurry frame
+        blur = cv2.Laplacian(gray, cv2.CV_64F).var()
+
+        # Share of pixels on strong local gradients joined horizontally, a cheap proxy for text and line art
+        gradient = cv2.morphologyEx(gray, cv2.MORPH_GRADIENT, np.ones((3, 3), np.uint8))
+        edges = (gradient > 40).astype(np.uint8)
+        text_mask = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, np.ones((1, 9), np.uint8))
+        text_density = np.count_nonzero(text_mask) / (height * width)
+
+        face_count = _count_faces(gray)
 
-        state["frame_features"] = {
+        features.append({
             "dimensions": {"height": height, "width": width},
-            "contrast": float(contrast),
-            "brightness": float(brightness),
-            "dark_ratio": float(dark_pixels),
-            "color_variance": float(color_variance),
-            "has_faces": has_faces,
-            "face_count": len(faces),
-        }
+            **frame_stats,
+            "blur": float(blur),
+            "text_density": float(text_density),
+            "has_faces": face_count > 0,
+            "face_count": face_count,
+        })
 
-        # Convert to base64
-        pil_img = Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
-        buffered = BytesIO()
-        pil_img.save(buffered, format="JPEG")
-        img_str = base64.b64encode(buffered.getvalue()).decode("utf-8")
+    return features
 
-        state["frame_data"] = {
-            "base64_image": img_str,
-            "file_name": os.path.basename(frame_path)
-        }
+def compute_frame_features(img: np.ndarray) -> Dict[str, Any]:
+    """Compute the visual statistics of a BGR frame."""
+    return compute_batch_features([img])[0]
+
+def _attach_image(state: GraphState) -> FrameImage:
+    image = state["frame_data"].get("image") or FrameImage.from_file(state["frame_path"])
+    # The LLM payload is encoded later, only if a step actually sends the frame
+    state["frame_data"] = {"image": image, "file_name": image.name}
+    state["next_step"] = "evaluate_importance"
+    return image
+
+@traced(counts=one_frame)
+def extract_frame_features(state: GraphState) -> GraphState:
+    """Extracts visual features from the frame image."""
+    image = _attach_image(state)
+
+    try:
+        img = image.pixels
+        if img is None:
+            state["frame_features"] = {"error": "Failed to load frame"}
+            return state
+
+        state["frame_features"] = compute_frame_features(img)
 
     except Exception as e:
         print(f"Error extracting frame features: {str(e)}")
         state["frame_features"] = {"error": f"Feature extraction failed: {str(e)}"}
-        state["frame_data"] = {"file_name": os.path.basename(frame_path)}
 
-    state["next_step"] = "evaluate_importance"
     return state
+
+@traced(counts=lambda args, kwargs, result: {"frames": len(result)})
+def extract_batch_features(states: List[GraphState]) -> List[GraphState]:
+    """Extracts visual features of several frames at once; frames that fail are handled one by one."""
+    loaded = []
+    for state in states:
+        img = _attach_image(state).pixels
+        if img is None:
+            state["frame_features"] = {"error": "Failed to load frame"}
+        else:
+            loaded.append((state, img))
+
+    try:
+        features = compute_batch_features([img for _, img in loaded])
+    except Exception as e:
+        print(f"Error extracting batch features, falling back to single frames: {str(e)}")
+        for state, _ in loaded:
+            extract_frame_features(state)
+        return states
+
+    for (state, _), frame_features in zip(loaded, features):
+        state["frame_features"] = frame_features
+    return states
@@ -3,6 +3,7 @@ from types_.state import GraphState
 from FrameProcessor.graph.steps.extract_features import extract_frame_features
 from FrameProcessor.graph.steps.evaluate_importance import evaluate_importance
 from FrameProcessor.graph.steps.describe_frame import describe_frame
+from FrameProcessor.graph.steps.classify_and_describe import classify_and_describe
 
 def decide_next_step(state: GraphState) -> str:
     return state["next_step"]
@@ -31,5 +32,37 @@ def build_graph():
 
     return workflow.compile()
 
-# Export the compiled graph
+def build_single_call_graph():
+    """Graph whose one LLM call classifies the frame and describes it if important.
+
+    `describe_frame` only runs for frames the single call could not describe: frames decided
+    important by the pre-classifier, or answers without the expected JSON.
+    """
+    workflow = StateGraph(GraphState)
+
+    workflow.add_node("extract_features", extract_frame_features)
+    workflow.add_node("classify_and_describe", classify_and_describe)
+    workflow.add_node("describe_frame", describe_frame)
+
+    workflow.add_edge("extract_features", "classify_and_describe")
+    workflow.add_conditional_edges(
+        "classify_and_describe",
+        decide_next_step,
+        {
+            "describe_frame": "describe_frame",
+            END: END
+        }
+    )
+    workflow.add_edge("describe_frame", END)
+
+    workflow.set_entry_point("extract_features")
+
+    return workflow.compile()
+
+# Export the compiled graphs
 frame_processor = build_graph()
+single_call_frame_processor = build_single_call_graph()
+
+def get_frame_processor(single_call: bool = False):
+    """Return the two-call graph, or the single-call graph if `single_call` is set."""
+    return single_call_frame_processor if single_call else frame_processor
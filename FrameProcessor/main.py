@@ -1,8 +1,8 @@
 from processor.multi_frame import process_frames
 from utils.io_utils import get_frames_from_folder
-from config.paths import output_json_file, output_csv_file
+from utils.result_sinks import CsvSink, JsonlSink
+from config.paths import output_results_file, output_csv_file
 import os
-import json
 
 def main(frames_folder: str):
     """Main function to process frames in a folder"""
@@ -16,14 +16,15 @@ def main(frames_folder: str):
         print("No frames found for processing!")
         return
 
-    # Process frames
-    results = process_frames(frame_paths)
+    # Process frames, writing each result as soon as it is ready
+    with JsonlSink(output_results_file) as results_sink, CsvSink(output_csv_file) as csv_sink:
+        def write(result):
+            results_sink.write(result)
+            csv_sink.write(result)
 
-    # Save classification results to JSON file
-    with open(output_json_file, "w", encoding="utf-8") as f:
-        json.dump(results, f, ensure_ascii=False, indent=2)
+        results = process_frames(frame_paths, on_result=write)
 
-    print(f"\nClassification results saved to {output_json_file}")
+    print(f"\nClassification results saved to {output_results_file}")
 
     # Display summary
     important_frames = [r for r in results if r["importance"] == "important"]
@@ -32,7 +33,7 @@ def main(frames_folder: str):
     print(f"Important frames: {len(important_frames)}")
     print(f"Unimportant frames: {len(results) - len(important_frames)}")
     print(f"Descriptions saved to: {output_csv_file}")
-    print(f"Raw results saved to: {output_json_file}")
+    print(f"Raw results saved to: {output_results_file}")
 
     # Print important frames with reasons
     if important_frames:
@@ -1,14 +1,21 @@
 import os
 import re
-from typing import Dict, Any
+from typing import Dict, Any, Union
 from langchain_core.messages import HumanMessage
-from llm.model import model
-from FrameProcessor.utils.image_utils import image_to_base64
+from llm.client import invoke_model
+from FrameProcessor.utils.image_utils import FrameImage, as_frame_image
+from FrameProcessor.graph.steps.describe_frame import has_description
+from tracing.tracer import traced, one_frame
 
-def describe_frame_directly(frame_path: str) -> Dict[str, Any]:
-    """Describe a frame directly without the state graph."""
-    img_str, mime_type = image_to_base64(frame_path)
-    if not img_str:
+@traced(counts=one_frame)
+def describe_frame_directly(frame: Union[str, FrameImage]) -> Dict[str, Any]:
+    """Describe a frame (image path or FrameImage) directly without the state graph."""
+    image = as_frame_image(frame)
+    frame_path = image.name
+    try:
+        image_url = image.data_url()
+    except Exception as e:
+        print(f"Error converting image to base64: {str(e)}")
         return {
             "image_name": os.path.basename(frame_path),
             "extracted_text": "Failed to process image",
@@ -42,12 +49,12 @@ def describe_frame_directly(frame_path: str) -> Dict[str, Any]:
             HumanMessage(
                 content=[
                     {"type": "text", "text": prompt},
-                    {"type": "image_url", "image_url": {"url": f"data:{mime_type};base64,{img_str}"}}
+                    {"type": "image_url", "image_url": {"url": image_url}}
                 ]
             )
         ]
 
-        response = model.invoke(messages)
+        response = invoke_model(messages, cache_vars={"image_name": os.path.basename(frame_path)}, validate=has_description)
         output_text = response.content.strip()
 
         image_name_match = re.search(r'Image Name:\s*(.*?)\s*Extracted Text:', output_text, re.DOTALL) or \
@@ -0,0 +1,41 @@
+from typing import List, Dict, Any
+from langgraph.graph import END
+from FrameProcessor.graph.steps.extract_features import extract_batch_features
+from FrameProcessor.graph.steps.evaluate_importance import evaluate_importance_batch
+from FrameProcessor.graph.steps.describe_frame import describe_frame
+from FrameProcessor.processor.single_frame import Frame, _initial_state, _build_output, _error_output
+
+
+def process_frame_batch(frames: List[Frame]) -> List[Dict[str, Any]]:
+    """Process several frames with one importance request for the whole batch.
+
+    Runs the same steps as the state graph (extract features, evaluate importance,
+    describe important frames), but extracts features and evaluates importance for all
+    frames at once.
+    Results have the same format as `process_single_frame`, in input order.
+    """
+    states = []
+    for frame in frames:
+        try:
+            states.append(_initial_state(frame))
+        except Exception as e:
+            states.append(e)
+
+    valid = [state for state in states if not isinstance(state, Exception)]
+    extract_batch_features(valid)
+    evaluate_importance_batch(valid)
+
+    results = []
+    for frame, state in zip(frames, states):
+        if isinstance(state, Exception):
+            results.append(_error_output(frame, state))
+            continue
+
+        try:
+            if state["next_step"] != END:
+                state = describe_frame(state)
+            results.append(_build_output(frame, state))
+        except Exception as e:
+            results.append(_error_output(frame, e))
+
+    return results
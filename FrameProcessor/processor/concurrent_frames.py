@@ -0,0 +1,34 @@
+from typing import List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from FrameProcessor.graph.workflow import get_frame_processor
+from FrameProcessor.processor.single_frame import Frame, _initial_state, _build_output, _error_output
+from FrameProcessor.processor.batch_frames import process_frame_batch
+
+
+def process_frames_concurrently(frames: List[Frame], max_concurrency: int, single_call: bool = False) -> List[Dict[str, Any]]:
+    """Run the state graph on several frames at once, with at most `max_concurrency` in flight.
+
+    With `single_call`, the graph classifies and describes each frame with one LLM request.
+    Results have the same format as `process_single_frame`, in input order.
+    """
+    states = get_frame_processor(single_call).batch(
+        [_initial_state(frame) for frame in frames],
+        config={"max_concurrency": max_concurrency},
+        return_exceptions=True
+    )
+
+    results = []
+    for frame, state in zip(frames, states):
+        try:
+            if isinstance(state, Exception):
+                raise state
+            results.append(_build_output(frame, state))
+        except Exception as e:
+            results.append(_error_output(frame, e))
+    return results
+
+
+def process_batches_concurrently(batches: List[List[Frame]], max_concurrency: int) -> List[List[Dict[str, Any]]]:
+    """Run `process_frame_batch` on several batches at once, with at most `max_concurrency` in flight."""
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        return list(executor.map(process_frame_batch, batches))
@@ -1,46 +1,75 @@
-from typing import List, Dict, Any
-from FrameProcessor.processor.single_frame import process_single_frame
-from FrameProcessor.utils.io_utils import save_description_to_csv
-from FrameProcessor.ocr.describe_direct import describe_frame_directly
+from typing import List, Dict, Any, Callable, Optional
+from FrameProcessor.processor.single_frame import Frame, process_single_frame
+from FrameProcessor.processor.batch_frames import process_frame_batch
+from FrameProcessor.processor.concurrent_frames import process_frames_concurrently, process_batches_concurrently
+from FrameProcessor.utils.image_utils import FrameImage, as_frame_image
 
 
-def process_frames(frame_paths: List[str]) -> List[Dict[str, Any]]:
-    """Process a set of video frames and evaluate their importance."""
+def _iter_results(frames: List[FrameImage], importance_batch_size: int, max_concurrency: int, single_call: bool):
+    """Yield (frame, result) pairs in input order, one frame or one group of frames at a time."""
+    if importance_batch_size > 1:
+        batches = [frames[i:i + importance_batch_size] for i in range(0, len(frames), importance_batch_size)]
+        # Several batches are sent at once; groups keep progress output flowing on long runs
+        for start in range(0, len(batches), max_concurrency):
+            group = batches[start:start + max_concurrency]
+            first = start * importance_batch_size
+            count = sum(len(batch) for batch in group)
+            print(f"Processing frames {first + 1}-{first + count}/{len(frames)} in {len(group)} batch(es)")
+            for batch, batch_results in zip(group, process_batches_concurrently(group, max_concurrency)):
+                yield from zip(batch, batch_results)
+    elif max_concurrency > 1:
+        group_size = max_concurrency * 4
+        for start in range(0, len(frames), group_size):
+            group = frames[start:start + group_size]
+            print(f"Processing frames {start + 1}-{start + len(group)}/{len(frames)} ({max_concurrency} concurrent)")
+            yield from zip(group, process_frames_concurrently(group, max_concurrency, single_call))
+    else:
+        for i, frame in enumerate(frames):
+            print(f"Processing frame {i + 1}/{len(frames)}: {frame.path or frame.name}")
+            yield frame, process_single_frame(frame, single_call)
+
+
+def process_frames(frames: List[Frame], importance_batch_size: int = 1, max_concurrency: int = 1,
+                   single_call: bool = False, on_result: Optional[Callable[[Dict[str, Any]], None]] = None) -> List[Dict[str, Any]]:
+    """Process a set of video frames and evaluate their importance.
+
+    Frames are image paths, or FrameImages holding frames decoded in memory (no files needed).
+    With `importance_batch_size` > 1, importance is evaluated for that many frames per LLM request.
+    With `max_concurrency` > 1, that many frames (or batches) are processed at the same time;
+    results keep the input order. LLM request rate and retries are set with `llm.client.configure`.
+    With `single_call`, one LLM request classifies and describes each frame; importance batching
+    does not apply then. Missing descriptions are retried at most once per frame.
+    `on_result` is called with each result as soon as it is final, e.g. to checkpoint it or write
+    it to a results sink; this function itself writes no files.
+    """
     results = []
     important_frames_count = 0
 
-    for i, frame_path in enumerate(frame_paths):
-        print(f"Processing frame {i + 1}/{len(frame_paths)}: {frame_path}")
+    frames = [as_frame_image(frame) for frame in frames]
+    if single_call:
+        importance_batch_size = 1
 
+    for frame, result in _iter_results(frames, importance_batch_size, max(1, max_concurrency), single_call):
         try:
-            result = process_single_frame(frame_path)
             results.append(result)
 
             if result["importance"] == "important":
                 important_frames_count += 1
                 print(f"   Important: {result['reason'][:50]}...")
-
-                if "description" not in result or not result["description"]:
-                    print(f"  Retrying description for important frame...")
-                    try:
-                        result["description"] = describe_frame_directly(frame_path)
-                        print(f"  Description extracted successfully on retry")
-                    except Exception as e:
-                        print(f"  Retry failed: {str(e)}")
-
-                if "description" in result and result["description"]:
-                    save_description_to_csv(result)
             else:
                 print(f"   Not important: {result['reason'][:50]}...")
 
+            if on_result is not None:
+                on_result(result)
+
         except Exception as e:
             print(f"  Error processing frame: {str(e)}")
             results.append({
-                "frame": frame_path,
-                "path": frame_path,
+                "frame": frame.name,
+                "path": frame.path or frame.name,
                 "importance": "error",
                 "reason": str(e)
             })
 
-    print(f"\nFound {important_frames_count} important frames out of {len(frame_paths)}")
+    print(f"\nFound {important_frames_count} important frames out of {len(frames)}")
     return results
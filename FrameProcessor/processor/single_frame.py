@@ -1,13 +1,17 @@
 import os
-from typing import Dict, Any
-from FrameProcessor.graph.workflow import frame_processor
+from typing import Dict, Any, Union
+from FrameProcessor.graph.workflow import get_frame_processor
 from FrameProcessor.ocr.describe_direct import describe_frame_directly
+from FrameProcessor.utils.image_utils import FrameImage, as_frame_image
 
-def process_single_frame(frame_path: str) -> Dict[str, Any]:
-    """Process a single video frame: classify and if important, describe it."""
-    initial_state = {
-        "frame_path": frame_path,
-        "frame_data": {},
+Frame = Union[str, FrameImage]
+
+def _initial_state(frame: Frame) -> Dict[str, Any]:
+    """Build the initial graph state of a frame (image path or FrameImage)."""
+    image = as_frame_image(frame)
+    return {
+        "frame_path": image.path or image.name,
+        "frame_data": {"image": image, "file_name": image.name},
         "frame_features": {},
         "importance": "not_important",
         "reason": "",
@@ -15,43 +19,59 @@ def process_single_frame(frame_path: str) -> Dict[str, Any]:
         "next_step": "extract_features"
     }
 
+def _build_output(frame: Frame, result: Dict[str, Any]) -> Dict[str, Any]:
+    """Turn a final graph state into the result record of a frame."""
+    image = as_frame_image(frame)
+    frame_path = image.path or image.name
+    output = {
+        "frame": os.path.basename(frame_path),
+        "path": frame_path,
+        "importance": result["importance"],
+        "reason": result["reason"],
+    }
+
+    # If frame is important, ensure description is present. This is the only retry: a frame whose
+    # description request already ran (even if it failed) is not described again
+    if result["importance"] == "important":
+        if "description" in result and isinstance(result["description"], dict) and result["description"]:
+            output["description"] = result["description"]
+        else:
+            print(f"  Warning: No description extracted for important frame: {os.path.basename(frame_path)}")
+            try:
+                output["description"] = describe_frame_directly(image)
+                print(f"   Description extracted successfully on second attempt")
+            except Exception as e:
+                print(f"   Failed to extract description: {str(e)}")
+                output["description"] = {
+                    "image_name": os.path.basename(frame_path),
+                    "extracted_text": "Failed to extract text",
+                    "visual_description": "Failed to extract visual description",
+                    "error": str(e)
+                }
+
+    return output
+
+def _error_output(frame: Frame, e: Exception) -> Dict[str, Any]:
+    frame_path = frame if isinstance(frame, str) else frame.path or frame.name
+    print(f"  Error processing frame: {str(e)}")
+    return {
+        "frame": os.path.basename(frame_path),
+        "path": frame_path,
+        "importance": "error",
+        "reason": f"Processing error: {str(e)}",
+        "error": str(e)
+    }
+
+def process_single_frame(frame: Frame, single_call: bool = False) -> Dict[str, Any]:
+    """Process a single video frame: classify and if important, describe it.
+
+    `frame` is an image path, or a FrameImage holding the pixels of a frame in memory.
+    With `single_call`, one LLM request both classifies and describes the frame.
+    """
     try:
         # Execute the state graph
-        result = frame_processor.invoke(initial_state)
-
-        output = {
-            "frame": os.path.basename(frame_path),
-            "path": frame_path,
-            "importance": result["importance"],
-            "reason": result["reason"],
-        }
-
-        # If frame is important, ensure description is present
-        if result["importance"] == "important":
-            if "description" in result and isinstance(result["description"], dict) and result["description"]:
-                output["description"] = result["description"]
-            else:
-                print(f"  Warning: No description extracted for important frame: {os.path.basename(frame_path)}")
-                try:
-                    output["description"] = describe_frame_directly(frame_path)
-                    print(f"   Description extracted successfully on second attempt")
-                except Exception as e:
-                    print(f"   Failed to extract description: {str(e)}")
-                    output["description"] = {
-                        "image_name": os.path.basename(frame_path),
-                        "extracted_text": "Failed to extract text",
-                        "visual_description": "Failed to extract visual description",
-                        "error": str(e)
-                    }
-
-        return output
+        result = get_frame_processor(single_call).invoke(_initial_state(frame))
+        return _build_output(frame, result)
 
     except Exception as e:
-        print(f"  Error processing frame: {str(e)}")
-        return {
-            "frame": os.path.basename(frame_path),
-            "path": frame_path,
-            "importance": "error",
-            "reason": f"Processing error: {str(e)}",
-            "error": str(e)
-        }
+        return _error_output(frame, e)
@@ -1,17 +1,58 @@
+import os
+import cv2
 import base64
-from io import BytesIO
-from PIL import Image
-
-def image_to_base64(image_path):
-    """Convert an image to a base64-encoded string along with its MIME type."""
-    try:
-        img = Image.open(image_path)
-        buffered = BytesIO()
-        img_format = img.format if img.format else "JPEG"
-        img.save(buffered, format=img_format)
-        img_str = base64.b64encode(buffered.getvalue()).decode("utf-8")
-        mime_type = f"image/{img_format.lower()}"
-        return img_str, mime_type
-    except Exception as e:
-        print(f"Error converting image to base64: {str(e)}")
-        return None, None
+
+_MIME_TYPES = {".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".png": "image/png", ".bmp": "image/bmp", ".tiff": "image/tiff"}
+
+class FrameImage:
+    """A frame handed to the frame processor, either as pixels in memory or as an image file.
+
+    The base64 payload sent to the LLM is built at most once, on first use: frames with a file
+    are sent as the file's own bytes, frames only held in memory are JPEG-encoded with `quality`
+    (the quality keyframes are saved with). Frames decided without an LLM call are never encoded.
+    """
+
+    def __init__(self, pixels=None, name: str = None, path: str = None, quality: int = 70):
+        if pixels is None and path is None:
+            raise ValueError("A frame needs either pixels or a path")
+
+        self.path = path
+        self.name = name or os.path.basename(path)
+        self.quality = quality
+        self._pixels = pixels
+        self._base64 = None
+        self.mime_type = _MIME_TYPES.get(os.path.splitext(path)[1].lower(), "image/jpeg") if path else "image/jpeg"
+
+    @classmethod
+    def from_file(cls, path: str) -> "FrameImage":
+        return cls(path=path)
+
+    @property
+    def pixels(self):
+        """The frame in BGR format, or None if its file cannot be read."""
+        if self._pixels is None and self.path is not None:
+            self._pixels = cv2.imread(self.path)
+        return self._pixels
+
+    @property
+    def base64(self) -> str:
+        """Base64 encoding of the frame, built on first access."""
+        if self._base64 is None:
+            if self.path is not None:
+                with open(self.path, "rb") as f:
+                    data = f.read()
+            else:
+                ok, buffer = cv2.imencode(".jpg", self._pixels, [int(cv2.IMWRITE_JPEG_QUALITY), self.quality])
+                if not ok:
+                    raise ValueError(f"Failed to encode frame {self.name}")
+                data = buffer.tobytes()
+            self._base64 = base64.b64encode(data).decode("utf-8")
+        return self._base64
+
+    def data_url(self) -> str:
+        """The frame as a data URL for an `image_url` message part."""
+        return f"data:{self.mime_type};base64,{self.base64}"
+
+def as_frame_image(frame) -> FrameImage:
+    """Wrap an image path in a `FrameImage`; `FrameImage`s are returned unchanged."""
+    return frame if isinstance(frame, FrameImage) else FrameImage.from_file(frame)
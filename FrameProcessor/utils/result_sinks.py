@@ -0,0 +1,194 @@
+import os
+import csv
+import json
+import time
+from typing import List, Dict, Any
+
+class ResultSink:
+    """Buffered, incremental writer of frame results.
+
+    Records are kept in memory and written in one batch when `max_buffered` records are
+    waiting or `max_seconds` have passed since the last write, so the cost per frame stays
+    constant and the output can be read while the run is still going. The file is opened once
+    and truncated when the sink is created.
+    """
+
+    def __init__(self, path: str, max_buffered: int = 32, max_seconds: float = 5.0):
+        self.path = path
+        self.max_buffered = max_buffered
+        self.max_seconds = max_seconds
+        self.written = 0
+        self._buffer = []
+        self._last_flush = time.monotonic()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def write(self, record: Dict[str, Any]):
+        self._buffer.append(record)
+        if len(self._buffer) >= self.max_buffered or time.monotonic() - self._last_flush >= self.max_seconds:
+            self.flush()
+
+    def flush(self):
+        """Write every buffered record."""
+        if self._buffer:
+            self._write_batch(self._buffer)
+            self.written += len(self._buffer)
+            self._buffer = []
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        self.flush()
+        self._close()
+
+    def _write_batch(self, records: List[Dict[str, Any]]):
+        raise NotImplementedError
+
+    def _close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class JsonlSink(ResultSink):
+    """Writes one JSON object per line."""
+
+    def __init__(self, path: str, **kwargs):
+        super().__init__(path, **kwargs)
+        self._file = open(path, "w", encoding="utf-8")
+
+    def _write_batch(self, records):
+        self._file.write("".join(json.dumps(record, ensure_ascii=False, default=str) + "\n" for record in records))
+        self._file.flush()
+
+    def _close(self):
+        self._file.close()
+
+CSV_FIELDS = ["Image Name", "Extracted Text", "Visual Description"]
+
+class CsvSink(ResultSink):
+    """Writes the description of every important frame as a row of the important frames CSV."""
+
+    def __init__(self, path: str, **kwargs):
+        super().__init__(path, **kwargs)
+        self._file = open(path, "w", newline="", encoding="utf-8")
+        self._writer = csv.DictWriter(self._file, fieldnames=CSV_FIELDS)
+        self._writer.writeheader()
+
+    def write(self, record):
+        if record.get("importance") == "important" and record.get("description"):
+            super().write(record)
+
+    def _write_batch(self, records):
+        for record in records:
+            description = record["description"]
+            self._writer.writerow({
+                "Image Name": description.get("image_name", os.path.basename(record.get("path", ""))),
+                "Extracted Text": description.get("extracted_text", "No extracted text"),
+                "Visual Description": description.get("visual_description", "No visual description"),
+            })
+        self._file.flush()
+
+    def _close(self):
+        self._file.close()
+
+def _columns(records: List[Dict[str, Any]]) -> Dict[str, list]:
+    """Flatten results into columns."""
+    descriptions = [record.get("description") or {} for record in records]
+    return {
+        "frame": [record.get("frame") for record in records],
+        "path": [record.get("path") for record in records],
+        "importance": [record.get("importance") for record in records],
+        "reason": [record.get("reason") for record in records],
+        "extracted_text": [d.get("extracted_text") for d in descriptions],
+        "visual_description": [d.get("visual_description") for d in descriptions],
+        "error": [record.get("error") or (d.get("error") if isinstance(d, dict) else None) for record, d in zip(records, descriptions)],
+    }
+
+def _arrow_schema():
+    import pyarrow as pa
+    return pa.schema([(name, pa.string()) for name in
+                      ["frame", "path", "importance", "reason", "extracted_text", "visual_description", "error"]])
+
+class ParquetSink(ResultSink):
+    """Writes results as Parquet, one row group per flush. The file is readable once the sink is closed."""
+
+    def __init__(self, path: str, **kwargs):
+        import pyarrow.parquet as pq
+
+        super().__init__(path, **kwargs)
+        self._schema = _arrow_schema()
+        self._writer = pq.ParquetWriter(path, self._schema)
+
+    def _write_batch(self, records):
+        import pyarrow as pa
+        self._writer.write_table(pa.Table.from_pydict(_columns(records), schema=self._schema))
+
+    def _close(self):
+        self._writer.close()
+
+class ArrowSink(ResultSink):
+    """Writes results as an Arrow IPC stream, one record batch per flush; readable while it grows."""
+
+    def __init__(self, path: str, **kwargs):
+        import pyarrow as pa
+
+        super().__init__(path, **kwargs)
+        self._schema = _arrow_schema()
+        self._file = pa.OSFile(path, "wb")
+        self._writer = pa.ipc.new_stream(self._file, self._schema)
+
+    def _write_batch(self, records):
+        import pyarrow as pa
+        self._writer.write_batch(pa.RecordBatch.from_pydict(_columns(records), schema=self._schema))
+        self._file.flush()
+
+    def _close(self):
+        self._writer.close()
+        self._file.close()
+
+SINKS = {
+    "jsonl": JsonlSink,
+    "parquet": ParquetSink,
+    "arrow": ArrowSink,
+}
+
+EXTENSIONS = {"jsonl": ".jsonl", "parquet": ".parquet", "arrow": ".arrows"}
+
+def open_results_sink(path: str, fmt: str = "jsonl", **kwargs) -> ResultSink:
+    """Open the results sink of a format ("jsonl", "parquet" or "arrow"); the path's extension is set to match."""
+    if fmt not in SINKS:
+        raise ValueError(f"Unknown results format: {fmt}")
+    return SINKS[fmt](os.path.splitext(path)[0] + EXTENSIONS[fmt], **kwargs)
+
+def read_results(path: str) -> List[Dict[str, Any]]:
+    """Read results written by a sink (or a results.json file of older runs)."""
+    if path.endswith(".jsonl"):
+        with open(path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+    if path.endswith(".json"):
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    import pyarrow as pa
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        table = pq.read_table(path)
+    else:
+        with pa.OSFile(path, "rb") as f:
+            table = pa.ipc.open_stream(f).read_all()
+
+    records = []
+    for row in table.to_pylist():
+        record = {key: row[key] for key in ("frame", "path", "importance", "reason") if row.get(key) is not None}
+        if row.get("extracted_text") is not None or row.get("visual_description") is not None:
+            record["description"] = {
+                "image_name": row.get("frame"),
+                "extracted_text": row.get("extracted_text"),
+                "visual_description": row.get("visual_description"),
+            }
+        if row.get("error"):
+            record["error"] = row["error"]
+        records.append(record)
+    return records
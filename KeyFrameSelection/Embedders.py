@@ -0,0 +1,236 @@
+import os
+import cv2
+import numpy as np
+import torch
+from PIL import Image
+from transformers import CLIPProcessor, CLIPModel
+
+CLIP_MODEL_ID = "openai/clip-vit-base-patch32"
+
+def auto_batch_size(min_size=4, max_size=32):
+    """
+    Picks a CLIP batch size from the number of threads available to PyTorch.
+
+    Batches of about two images per thread keep every core busy on CPU without making
+    individual batches so large that the streaming pipeline buffers many frames.
+
+    Args:
+        min_size (int, optional): Smallest batch size returned. Defaults to 4.
+        max_size (int, optional): Largest batch size returned. Defaults to 32.
+
+    Returns:
+        int: Number of frames to embed per batch.
+    """
+    threads = torch.get_num_threads() or os.cpu_count() or 1
+    return max(min_size, min(max_size, 2 * threads))
+
+class ClipEmbedder:
+    """
+    Reference CLIP image embedder running the full fp32 PyTorch model.
+
+    Subclasses only change how the vision tower is loaded and run; preprocessing and
+    normalization are shared, so every backend returns comparable embeddings.
+
+    Args:
+        model_id (str, optional): Hugging Face id of the CLIP model. Defaults to "openai/clip-vit-base-patch32".
+    """
+
+    backend = "fp32"
+
+    def __init__(self, model_id=CLIP_MODEL_ID):
+        self.model_id = model_id
+        self.processor = CLIPProcessor.from_pretrained(model_id)
+        self.model = self._load_model()
+
+    @property
+    def name(self):
+        """Identifier of the model and backend, used to key cached embeddings."""
+        return self.model_id if self.backend == "fp32" else f"{self.model_id}@{self.backend}"
+
+    def _load_model(self):
+        model = CLIPModel.from_pretrained(self.model_id, trust_remote_code=True, use_safetensors=True)
+        model.eval()
+        return model
+
+    def _image_features(self, pixel_values):
+        with torch.no_grad():
+            return self.model.get_image_features(pixel_values=pixel_values)
+
+    def _text_features(self, input_ids, attention_mask):
+        with torch.no_grad():
+            return self.model.get_text_features(input_ids=input_ids, attention_mask=attention_mask)
+
+    def embed(self, frames):
+        """
+        Computes CLIP image embeddings for a batch of video frames.
+
+        Args:
+            frames (list): Frames in BGR format (as returned by OpenCV).
+
+        Returns:
+            np.ndarray: float32 array of shape (len(frames), dim) with L2-normalized rows.
+        """
+        images = [Image.fromarray(cv2.cvtColor(f, cv2.COLOR_BGR2RGB)) for f in frames]
+        inputs = self.processor(images=images, return_tensors="pt", padding=True)
+        features = torch.as_tensor(self._image_features(inputs["pixel_values"]))
+        normed = torch.nn.functional.normalize(features.float(), p=2, dim=1)
+        return normed.cpu().numpy()
+
+    def embed_text(self, texts):
+        """
+        Computes CLIP text embeddings, in the same space as the image embeddings of `embed`.
+
+        Args:
+            texts (list): Text queries.
+
+        Returns:
+            np.ndarray: float32 array of shape (len(texts), dim) with L2-normalized rows.
+        """
+        inputs = self.processor(text=list(texts), return_tensors="pt", padding=True, truncation=True)
+        features = torch.as_tensor(self._text_features(inputs["input_ids"], inputs["attention_mask"]))
+        normed = torch.nn.functional.normalize(features.float(), p=2, dim=1)
+        return normed.cpu().numpy()
+
+class QuantizedClipEmbedder(ClipEmbedder):
+    """CLIP image embedder with the linear layers dynamically quantized to int8 for CPU inference."""
+
+    backend = "int8"
+
+    def _load_model(self):
+        model = super()._load_model()
+        return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+class _VisionTower(torch.nn.Module):
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, pixel_values):
+        return self.model.get_image_features(pixel_values=pixel_values)
+
+def export_onnx(onnx_path, model_id=CLIP_MODEL_ID):
+    """
+    Exports the CLIP vision tower to ONNX so it can be served by `OnnxClipEmbedder`.
+
+    Args:
+        onnx_path (str): Destination of the exported model.
+        model_id (str, optional): Hugging Face id of the CLIP model. Defaults to "openai/clip-vit-base-patch32".
+    """
+    model = CLIPModel.from_pretrained(model_id, trust_remote_code=True, use_safetensors=True)
+    model.eval()
+    size = model.config.vision_config.image_size
+
+    os.makedirs(os.path.dirname(onnx_path) or ".", exist_ok=True)
+    torch.onnx.export(
+        _VisionTower(model),
+        (torch.zeros(1, 3, size, size),),
+        onnx_path,
+        input_names=["pixel_values"],
+        output_names=["image_embeds"],
+        dynamic_axes={"pixel_values": {0: "batch"}, "image_embeds": {0: "batch"}}
+    )
+
+class OnnxClipEmbedder(ClipEmbedder):
+    """
+    CLIP image embedder running an exported vision tower with ONNX Runtime.
+
+    Args:
+        model_id (str, optional): Hugging Face id of the CLIP model, used for preprocessing. Defaults to "openai/clip-vit-base-patch32".
+        onnx_path (str, optional): Path of the exported model (see `export_onnx`). Defaults to the `CLIP_ONNX_PATH`
+            environment variable, or "models/clip-vision.onnx".
+    """
+
+    backend = "onnx"
+
+    def __init__(self, model_id=CLIP_MODEL_ID, onnx_path=None):
+        self.onnx_path = onnx_path or os.getenv("CLIP_ONNX_PATH", os.path.join("models", "clip-vision.onnx"))
+        super().__init__(model_id)
+
+    def _load_model(self):
+        import onnxruntime
+
+        if not os.path.exists(self.onnx_path):
+            raise FileNotFoundError(f"ONNX model not found at {self.onnx_path}; create it with export_onnx()")
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = torch.get_num_threads()
+        return onnxruntime.InferenceSession(self.onnx_path, options, providers=["CPUExecutionProvider"])
+
+    def _image_features(self, pixel_values):
+        return self.model.run(None, {"pixel_values": pixel_values.numpy()})[0]
+
+    def _text_features(self, input_ids, attention_mask):
+        # Only the vision tower is exported; the PyTorch text tower is loaded on the first text query
+        if getattr(self, "_text_model", None) is None:
+            from transformers import CLIPTextModelWithProjection
+            self._text_model = CLIPTextModelWithProjection.from_pretrained(self.model_id, use_safetensors=True)
+            self._text_model.eval()
+        with torch.no_grad():
+            return self._text_model(input_ids=input_ids, attention_mask=attention_mask).text_embeds
+
+EMBEDDERS = {
+    "fp32": ClipEmbedder,
+    "int8": QuantizedClipEmbedder,
+    "onnx": OnnxClipEmbedder,
+}
+
+_loaded = {}
+
+def get_embedder(backend=None):
+    """
+    Returns the CLIP embedder of a backend, loading it once per process.
+
+    Args:
+        backend (str, optional): One of "fp32", "int8" or "onnx". Defaults to the `CLIP_BACKEND`
+            environment variable, or "fp32".
+
+    Returns:
+        ClipEmbedder: The loaded embedder.
+    """
+    backend = backend or os.getenv("CLIP_BACKEND", "fp32")
+    if backend not in EMBEDDERS:
+        raise ValueError(f"Unknown CLIP backend: {backend}")
+
+    if backend not in _loaded:
+        _loaded[backend] = EMBEDDERS[backend]()
+    return _loaded[backend]
+
+def embedding_drift(frames, embedder, reference=None):
+    """
+    Measures how far a backend's embeddings drift from the fp32 reference on the same frames.
+
+    Args:
+        frames (list): Frames in BGR format.
+        embedder (ClipEmbedder): Backend to check.
+        reference (ClipEmbedder, optional): Reference backend. Defaults to the fp32 embedder.
+
+    Returns:
+        dict: Number of frames, mean/min cosine similarity between matching embeddings and the
+        maximum absolute difference of any component.
+    """
+    reference = reference or get_embedder("fp32")
+    expected = reference.embed(frames)
+    actual = embedder.embed(frames)
+    cosines = np.sum(expected * actual, axis=1)
+
+    return {
+        "backend": embedder.backend,
+        "frames": len(frames),
+        "mean_cosine": float(cosines.mean()),
+        "min_cosine": float(cosines.min()),
+        "max_abs_diff": float(np.abs(expected - actual).max()),
+    }
+
+if __name__ == "__main__":
+    import argparse
+    from KeyFrameSelection.FeatureExtraction import process_video
+
+    parser = argparse.ArgumentParser(description="Report how far a CLIP backend drifts from the fp32 reference.")
+    parser.add_argument("video_path", help="Video whose sampled frames are embedded by both backends.")
+    parser.add_argument("--backend", choices=["int8", "onnx"], default="int8")
+    parser.add_argument("--interval_sec", type=float, default=10)
+    args = parser.parse_args()
+
+    records, _ = process_video(args.video_path, interval_sec=args.interval_sec, mode="seek")
+    frames = [frame for frame, _ in records]
+    print(embedding_drift(frames, get_embedder(args.backend)))
@@ -0,0 +1,239 @@
+import os
+import re
+import json
+import time
+import shutil
+import uuid
+import hashlib
+import sqlite3
+import numpy as np
+
+def video_fingerprint(video_path, chunk_size=1 << 20):
+    """
+    Computes a content fingerprint of a video file without reading all of it.
+
+    The fingerprint hashes the file size together with its first, middle and last `chunk_size`
+    bytes, so renamed or copied videos map to the same cache entry while re-encoded ones do not.
+
+    Args:
+        video_path (str): Path to the video file.
+        chunk_size (int, optional): Number of bytes read at each sampled offset. Defaults to 1 MiB.
+
+    Returns:
+        str: Hex digest identifying the video content.
+    """
+    size = os.path.getsize(video_path)
+    digest = hashlib.sha1(str(size).encode())
+
+    with open(video_path, "rb") as f:
+        for offset in sorted({0, max(0, size // 2 - chunk_size // 2), max(0, size - chunk_size)}):
+            f.seek(offset)
+            digest.update(f.read(chunk_size))
+
+    return digest.hexdigest()
+
+def _kind_filename(kind):
+    # A fresh name per write, so arrays that are still memory-mapped are never overwritten in place
+    return f"{re.sub(r'[^A-Za-z0-9_.-]', '_', kind)}-{uuid.uuid4().hex[:8]}.npy"
+
+class FeatureCache:
+    """
+    Persistent on-disk cache of per-frame features shared across runs.
+
+    Features are keyed by video fingerprint, feature kind (which includes the model id for
+    embeddings, e.g. "clip:openai/clip-vit-base-patch32") and frame_idx. The layout is:
+
+        <cache_dir>/index.sqlite               rows of (video, kind, frame_idx) -> row in the kind's array,
+                                               the current array file per (video, kind), sampled frame
+                                               indices per sampling setting, and sizes per video
+        <cache_dir>/<video>/<kind>-<id>.npy    stacked feature values, memory-mapped on read
+
+    When the cache grows beyond `max_bytes`, the least recently used videos are evicted. Several
+    processes (e.g. batch workers) may share a cache, so videos used in the last `min_idle_seconds`
+    are never evicted: another process may still be reading them.
+
+    Args:
+        cache_dir (str): Directory holding the cache.
+        max_bytes (int, optional): Size limit of the cache in bytes. Defaults to 2 GiB.
+        min_idle_seconds (float, optional): Time since a video's last use before it can be evicted. Defaults to 1 hour.
+    """
+
+    def __init__(self, cache_dir, max_bytes=2 * 1024 ** 3, min_idle_seconds=3600):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.min_idle_seconds = min_idle_seconds
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self._db = sqlite3.connect(os.path.join(cache_dir, "index.sqlite"), timeout=30)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS features (
+                video TEXT, kind TEXT, frame_idx INTEGER, row INTEGER,
+                PRIMARY KEY (video, kind, frame_idx)
+            );
+            CREATE TABLE IF NOT EXISTS arrays (
+                video TEXT, kind TEXT, filename TEXT,
+                PRIMARY KEY (video, kind)
+            );
+            CREATE TABLE IF NOT EXISTS samples (
+                video TEXT, sampler TEXT, fps REAL, frame_idxs TEXT,
+                PRIMARY KEY (video, sampler)
+            );
+            CREATE TABLE IF NOT EXISTS videos (
+                video TEXT PRIMARY KEY, bytes INTEGER, last_used REAL
+            );
+        """)
+        self._db.commit()
+
+    def video_key(self, video_path):
+        """Returns the cache key of a video file (see `video_fingerprint`)."""
+        return video_fingerprint(video_path)
+
+    def load(self, video, kind):
+        """
+        Loads every cached feature of one kind for a video.
+
+        Args:
+            video (str): Video key returned by `video_key`.
+            kind (str): Feature kind.
+
+        Returns:
+            dict: Mapping of frame_idx to its feature, backed by a read-only memory map.
+        """
+        row = self._db.execute(
+            "SELECT filename FROM arrays WHERE video = ? AND kind = ?", (video, kind)
+        ).fetchone()
+        path = os.path.join(self.cache_dir, video, row[0]) if row else None
+        if path is None or not os.path.exists(path):
+            return {}
+
+        values = np.load(path, mmap_mode="r")
+        rows = self._db.execute(
+            "SELECT frame_idx, row FROM features WHERE video = ? AND kind = ?", (video, kind)
+        ).fetchall()
+        self._touch(video)
+        return {frame_idx: values[row] for frame_idx, row in rows if row < len(values)}
+
+    def save(self, video, kind, features):
+        """
+        Replaces the cached features of one kind for a video.
+
+        Args:
+            video (str): Video key returned by `video_key`.
+            kind (str): Feature kind.
+            features (dict): Mapping of frame_idx to a NumPy array; all arrays must share shape and dtype.
+        """
+        if not features:
+            return
+
+        video_dir = os.path.join(self.cache_dir, video)
+        os.makedirs(video_dir, exist_ok=True)
+        filename = _kind_filename(kind)
+
+        frame_idxs = sorted(features)
+        values = np.stack([np.asarray(features[frame_idx]) for frame_idx in frame_idxs])
+        np.save(os.path.join(video_dir, filename), values)
+
+        previous = self._db.execute(
+            "SELECT filename FROM arrays WHERE video = ? AND kind = ?", (video, kind)
+        ).fetchone()
+
+        with self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO arrays (video, kind, filename) VALUES (?, ?, ?)", (video, kind, filename)
+            )
+            self._db.execute("DELETE FROM features WHERE video = ? AND kind = ?", (video, kind))
+            self._db.executemany(
+                "INSERT INTO features (video, kind, frame_idx, row) VALUES (?, ?, ?, ?)",
+                [(video, kind, int(frame_idx), row) for row, frame_idx in enumerate(frame_idxs)]
+            )
+
+        if previous is not None:
+            try:
+                os.remove(os.path.join(video_dir, previous[0]))
+            except OSError:
+                # Still memory-mapped by a reader (e.g. on Windows); removed with the video on eviction
+                pass
+        self._touch(video)
+
+    def load_samples(self, video, sampler):
+        """
+        Returns the frame indices sampled from a video with a given sampling setting.
+
+        Args:
+            video (str): Video key returned by `video_key`.
+            sampler (str): Identifier of the sampling setting, e.g. "seek:10".
+
+        Returns:
+            tuple or None: (frame_idxs, fps) if cached, otherwise None.
+        """
+        row = self._db.execute(
+            "SELECT frame_idxs, fps FROM samples WHERE video = ? AND sampler = ?", (video, sampler)
+        ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def save_samples(self, video, sampler, frame_idxs, fps):
+        """Records the frame indices sampled from a video with a given sampling setting."""
+        with self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO samples (video, sampler, fps, frame_idxs) VALUES (?, ?, ?, ?)",
+                (video, sampler, float(fps), json.dumps([int(i) for i in frame_idxs]))
+            )
+        self._touch(video)
+
+    def _touch(self, video):
+        video_dir = os.path.join(self.cache_dir, video)
+        size = 0
+        if os.path.isdir(video_dir):
+            size = sum(entry.stat().st_size for entry in os.scandir(video_dir) if entry.is_file())
+        with self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO videos (video, bytes, last_used) VALUES (?, ?, ?)",
+                (video, size, time.time())
+            )
+
+    def evict(self, keep=()):
+        """
+        Removes least recently used videos until the cache fits in `max_bytes`.
+
+        Videos are chosen and their rows deleted in one write transaction, so two processes never
+        evict at the same time, and a video touched in the meantime is not evicted. Videos used in
+        the last `min_idle_seconds` are skipped, even if the cache then stays above `max_bytes`.
+        Files are removed after the transaction, once no row refers to them.
+
+        Args:
+            keep (iterable, optional): Video keys that must not be evicted, e.g. the one in use.
+
+        Returns:
+            int: Number of evicted videos.
+        """
+        idle_since = time.time() - self.min_idle_seconds
+        evicted = []
+
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            rows = self._db.execute("SELECT video, bytes, last_used FROM videos ORDER BY last_used ASC").fetchall()
+            total = sum(size for _, size, _ in rows)
+
+            for video, size, last_used in rows:
+                if total <= self.max_bytes or last_used > idle_since:
+                    break
+                if video in keep:
+                    continue
+
+                for table in ("features", "arrays", "samples", "videos"):
+                    self._db.execute(f"DELETE FROM {table} WHERE video = ?", (video,))
+                total -= size
+                evicted.append(video)
+            self._db.execute("COMMIT")
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+
+        for video in evicted:
+            shutil.rmtree(os.path.join(self.cache_dir, video), ignore_errors=True)
+        return len(evicted)
+
+    def close(self):
+        self._db.close()
@@ -1,8 +1,16 @@
 import os
 import csv
+import bisect
+import collections
+import itertools
+import logging
+import numpy as np
 import pandas as pd
 import av
 import cv2
+from tracing.tracer import traced
+
+logger = logging.getLogger(__name__)
 
 def _get_timestamp(frame_idx, fps):
     """
@@ -22,31 +30,347 @@ def _get_timestamp(frame_idx, fps):
     ms = int((seconds - int(seconds)) * 1000)
     return f"{h:02d}:{m:02d}:{s:02d}.{ms:03d}"
 
-def process_video(video_path, interval_sec=3):
+def _pts_to_frame_idx(pts, stream, fps):
+    """Converts a presentation timestamp of `stream` to the index of the frame shown at that time."""
+    start = stream.start_time or 0
+    return int(round(float((pts - start) * stream.time_base) * fps))
+
+def _frame_idx_to_pts(frame_idx, stream, fps):
+    """Converts a frame index to a presentation timestamp in the time base of `stream`."""
+    start = stream.start_time or 0
+    return start + int(frame_idx / fps / stream.time_base)
+
+def _decode_all(container, stream, interval):
+    for i, frame in enumerate(container.decode(stream)):
+        if i % interval == 0:
+            yield frame, i
+
+def _decode_seek(container, stream, fps, targets, seek_min_gap):
+    decoder = None
+    position = -1
+
+    for target in targets:
+        if target <= position:
+            continue
+
+        # Seeking restarts decoding at the previous keyframe, so nearby targets are reached faster by decoding forward
+        if decoder is None or target - position > seek_min_gap:
+            container.seek(_frame_idx_to_pts(target, stream, fps), stream=stream)
+            decoder = container.decode(stream)
+
+        landed = None
+        for frame in decoder:
+            if frame.pts is None:
+                continue
+            position = _pts_to_frame_idx(frame.pts, stream, fps)
+            if position >= target:
+                landed = frame
+                break
+
+        if landed is None:
+            return
+
+        yield landed, position
+
+def _decode_keyframes(container, stream, fps, interval):
+    stream.codec_context.skip_frame = "NONKEY"
+    target = 0
+
+    for frame in container.decode(stream):
+        if frame.pts is None:
+            continue
+        frame_idx = _pts_to_frame_idx(frame.pts, stream, fps)
+        if frame_idx >= target:
+            yield frame, frame_idx
+            target = (frame_idx // interval + 1) * interval
+
+# Size of the grayscale thumbnails compared by the adaptive sampler
+SCENE_THUMB_SIZE = (64, 36)
+
+def _decode_adaptive(container, stream, fps, max_gap, min_gap, threshold):
+    ref = None
+    last_idx = None
+    # Thumbnails of the last half second, to tell a finished transition from one in progress
+    recent = collections.deque(maxlen=max(1, int(fps / 2)))
+
+    for frame in container.decode(stream):
+        if frame.pts is None:
+            continue
+        frame_idx = _pts_to_frame_idx(frame.pts, stream, fps)
+        width, height = SCENE_THUMB_SIZE
+        thumb = frame.reformat(width=width, height=height, format="gray", interpolation="AREA").to_ndarray().astype(np.int16)
+
+        if last_idx is None or frame_idx - last_idx >= max_gap:
+            emit = True
+        else:
+            # Changes are measured against the last sample, so slow fades add up; a change is
+            # emitted once the picture has settled, so transitions are not sampled halfway
+            changed = np.abs(thumb - ref).mean() / 255 > threshold
+            settled = len(recent) == recent.maxlen and np.abs(thumb - recent[0]).mean() / 255 <= threshold / 2
+            emit = changed and settled and frame_idx - last_idx >= min_gap
+
+        if emit:
+            ref, last_idx = thumb, frame_idx
+            yield frame, frame_idx
+        recent.append(thumb)
+
+# Shorter side of the proxy frames the filters run on when full-resolution frames are spilled;
+# CLIP resizes to 224 anyway, and the SSIM and hash thumbnails are smaller still
+PROXY_SHORT_SIDE = 224
+
+def proxy_frame(frame):
+    """
+    Converts a decoded frame to a downscaled BGR proxy in one swscale pass.
+
+    Args:
+        frame (av.VideoFrame): Decoded frame.
+
+    Returns:
+        np.ndarray: BGR frame whose shorter side is `PROXY_SHORT_SIDE` (frames that are already smaller keep their size).
+    """
+    scale = min(1.0, PROXY_SHORT_SIDE / min(frame.width, frame.height))
+    width, height = max(2, round(frame.width * scale / 2) * 2), max(2, round(frame.height * scale / 2) * 2)
+    return frame.reformat(width=width, height=height, format="bgr24", interpolation="AREA").to_ndarray()
+
+def video_duration(video_path):
+    """
+    Reads the duration of a video from its container metadata, without decoding it.
+
+    Args:
+        video_path (str): Path to the input video file.
+
+    Returns:
+        float or None: Duration in seconds, or None if the metadata does not give it.
+    """
+    try:
+        with av.open(video_path) as container:
+            stream = container.streams.video[0]
+            if stream.duration is not None and stream.time_base is not None:
+                return float(stream.duration * stream.time_base)
+            if container.duration is not None:
+                return container.duration / av.time_base
+    except (av.FFmpegError, IndexError, OSError):
+        pass
+    return None
+
+def sampler_key(mode, interval_sec, scene_threshold=0.02, min_gap_sec=1.0):
+    """Identifier of a sampling setting, under which the sampled frame indices are cached."""
+    if mode == "adaptive":
+        return f"{mode}:{interval_sec}:{min_gap_sec}:{scene_threshold}"
+    return f"{mode}:{interval_sec}"
+
+def _iter_parallel(video_path, mode, interval, workers, plan, sequential, spill=None, proxies=False):
+    """Yields the samples of `iter_segments`, finishing with `sequential()` if a segment does not match its plan."""
+    from KeyFrameSelection.SegmentDecoding import iter_segments, SegmentMismatch
+
+    last = -1
+    # Without a spill, workers pass back only the proxies
+    segments = iter_segments(video_path, mode, interval, workers, plan, proxies=proxies,
+                             full_frames=spill is not None or not proxies)
+    try:
+        for frame, frame_idx, full in segments:
+            if spill is not None:
+                spill.put(frame_idx, full)
+            last = frame_idx
+            yield frame, frame_idx
+    except SegmentMismatch as e:
+        logger.warning("Parallel decoding of %s fell back to a single process: %s", video_path, e)
+        # Frames already yielded are decoded again but skipped; the spill keeps their first copy
+        frames, _ = sequential()
+        for frame, frame_idx in frames:
+            if frame_idx > last:
+                yield frame, frame_idx
+
+def iter_video(video_path, interval_sec=3, mode="decode", seek_min_gap=None, scene_threshold=0.02, min_gap_sec=1.0,
+               workers=1, spill=None, proxies=False):
+    """
+    Lazily samples frames from a video at fixed time intervals.
+
+    Frames are yielded as soon as they are decoded, so downstream filters can
+    drop them without the whole video ever being held in memory.
+
+    Four sampling modes are supported:
+        - "decode": decodes every frame and keeps one per interval (exact alignment, slowest).
+        - "seek": seeks to each target timestamp and decodes only from the preceding keyframe
+          up to the target, landing on the same frames as "decode" for constant frame rate videos.
+        - "keyframes": decodes keyframes only and takes the first one at or after each target
+          timestamp. Fastest, but samples are aligned to the GOP structure instead of the interval.
+        - "adaptive": decodes every frame and compares a small grayscale thumbnail of it with the
+          last sample. A frame is sampled when the mean absolute difference exceeds `scene_threshold`
+          and the picture has settled, at least `min_gap_sec` after the last sample; `interval_sec`
+          is the longest gap between samples, so static stretches still get a sample now and then.
+
+    Args:
+        video_path (str): Path to the input video file.
+        interval_sec (int, optional): Time interval in seconds between sampled frames. Defaults to 3.
+        mode (str, optional): One of "decode", "seek", "keyframes" or "adaptive". Defaults to "decode".
+        seek_min_gap (int, optional): In "seek" mode, targets at most this many frames ahead of the
+            current decoding position are reached by decoding forward instead of seeking. Defaults to 2 seconds of frames.
+        scene_threshold (float, optional): In "adaptive" mode, mean absolute difference (0-1) that counts as a content change. Defaults to 0.02.
+        min_gap_sec (float, optional): In "adaptive" mode, shortest time in seconds between samples. Defaults to 1.
+        workers (int, optional): With more than one, the "decode", "seek" and "keyframes" modes split the
+            video into keyframe-aligned segments sampled by that many processes (see `SegmentDecoding`).
+            The samples and their frame indices are the same as with one process; videos whose
+            timestamps do not allow an exact split, and the "adaptive" mode, are decoded in one process. Defaults to 1.
+        spill (FrameSpill, optional): If given, full-resolution frames are written to it and the generator
+            yields proxies (implies `proxies`).
+        proxies (bool, optional): Yield downscaled proxies (see `proxy_frame`) instead of full-resolution
+            frames, for filters that do not need every pixel. Defaults to False.
+
+    Returns:
+        tuple:
+            - frames (generator): Yields tuples (frame, frame_idx) for each sampled frame, where
+              frame_idx is the index of the frame actually decoded.
+            - fps (float): Frames per second of the input video.
+    """
+    if mode not in ("decode", "seek", "keyframes", "adaptive"):
+        raise ValueError(f"Unknown sampling mode: {mode}")
+    proxies = proxies or spill is not None
+
+    if workers > 1 and mode != "adaptive":
+        from KeyFrameSelection.SegmentDecoding import plan_segments
+
+        # More segments than workers, so a slow segment does not leave the other workers idle
+        plan = plan_segments(video_path, workers * 4)
+        if plan is not None:
+            fps = plan[0]
+            sequential = lambda: iter_video(video_path, interval_sec, mode=mode, seek_min_gap=seek_min_gap, spill=spill,
+                                            proxies=proxies)
+            return _iter_parallel(video_path, mode, max(1, int(fps * interval_sec)), workers, plan, sequential, spill, proxies), fps
+
+    container = av.open(video_path)
+    stream = container.streams.video[0]
+    stream.thread_type = "AUTO"
+    fps = float(stream.average_rate)
+    interval = max(1, int(fps * interval_sec))
+
+    if mode == "seek":
+        decoded = _decode_seek(container, stream, fps, itertools.count(0, interval), seek_min_gap if seek_min_gap is not None else int(fps * 2))
+    elif mode == "keyframes":
+        decoded = _decode_keyframes(container, stream, fps, interval)
+    elif mode == "adaptive":
+        decoded = _decode_adaptive(container, stream, fps, interval, max(1, int(fps * min_gap_sec)), scene_threshold)
+    else:
+        decoded = _decode_all(container, stream, interval)
+
+    def frames():
+        try:
+            for frame, frame_idx in decoded:
+                if spill is not None:
+                    spill.put(frame_idx, frame)
+                yield (proxy_frame(frame) if proxies else frame.to_ndarray(format="bgr24")), frame_idx
+        finally:
+            container.close()
+
+    return frames(), fps
+
+@traced(counts=lambda args, kwargs, result: {"frames_out": len(result[0])})
+def process_video(video_path, interval_sec=3, mode="decode", store=None, scene_threshold=0.02, min_gap_sec=1.0, workers=1,
+                  spill=None, proxies=False):
     """
     Samples frames from a video at fixed time intervals.
 
+    If `store` is backed by a persistent cache that already holds the frame indices sampled
+    with the same settings, the video is not decoded at all: the returned records carry `None`
+    instead of pixels, and frames are decoded later only if a filter needs a feature that is not
+    cached (see `FeatureStore`) or when the survivors are saved (see `materialize_records`).
+
     Args:
         video_path (str): Path to the input video file.
         interval_sec (int, optional): Time interval in seconds between sampled frames. Defaults to 3.
+        mode (str, optional): Sampling mode passed to `iter_video` ("decode", "seek", "keyframes" or "adaptive"). Defaults to "decode".
+        store (FeatureStore, optional): Feature store of this video, used to reuse and record the sampled frame indices.
+        scene_threshold (float, optional): Content change threshold of the "adaptive" mode. Defaults to 0.02.
+        min_gap_sec (float, optional): Shortest gap between samples in "adaptive" mode. Defaults to 1.
+        workers (int, optional): Number of processes decoding segments of the video in parallel (see `iter_video`). Defaults to 1.
+        spill (FrameSpill, optional): Receives the full-resolution frames; records then hold proxy frames (see `iter_video`).
+        proxies (bool, optional): Records hold proxy frames, without keeping the full-resolution ones anywhere. Defaults to False.
 
     Returns:
         tuple:
             - records (list): List of tuples (frame, frame_idx) for each sampled frame.
             - fps (float): Frames per second of the input video.
     """
+    sampler = sampler_key(mode, interval_sec, scene_threshold, min_gap_sec)
+    if store is not None:
+        cached = store.load_samples(sampler)
+        if cached is not None:
+            frame_idxs, fps = cached
+            return [(None, frame_idx) for frame_idx in frame_idxs], fps
+
+    frames, fps = iter_video(video_path, interval_sec, mode=mode, scene_threshold=scene_threshold, min_gap_sec=min_gap_sec,
+                             workers=workers, spill=spill, proxies=proxies)
+    records = list(frames)
+
+    if store is not None:
+        store.save_samples(sampler, [frame_idx for _, frame_idx in records], fps)
+    return records, fps
+
+def load_frames(video_path, frame_idxs, proxy=False):
+    """
+    Decodes specific frames of a video by seeking to them.
+
+    Args:
+        video_path (str): Path to the input video file.
+        frame_idxs (list): Indices of the frames to decode, in any order.
+        proxy (bool, optional): Return downscaled proxies (see `proxy_frame`) instead of full-resolution frames. Defaults to False.
+
+    Returns:
+        list: Frames in BGR format, in the same order as `frame_idxs`. Each entry is the first
+        decoded frame at or after the requested index.
+    """
     container = av.open(video_path)
     stream = container.streams.video[0]
+    stream.thread_type = "AUTO"
     fps = float(stream.average_rate)
-    interval = int(fps * interval_sec)
 
-    records = []
-    for i, frame in enumerate(container.decode(video=0)):
-        if i % interval == 0:
-            img = frame.to_ndarray(format="bgr24")
-            records.append((img, i))
+    landed_positions, landed_frames = [], []
+    try:
+        for frame, position in _decode_seek(container, stream, fps, sorted(set(frame_idxs)), int(fps * 2)):
+            landed_positions.append(position)
+            landed_frames.append(proxy_frame(frame) if proxy else frame.to_ndarray(format="bgr24"))
+    finally:
+        container.close()
 
-    return records, fps
+    frames = []
+    for frame_idx in frame_idxs:
+        i = bisect.bisect_left(landed_positions, frame_idx)
+        if i == len(landed_positions):
+            raise ValueError(f"Frame {frame_idx} is past the end of {video_path}")
+        frames.append(landed_frames[i])
+    return frames
+
+def materialize_records(records, video_path):
+    """
+    Decodes the pixels of records that only carry a frame index (see `process_video`).
+
+    Args:
+        records (list): List of tuples (frame or None, frame_idx).
+        video_path (str): Path to the video the records were sampled from.
+
+    Returns:
+        list: List of tuples (frame, frame_idx) with every frame decoded.
+    """
+    absent = [frame_idx for frame, frame_idx in records if frame is None]
+    if not absent:
+        return records
+
+    loaded = dict(zip(absent, load_frames(video_path, absent)))
+    return [(frame if frame is not None else loaded[frame_idx], frame_idx) for frame, frame_idx in records]
+
+def keyframe_name(frame_idx, fps):
+    """
+    Returns the file name of a keyframe, derived from its timestamp.
+
+    Args:
+        frame_idx (int): Index of the frame in the video.
+        fps (float): Frames per second of the video.
+
+    Returns:
+        str: File name such as "00-01-30-000.jpg".
+    """
+    sanitized_timestamp = _get_timestamp(frame_idx, fps).replace(':', '-').replace('.', '-')
+    return f"{sanitized_timestamp}.jpg"
 
 def save_records(records, output_dir, output_csv, fps):
     """
@@ -66,9 +390,7 @@ def save_records(records, output_dir, output_csv, fps):
     rows = []
     for i, (frame, frame_idx) in enumerate(records):
         timestamp = _get_timestamp(frame_idx, fps)
-        sanitized_timestamp = timestamp.replace(':', '-').replace('.', '-')
-        frame_name = f"{sanitized_timestamp}.jpg"
-        out_path = os.path.join(output_dir, frame_name)
+        out_path = os.path.join(output_dir, keyframe_name(frame_idx, fps))
         cv2.imwrite(out_path, frame, [int(cv2.IMWRITE_JPEG_QUALITY), 70])
         rows.append([out_path, timestamp])
 
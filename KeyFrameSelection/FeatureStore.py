@@ -0,0 +1,134 @@
+class FeatureStore:
+    """
+    Per-run memo of per-frame features (perceptual hashes, SSIM thumbnails, CLIP embeddings).
+
+    Features are keyed by feature kind and `frame_idx`, so a store must only be shared between
+    calls that operate on frames of the same video. Passing the same store to repeated
+    `hash_filter`/`clip_filter` calls means every frame is hashed, resized and embedded at most
+    once, and later calls only redo the comparisons.
+
+    When backed by a `FeatureCache`, features computed in earlier runs of the same video are
+    reused and new ones are persisted by `flush`. Records may then carry `None` instead of
+    pixels (see `process_video`); such frames are only decoded through `frame_loader` if one of
+    their features is missing from the cache.
+
+    Kinds requested with `persist=False` (e.g. SSIM statistics, which are cheap to derive from a
+    cached thumbnail but much larger than it) are only memoized for the lifetime of the store and
+    never written to the cache.
+
+    Features computed from downscaled proxy frames (see `proxy_frame`) differ slightly from those
+    of full-resolution frames, so such a store is given a `variant` that keeps the two apart in
+    the cache.
+
+    Args:
+        cache (FeatureCache, optional): Persistent cache to read from and write to.
+        video_key (str, optional): Cache key of the video, required when `cache` is given.
+        frame_loader (callable, optional): Takes a list of frame indices and returns the decoded frames.
+        variant (str, optional): Suffix of the cached feature kinds, naming the kind of frames features are computed from.
+
+    Attributes:
+        hits (int): Number of features served from the store.
+        misses (int): Number of features that had to be computed.
+    """
+
+    def __init__(self, cache=None, video_key=None, frame_loader=None, variant=None):
+        if cache is not None and video_key is None:
+            raise ValueError("video_key is required when a cache is given")
+
+        self.cache = cache
+        self.video_key = video_key
+        self.frame_loader = frame_loader
+        self.variant = variant
+        self._features = {}
+        self._dirty = set()
+        self.hits = 0
+        self.misses = 0
+
+    def _cache_kind(self, kind):
+        return kind if self.variant is None else f"{kind}@{self.variant}"
+
+    def _kind(self, kind, persist=True):
+        if kind not in self._features:
+            cached = persist and self.cache is not None
+            self._features[kind] = self.cache.load(self.video_key, self._cache_kind(kind)) if cached else {}
+        return self._features[kind]
+
+    def _load_missing_frames(self, missing):
+        absent = [frame_idx for frame_idx, frame in missing.items() if frame is None]
+        if not absent:
+            return
+        if self.frame_loader is None:
+            raise ValueError(f"Frames {absent} are not in memory and the store has no frame loader")
+
+        for frame_idx, frame in zip(absent, self.frame_loader(absent)):
+            missing[frame_idx] = frame
+
+    def get(self, kind, frame, frame_idx, compute, persist=True):
+        """
+        Returns the `kind` feature of a single frame, computing it on first use.
+
+        Args:
+            kind (str): Feature name, e.g. "phash64", "gray" or "clip".
+            frame (np.ndarray or None): Frame in BGR format, only used if the feature is missing.
+            frame_idx (int): Index of the frame in the video.
+            compute (callable): Takes a frame and returns its feature.
+            persist (bool, optional): Save the feature to the cache on `flush`. Defaults to True.
+
+        Returns:
+            The stored feature.
+        """
+        return self.get_many(kind, [(frame, frame_idx)], lambda frames: [compute(frames[0])], persist=persist)[0]
+
+    def get_many(self, kind, records, compute, persist=True):
+        """
+        Returns the `kind` feature of every record, computing only the missing ones in one call.
+
+        Args:
+            kind (str): Feature name, e.g. "phash64", "gray" or "clip".
+            records (list): List of (frame, frame_idx) tuples.
+            compute (callable): Takes a list of frames and returns one feature per frame.
+            persist (bool, optional): Save the features to the cache on `flush`; otherwise they are
+                only kept in memory. Use the same value for every call with the same kind. Defaults to True.
+
+        Returns:
+            list: Features in the same order as `records`.
+        """
+        cache = self._kind(kind, persist)
+
+        missing = {}
+        for frame, frame_idx in records:
+            if frame_idx not in cache:
+                missing.setdefault(frame_idx, frame)
+
+        if missing:
+            self._load_missing_frames(missing)
+            values = compute(list(missing.values()))
+            for frame_idx, value in zip(missing, values):
+                cache[frame_idx] = value
+            if persist:
+                self._dirty.add(kind)
+
+        self.misses += len(missing)
+        self.hits += len(records) - len(missing)
+        return [cache[frame_idx] for _, frame_idx in records]
+
+    def load_samples(self, sampler):
+        """Returns the cached (frame_idxs, fps) of a sampling setting, or None."""
+        if self.cache is None:
+            return None
+        return self.cache.load_samples(self.video_key, sampler)
+
+    def save_samples(self, sampler, frame_idxs, fps):
+        """Records the frame indices sampled with a sampling setting, if the store is cached."""
+        if self.cache is not None:
+            self.cache.save_samples(self.video_key, sampler, frame_idxs, fps)
+
+    def flush(self):
+        """Persists the features computed since the last flush and applies the cache size limit."""
+        if self.cache is None:
+            return
+
+        for kind in sorted(self._dirty):
+            self.cache.save(self.video_key, self._cache_kind(kind), self._features[kind])
+        self._dirty.clear()
+        self.cache.evict(keep=(self.video_key,))
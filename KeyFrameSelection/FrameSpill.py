@@ -0,0 +1,115 @@
+import tempfile
+import numpy as np
+import av
+
+# Pixel formats spilled as decoded; they convert back to exactly the BGR pixels `to_ndarray(format="bgr24")` gives
+_NATIVE_FORMATS = ("yuv420p", "nv12")
+
+class FrameSpill:
+    """
+    Full-resolution frames kept in a temporary file instead of memory, read back by frame index.
+
+    Frames are appended as raw bytes, in their decoded YUV 4:2:0 layout when possible, which is
+    half the size of BGR and skips the color conversion for frames that are never read back.
+    Reads go through a memory map of the file, so only the requested frames are paged in. The
+    file is deleted by `close` (or when the process exits).
+
+    Args:
+        dir (str, optional): Folder of the temporary file. Defaults to the system's temporary folder.
+
+    Attributes:
+        bytes (int): Size of the spilled frames.
+    """
+
+    def __init__(self, dir=None):
+        self._file = tempfile.TemporaryFile(prefix="frames-", suffix=".spill", dir=dir)
+        self._entries = {}
+        self.bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, frame_idx):
+        return frame_idx in self._entries
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def put(self, frame_idx, frame):
+        """
+        Appends a frame to the spill file. A frame index that is already spilled is skipped, so
+        decoding a stretch of the video again (e.g. after a parallel decoding fallback) does not
+        store its frames twice.
+
+        Args:
+            frame_idx (int): Index of the frame in the video.
+            frame (av.VideoFrame or np.ndarray): Decoded frame, or a frame in BGR format.
+        """
+        if frame_idx in self._entries:
+            return
+
+        if isinstance(frame, av.VideoFrame):
+            if frame.format.name in _NATIVE_FORMATS:
+                pixels, colors = frame.to_ndarray(), (frame.format.name, frame.colorspace, frame.color_range)
+            else:
+                pixels, colors = frame.to_ndarray(format="bgr24"), None
+        else:
+            pixels, colors = frame, None
+
+        pixels = np.ascontiguousarray(pixels, dtype=np.uint8)
+        self._file.seek(self.bytes)
+        self._file.write(pixels.tobytes())
+        self._entries[frame_idx] = (self.bytes, pixels.shape, colors)
+        self.bytes += pixels.nbytes
+
+    def load(self, frame_idxs):
+        """
+        Reads frames back from the spill file.
+
+        Args:
+            frame_idxs (list): Indices of spilled frames.
+
+        Returns:
+            list: Frames in BGR format, in the same order as `frame_idxs`.
+        """
+        if not frame_idxs:
+            return []
+
+        self._file.flush()
+        spilled = np.memmap(self._file, dtype=np.uint8, mode="r", shape=(self.bytes,))
+        frames = []
+        for frame_idx in frame_idxs:
+            offset, shape, colors = self._entries[frame_idx]
+            pixels = spilled[offset:offset + int(np.prod(shape))].reshape(shape)
+            if colors is None:
+                frames.append(np.array(pixels))
+            else:
+                pixel_format, colorspace, color_range = colors
+                frame = av.VideoFrame.from_ndarray(np.ascontiguousarray(pixels), format=pixel_format)
+                frames.append(frame.reformat(format="bgr24", src_colorspace=colorspace,
+                                             src_color_range=color_range).to_ndarray())
+        del spilled
+        return frames
+
+    def materialize(self, records):
+        """
+        Replaces the frames of records with their full-resolution version.
+
+        Args:
+            records (list): List of tuples (frame, frame_idx), e.g. keyframes selected on proxy frames.
+
+        Returns:
+            list: List of tuples (frame, frame_idx); frames that were never spilled become `None`,
+            to be decoded by `materialize_records`.
+        """
+        frame_idxs = [frame_idx for _, frame_idx in records if frame_idx in self._entries]
+        loaded = dict(zip(frame_idxs, self.load(frame_idxs)))
+        return [(loaded.get(frame_idx), frame_idx) for _, frame_idx in records]
+
+    def close(self):
+        """Deletes the spill file."""
+        self._entries.clear()
+        self._file.close()
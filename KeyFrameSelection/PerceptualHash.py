@@ -0,0 +1,107 @@
+import cv2
+import numpy as np
+import scipy.fftpack
+from PIL import Image
+
+HASH_SIZE = 8
+_THUMB_SIZE = HASH_SIZE * 4
+
+def hash_thumbnail(frame):
+    """
+    Shrinks a frame to the 32x32 grayscale thumbnail the perceptual hash is computed from.
+
+    The thumbnail is made with PIL exactly like `imagehash.phash` makes it (grayscale conversion,
+    then a Lanczos resize), so hashes match imagehash bit for bit.
+
+    Args:
+        frame (np.ndarray): Frame in BGR format.
+
+    Returns:
+        np.ndarray: float64 array of shape (32, 32).
+    """
+    image = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)).convert("L")
+    return np.asarray(image.resize((_THUMB_SIZE, _THUMB_SIZE), Image.LANCZOS), dtype=np.float64)
+
+def phash64(thumbnails):
+    """
+    Computes 64-bit perceptual hashes of a stack of thumbnails in one batched DCT.
+
+    Follows `imagehash.phash`: the 8x8 lowest frequencies of the 2D DCT-II are compared with
+    their median, and the bits are packed row by row into one integer, so `f"{h:016x}"` is the
+    hex string imagehash prints for the same frame. The DCT is the same `scipy.fftpack.dct`,
+    applied along the axes of the whole stack at once.
+
+    Args:
+        thumbnails (np.ndarray or list): Stack of 32x32 thumbnails from `hash_thumbnail`.
+
+    Returns:
+        np.ndarray: uint64 array with one hash per thumbnail.
+    """
+    thumbnails = np.asarray(thumbnails, dtype=np.float64).reshape(-1, _THUMB_SIZE, _THUMB_SIZE)
+    dct = scipy.fftpack.dct(scipy.fftpack.dct(thumbnails, axis=1), axis=2)
+    flat = dct[:, :HASH_SIZE, :HASH_SIZE].reshape(len(thumbnails), -1)
+    bits = flat > np.median(flat, axis=1, keepdims=True)
+    return np.packbits(bits, axis=1).view(">u8").ravel().astype(np.uint64)
+
+_BYTE_BITS = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+def hamming_distance(hashes, h):
+    """
+    Returns the number of differing bits between packed hashes and a hash.
+
+    Args:
+        hashes (np.ndarray): uint64 array of hashes.
+        h (int or np.uint64): Hash to compare with.
+
+    Returns:
+        np.ndarray: Distance of every hash in `hashes` to `h`.
+    """
+    xor = np.bitwise_xor(np.asarray(hashes, dtype=np.uint64), np.uint64(h))
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(xor)
+    return _BYTE_BITS[xor.reshape(-1, 1).view(np.uint8)].sum(axis=1).reshape(xor.shape)
+
+class HammingIndex:
+    """
+    Multi-index hashing over 64-bit hashes, answering "is any stored hash within `radius` bits?".
+
+    Each hash is split into `radius + 1` disjoint bit ranges with one lookup table each. By the
+    pigeonhole principle a hash within `radius` bits of a stored one matches it exactly on at
+    least one range, so only the hashes sharing a range value are compared in full. Lookups
+    stay close to constant time as hashes are added, instead of growing with their number.
+
+    Args:
+        radius (int): Largest Hamming distance that counts as a match.
+    """
+
+    def __init__(self, radius):
+        self.radius = max(0, int(radius))
+        chunks = min(self.radius + 1, 64)
+        bounds = np.linspace(0, 64, chunks + 1).astype(int)
+        self._masks = [(np.uint64((1 << (hi - lo)) - 1), np.uint64(lo)) for lo, hi in zip(bounds[:-1], bounds[1:])]
+        self._tables = [{} for _ in self._masks]
+        self._hashes = []
+
+    def __len__(self):
+        return len(self._hashes)
+
+    def _keys(self, h):
+        h = np.uint64(h)
+        return [int((h >> shift) & mask) for mask, shift in self._masks]
+
+    def contains_near(self, h):
+        """Returns True if a stored hash is within `radius` bits of `h`."""
+        candidates = set()
+        for table, key in zip(self._tables, self._keys(h)):
+            candidates.update(table.get(key, ()))
+        if not candidates:
+            return False
+        stored = np.array([self._hashes[i] for i in candidates], dtype=np.uint64)
+        return bool((hamming_distance(stored, h) <= self.radius).any())
+
+    def add(self, h):
+        """Stores a hash."""
+        i = len(self._hashes)
+        self._hashes.append(np.uint64(h))
+        for table, key in zip(self._tables, self._keys(h)):
+            table.setdefault(key, []).append(i)
@@ -0,0 +1,114 @@
+from KeyFrameSelection.FeatureExtraction import iter_video, load_frames, sampler_key, PROXY_SHORT_SIDE
+from KeyFrameSelection.FeatureStore import FeatureStore
+from KeyFrameSelection.FeatureCache import FeatureCache
+from KeyFrameSelection.Embedders import auto_batch_size
+from KeyFrameSelection.Similarties import hash_filter_stream, clip_filter_stream
+
+def open_feature_store(video_path, cache_dir=None, cache_max_bytes=2 * 1024 ** 3, proxies=False):
+    """
+    Creates the feature store of a video, optionally backed by a persistent feature cache.
+
+    Args:
+        video_path (str): Path to the input video file.
+        cache_dir (str, optional): Directory of the persistent cache. Defaults to None (in-memory store only).
+        cache_max_bytes (int, optional): Size limit of the persistent cache in bytes. Defaults to 2 GiB.
+        proxies (bool, optional): Features are computed from proxy frames (records sampled with `proxies` or a
+            `FrameSpill`), so frames missing from the cache are decoded as proxies too. Defaults to False.
+
+    Returns:
+        FeatureStore: Store to pass to `process_video`, the filters and `stream_keyframes`.
+    """
+    variant = f"proxy{PROXY_SHORT_SIDE}" if proxies else None
+    if cache_dir is None:
+        return FeatureStore(variant=variant)
+
+    cache = FeatureCache(cache_dir, max_bytes=cache_max_bytes)
+    return FeatureStore(
+        cache=cache,
+        video_key=cache.video_key(video_path),
+        frame_loader=lambda frame_idxs: load_frames(video_path, frame_idxs, proxy=proxies),
+        variant=variant
+    )
+
+def _sample_frames(video_path, interval_sec, mode, store, scene_threshold=0.02, min_gap_sec=1.0, workers=1, spill=None,
+                   proxies=False):
+    """Like `process_video`, but yields the samples lazily and records them in the store once fully decoded."""
+    sampler = sampler_key(mode, interval_sec, scene_threshold, min_gap_sec)
+    cached = store.load_samples(sampler) if store is not None else None
+    if cached is not None:
+        frame_idxs, fps = cached
+        return ((None, frame_idx) for frame_idx in frame_idxs), fps
+
+    frames, fps = iter_video(video_path, interval_sec, mode=mode, scene_threshold=scene_threshold, min_gap_sec=min_gap_sec,
+                             workers=workers, spill=spill, proxies=proxies)
+    if store is None:
+        return frames, fps
+
+    def recorded():
+        frame_idxs = []
+        for frame, frame_idx in frames:
+            frame_idxs.append(frame_idx)
+            yield frame, frame_idx
+        store.save_samples(sampler, frame_idxs, fps)
+
+    return recorded(), fps
+
+def stream_keyframes(video_path, interval_sec=3, max_in_flight=16, mode="decode",
+                     hash_threshold=5, ssim_threshold=0.90, ssim_compare_window=3,
+                     clip_threshold=0.85, clip_compare_window=5, batch_size=None, store=None, embedder=None,
+                     scene_threshold=0.02, min_gap_sec=1.0, decode_workers=1, spill=None, proxies=False):
+    """
+    Runs decoding, hash/SSIM filtering and CLIP filtering as chained generator stages.
+
+    Each stage holds at most `max_in_flight` frames at a time (proxies with `proxies` or a `spill`), and only the
+    frames that survive both filters are collected, so peak memory does not grow with the
+    length of the video.
+
+    Args:
+        video_path (str): Path to the input video file.
+        interval_sec (int, optional): Time interval in seconds between sampled frames. Defaults to 3.
+        max_in_flight (int, optional): Maximum number of frames buffered by each stage. Defaults to 16.
+        mode (str, optional): Sampling mode passed to `iter_video` ("decode", "seek", "keyframes" or "adaptive"). Defaults to "decode".
+        hash_threshold (int, optional): Maximum Hamming distance between perceptual hashes to consider frames as duplicates. Defaults to 5.
+        ssim_threshold (float, optional): Maximum SSIM score to consider frames as distinct. Defaults to 0.90.
+        ssim_compare_window (int, optional): Number of most recent accepted frames to compare against using SSIM. Defaults to 3.
+        clip_threshold (float, optional): Max cosine similarity of CLIP embeddings to keep a frame distinct. Defaults to 0.85.
+        clip_compare_window (int, optional): How many past frames to compare against with CLIP. Defaults to 5.
+        batch_size (int, optional): Number of frames to embed per CLIP batch, capped by `max_in_flight`. Defaults to `auto_batch_size()`.
+        store (FeatureStore, optional): Store that memoizes hashes, thumbnails and embeddings of the frames seen. Defaults to a fresh store.
+        embedder (ClipEmbedder, optional): CLIP backend to embed with. Defaults to `get_embedder()`.
+        scene_threshold (float, optional): Content change threshold of the "adaptive" mode. Defaults to 0.02.
+        min_gap_sec (float, optional): Shortest gap between samples in "adaptive" mode. Defaults to 1.
+        decode_workers (int, optional): Number of processes decoding segments of the video in parallel (see `iter_video`). Defaults to 1.
+        spill (FrameSpill, optional): Receives the full-resolution frames while the filters run on proxies (see `iter_video`);
+            the returned records then hold proxies, to be swapped with `FrameSpill.materialize`.
+        proxies (bool, optional): Filter on proxies without keeping the full-resolution frames; the returned records
+            hold proxies, and full-resolution keyframes are decoded again (see `materialize_records`). Defaults to False.
+
+    Returns:
+        tuple:
+            - records (list): List of tuples (frame, frame_idx) for the surviving keyframes. Frames are
+              `None` when the samples were served from the store's persistent cache (see `process_video`).
+            - fps (float): Frames per second of the input video.
+    """
+    frames, fps = _sample_frames(video_path, interval_sec, mode, store, scene_threshold, min_gap_sec, decode_workers, spill,
+                                 proxies)
+
+    distinct = hash_filter_stream(
+        frames,
+        hash_threshold=hash_threshold,
+        ssim_threshold=ssim_threshold,
+        ssim_compare_window=ssim_compare_window,
+        max_in_flight=max_in_flight,
+        store=store
+    )
+    distinct = clip_filter_stream(
+        distinct,
+        similarity_threshold=clip_threshold,
+        compare_window=clip_compare_window,
+        batch_size=min(batch_size or auto_batch_size(), max_in_flight),
+        store=store,
+        embedder=embedder
+    )
+
+    return list(distinct), fps
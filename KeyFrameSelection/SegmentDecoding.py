@@ -0,0 +1,197 @@
+import collections
+import itertools
+import multiprocessing
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import av
+from KeyFrameSelection.FeatureExtraction import _decode_seek, _pts_to_frame_idx, _frame_idx_to_pts, proxy_frame
+
+# Sampling modes whose samples depend only on the frame index, so segments can be sampled independently
+PARALLEL_MODES = ("decode", "seek", "keyframes")
+
+class SegmentMismatch(Exception):
+    """Raised when a segment did not decode to the frames its plan expected."""
+
+def plan_segments(video_path, segments):
+    """
+    Splits a video into keyframe-aligned segments by reading its packets, without decoding.
+
+    The video is only split if its timestamps map to the frame indices 0..n-1 without gaps or
+    repeats. Then the index computed from a frame's timestamp equals its position in the decoded
+    sequence, so every segment can number its frames on its own and get the same global frame
+    indices as a single decoding pass.
+
+    Args:
+        video_path (str): Path to the input video file.
+        segments (int): Number of segments wanted.
+
+    Returns:
+        tuple or None: (fps, keyframes, bounds), where keyframes is the sorted list of keyframe
+        indices and bounds the list of (start, end) frame index ranges, each starting on a
+        keyframe; None if the video cannot be split.
+    """
+    with av.open(video_path) as container:
+        stream = container.streams.video[0]
+        fps = float(stream.average_rate or 0)
+        if fps <= 0:
+            return None
+
+        idxs, keyframes = [], []
+        for packet in container.demux(stream):
+            if packet.pts is None:
+                continue
+            frame_idx = _pts_to_frame_idx(packet.pts, stream, fps)
+            idxs.append(frame_idx)
+            if packet.is_keyframe:
+                keyframes.append(frame_idx)
+
+    total = len(idxs)
+    if total == 0 or not np.array_equal(np.sort(idxs), np.arange(total)):
+        return None
+
+    keyframes = sorted(set(keyframes))
+    starts = [0]
+    for s in range(1, segments):
+        i = np.searchsorted(keyframes, s * total / segments)
+        if i < len(keyframes) and keyframes[i] > starts[-1]:
+            starts.append(int(keyframes[i]))
+    if len(starts) < 2:
+        return None
+    return fps, keyframes, list(zip(starts, starts[1:] + [total]))
+
+def _share(frames):
+    """Copies frames of one shape and dtype into a new shared memory block and returns its description."""
+    if not frames:
+        return None
+    block = shared_memory.SharedMemory(create=True, size=len(frames) * frames[0].nbytes)
+    np.ndarray((len(frames),) + frames[0].shape, dtype=np.uint8, buffer=block.buf)[:] = frames
+    description = (block.name, (len(frames),) + frames[0].shape)
+    block.close()
+    return description
+
+def _take(shared):
+    """Copies frames out of a shared memory block made by `_share` and frees the block."""
+    if shared is None:
+        return []
+    name, shape = shared
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        return list(np.ndarray(shape, dtype=np.uint8, buffer=block.buf).copy())
+    finally:
+        block.close()
+        block.unlink()
+
+def _sample_segment(video_path, mode, interval, start, end, previous_keyframe, keyframes, proxies=False, full_frames=True):
+    """
+    Decodes and samples the frames with index in [start, end) in a worker process.
+
+    Returns:
+        tuple: (frame_idxs, shared, shared_proxies), where `shared` describes the sampled BGR frames in
+        shared memory if `full_frames` is set, and `shared_proxies` their proxies (see `proxy_frame`)
+        if `proxies` is set.
+
+    Raises:
+        SegmentMismatch: If the frames decoded are not the ones the plan expected.
+    """
+    container = av.open(video_path)
+    stream = container.streams.video[0]
+    stream.thread_type = "AUTO"
+    fps = float(stream.average_rate)
+    frame_idxs, frames, small = [], [], []
+
+    def keep(frame, frame_idx):
+        frame_idxs.append(frame_idx)
+        if full_frames:
+            frames.append(frame.to_ndarray(format="bgr24"))
+        if proxies:
+            small.append(proxy_frame(frame))
+
+    try:
+        if mode == "keyframes":
+            # Same rule as `_decode_keyframes`: a keyframe is sampled when it is the first one past a multiple of `interval`
+            stream.codec_context.skip_frame = "NONKEY"
+            container.seek(_frame_idx_to_pts(start, stream, fps), stream=stream)
+            decoded = []
+            for frame in container.decode(stream):
+                if frame.pts is None:
+                    continue
+                frame_idx = _pts_to_frame_idx(frame.pts, stream, fps)
+                if frame_idx >= end:
+                    break
+                if frame_idx < start:
+                    continue
+                decoded.append(frame_idx)
+                if previous_keyframe is None or frame_idx // interval > previous_keyframe // interval:
+                    keep(frame, frame_idx)
+                previous_keyframe = frame_idx
+            if decoded != keyframes:
+                raise SegmentMismatch(f"keyframes {start}-{end} differ from the packet flags")
+        else:
+            # "decode" and "seek" land exactly on the multiples of `interval` when frame indices have no gaps
+            targets = list(range(-(-start // interval) * interval, end, interval))
+            for frame, position in _decode_seek(container, stream, fps, targets, int(fps * 2)):
+                keep(frame, position)
+            if frame_idxs != targets:
+                raise SegmentMismatch(f"frames {start}-{end} did not land on their targets")
+    finally:
+        container.close()
+
+    return frame_idxs, _share(frames), _share(small)
+
+def iter_segments(video_path, mode, interval, workers, plan, proxies=False, full_frames=True):
+    """
+    Samples the segments of a plan from `plan_segments` in a pool of processes, in order.
+
+    At most `workers + 1` segments are decoded ahead of the consumer, so memory stays bounded
+    for long videos. Workers pass the sampled frames back through shared memory instead of
+    pickling them.
+
+    Args:
+        video_path (str): Path to the input video file.
+        mode (str): One of `PARALLEL_MODES`.
+        interval (int): Number of frames between samples.
+        workers (int): Number of worker processes.
+        plan (tuple): Result of `plan_segments`.
+        proxies (bool, optional): Also pass back downscaled proxies of the frames (see `proxy_frame`). Defaults to False.
+        full_frames (bool, optional): Pass back the BGR frames; only proxies are passed back if unset,
+            which requires `proxies`. Defaults to True.
+
+    Yields:
+        tuple: (frame, frame_idx, full) for each sampled frame, in frame order. `frame` is the proxy
+        if `proxies` is set, otherwise the BGR frame; `full` is the BGR frame, or None if `full_frames` is unset.
+
+    Raises:
+        SegmentMismatch: If a segment decoded differently than planned; frames yielded before are correct.
+    """
+    if not (proxies or full_frames):
+        raise ValueError("Segments must pass back proxies, full frames or both")
+    _, keyframes, bounds = plan
+
+    def job(start, end):
+        i = np.searchsorted(keyframes, start)
+        previous = int(keyframes[i - 1]) if i > 0 else None
+        inside = [int(k) for k in keyframes[i:np.searchsorted(keyframes, end)]]
+        return pool.submit(_sample_segment, video_path, mode, interval, start, end, previous, inside, proxies, full_frames)
+
+    # Spawned rather than forked, so the workers do not inherit the threads of torch and the decoder
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        remaining = iter(bounds)
+        pending = collections.deque(job(start, end) for start, end in itertools.islice(remaining, workers + 1))
+        try:
+            while pending:
+                frame_idxs, shared, shared_proxies = pending.popleft().result()
+                frames = _take(shared) if full_frames else [None] * len(frame_idxs)
+                small = _take(shared_proxies) if proxies else frames
+                following = next(remaining, None)
+                if following is not None:
+                    pending.append(job(*following))
+                yield from zip(small, frame_idxs, frames)
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+            # Free the blocks of segments that were decoded but never consumed
+            for future in pending:
+                if not future.cancelled() and future.exception() is None:
+                    _take(future.result()[1])
+                    _take(future.result()[2])
@@ -1,21 +1,101 @@
 import cv2
-from PIL import Image
-import imagehash
-from skimage.metrics import structural_similarity as ssim
-from sklearn.metrics.pairwise import cosine_similarity
-import torch
-from transformers import CLIPProcessor, CLIPModel
 import numpy as np
 from concurrent.futures import ThreadPoolExecutor
-
-clip_model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32", trust_remote_code=True, use_safetensors=True)
-clip_processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
-clip_model.eval()
+from KeyFrameSelection.FeatureStore import FeatureStore
+from KeyFrameSelection.PerceptualHash import hash_thumbnail, phash64, hamming_distance, HammingIndex
+from KeyFrameSelection.StructuralSimilarity import SsimStats, SsimWindow
+from KeyFrameSelection.Embedders import get_embedder, auto_batch_size
+from tracing.tracer import span, traced, frames_in_out
 
 def _resize_gray(frame):
     return cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), (128, 128))
 
-def hash_filter(records, hash_threshold=5, ssim_threshold=0.90, ssim_compare_window=3):
+def _compute_hashes(frames, executor):
+    """Hashes a batch of frames: thumbnails in parallel (OpenCV releases the GIL), then one batched DCT."""
+    return list(phash64(list(executor.map(hash_thumbnail, frames))))
+
+def _chunks(records, size):
+    """Groups an iterable of records into lists of at most `size` items."""
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def hash_filter_stream(records, hash_threshold=5, ssim_threshold=0.90, ssim_compare_window=3, max_in_flight=16, store=None):
+    """
+    Streaming variant of `hash_filter` that yields distinct frames as they are found.
+
+    Records are pulled from `records` in chunks of at most `max_in_flight` frames, and only
+    the 128x128 grayscale thumbnails of the last `ssim_compare_window` accepted frames are kept,
+    so memory stays bounded regardless of the number of input frames. The SSIM statistics of a
+    thumbnail are computed once per store (see `SsimStats`), and a candidate is scored against the whole window in one
+    pass (see `SsimWindow`), matching `skimage.metrics.structural_similarity`.
+
+    Perceptual hashes of a chunk are computed in one batched DCT as 64-bit integers (see
+    `phash64`), and earlier hashes are looked up through a `HammingIndex`, so the duplicate
+    check does not slow down as the number of accepted frames grows. Thumbnails missing from
+    the store are also fetched per chunk, so frames that are not in memory are decoded with one
+    call of the store's frame loader per chunk rather than one per frame.
+
+    When tracing is on, the work on each chunk is recorded as a span with its frames in and out.
+    Spans are closed before the chunk's frames are yielded, so they do not include the time the
+    consumer spends on them.
+
+    Args:
+        records (iterable): Iterable of tuples (frame, frame_idx), e.g. the generator returned by `iter_video`.
+        hash_threshold (int, optional): Maximum Hamming distance between perceptual hashes to consider frames as duplicates. Defaults to 5.
+        ssim_threshold (float, optional): Maximum SSIM score to consider frames as distinct. Defaults to 0.90.
+        ssim_compare_window (int, optional): Number of most recent accepted frames to compare against using SSIM. Defaults to 3.
+        max_in_flight (int, optional): Maximum number of frames pulled from `records` at once. Defaults to 16.
+        store (FeatureStore, optional): Store to read and memoize hashes, thumbnails and SSIM statistics. Defaults to a fresh store.
+
+    Yields:
+        tuple: (frame, frame_idx) for each distinct keyframe.
+    """
+    store = store if store is not None else FeatureStore()
+    seen_hashes = HammingIndex(hash_threshold)
+    recent_grays = SsimWindow(ssim_compare_window)
+
+    def filter_chunk(chunk, executor):
+        hashes = store.get_many("phash64", chunk, lambda frames: _compute_hashes(frames, executor))
+
+        # The hash check does not depend on the SSIM outcome, so it is decided for the whole
+        # chunk first and the thumbnails of the survivors are fetched together
+        survivors = []
+        for record, img_hash in zip(chunk, hashes):
+            if not seen_hashes.contains_near(img_hash):
+                seen_hashes.add(img_hash)
+                survivors.append(record)
+        if not survivors:
+            return []
+
+        grays = store.get_many("gray", survivors, lambda frames: list(executor.map(_resize_gray, frames)))
+        # Statistics are derived from the thumbnails, so they are memoized for the run but not cached on disk
+        all_stats = store.get_many("ssim_stats", [(gray, frame_idx) for gray, (_, frame_idx) in zip(grays, survivors)],
+                                   lambda grays: [SsimStats(gray) for gray in grays], persist=False)
+        kept = []
+        for record, stats in zip(survivors, all_stats):
+            if (recent_grays.scores(stats) > ssim_threshold).any():
+                continue
+
+            recent_grays.append(stats)
+            kept.append(record)
+        return kept
+
+    with ThreadPoolExecutor() as executor:
+        for chunk in _chunks(records, max(1, max_in_flight)):
+            with span("hash_filter_stream") as event:
+                kept = filter_chunk(chunk, executor)
+                if event is not None:
+                    event.update(frames_in=len(chunk), frames_out=len(kept))
+            yield from kept
+
+@traced(counts=frames_in_out)
+def hash_filter(records, hash_threshold=5, ssim_threshold=0.90, ssim_compare_window=3, store=None):
     """
     Filters out visually similar frames using perceptual hashing and SSIM.
 
@@ -24,59 +104,117 @@ def hash_filter(records, hash_threshold=5, ssim_threshold=0.90, ssim_compare_win
         hash_threshold (int, optional): Maximum Hamming distance between perceptual hashes to consider frames as duplicates. Defaults to 5.
         ssim_threshold (float, optional): Maximum SSIM score to consider frames as distinct. Defaults to 0.90.
         ssim_compare_window (int, optional): Number of most recent accepted frames to compare against using SSIM. Defaults to 3.
+        store (FeatureStore, optional): Store to read and memoize hashes, thumbnails and SSIM statistics, shared across calls on the same video. Defaults to a fresh store.
 
     Returns:
         list: List of tuples (frame, frame_idx) representing filtered, distinct keyframes.
     """
-    resized_cache = {idx: _resize_gray(frame) for frame, idx in records}
+    return list(hash_filter_stream(
+        records,
+        hash_threshold=hash_threshold,
+        ssim_threshold=ssim_threshold,
+        ssim_compare_window=ssim_compare_window,
+        max_in_flight=max(1, len(records)),
+        store=store
+    ))
 
-    def compute_hash(frame):
-        return imagehash.phash(Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)))
+def _get_clip_embeddings(frames, embedder=None):
+    """
+    Computes the CLIP image embeddings for a batch of video frames.
 
-    with ThreadPoolExecutor() as executor:
-        hashes = list(executor.map(lambda x: compute_hash(x[0]), records))
+    Args:
+        frames (list): Video frames in BGR format (as returned by OpenCV).
+        embedder (ClipEmbedder, optional): Backend to embed with. Defaults to `get_embedder()`.
 
-    seen_hashes = []
-    distinct = []
+    Returns:
+        np.ndarray: A 2D NumPy array with one normalized CLIP image embedding per frame.
+    """
+    return (embedder or get_embedder()).embed(frames)
 
-    for i, (frame, frame_idx) in enumerate(records):
-        img_hash = hashes[i]
+def _normalize_rows(embeddings):
+    """Returns a contiguous float32 copy of `embeddings` with L2-normalized rows."""
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    norms = np.sqrt(np.einsum("ij,ij->i", embeddings, embeddings))
+    norms[norms == 0.0] = 1.0
+    return embeddings / norms[:, np.newaxis]
 
-        if any(abs(img_hash - h) <= hash_threshold for h in seen_hashes):
-            continue
-        seen_hashes.append(img_hash)
+def _select_distinct(embeddings, window, similarity_threshold, compare_window):
+    """
+    Decides which of a batch of embeddings are distinct from the recently accepted ones.
 
-        is_distinct = True
-        resized_gray = resized_cache[frame_idx]
-        for _, prev_idx in distinct[-ssim_compare_window:]:
-            prev_gray = resized_cache[prev_idx]
-            if ssim(resized_gray, prev_gray) > ssim_threshold:
-                is_distinct = False
-                break
+    All cosine similarities the batch can need (against the current window and against the
+    other frames of the batch) are computed with a single matrix product; the sequential
+    accept/reject pass then only indexes into that matrix. Rows are re-normalized the same
+    way `sklearn.metrics.pairwise.cosine_similarity` does, so decisions match the pairwise
+    comparison it replaces.
 
-        if is_distinct:
-            distinct.append((frame, frame_idx))
+    Args:
+        embeddings (list or np.ndarray): CLIP embeddings of the batch, in frame order.
+        window (np.ndarray or None): Normalized embeddings of the last accepted frames, oldest first.
+        similarity_threshold (float): Max cosine similarity to keep frame distinct.
+        compare_window (int): How many past frames to compare against.
 
-    return distinct
+    Returns:
+        tuple:
+            - keep (np.ndarray): Boolean mask of the distinct frames in the batch.
+            - window (np.ndarray): Updated window of the last `compare_window` accepted embeddings.
+    """
+    candidates = _normalize_rows(embeddings)
+    if window is None:
+        window = np.empty((0, candidates.shape[1]), dtype=np.float32)
 
-def _get_clip_embeddings(frames):
+    pool = np.concatenate([window, candidates])
+    similarities = candidates @ pool.T
+
+    accepted = list(range(len(window)))
+    keep = np.zeros(len(candidates), dtype=bool)
+
+    for i in range(len(candidates)):
+        recent = accepted[-compare_window:]
+        if not recent or similarities[i, recent].max() <= similarity_threshold:
+            keep[i] = True
+            accepted.append(len(window) + i)
+
+    return keep, pool[accepted[-compare_window:]]
+
+def clip_filter_stream(records, similarity_threshold=0.85, compare_window=5, batch_size=None, store=None, embedder=None):
     """
-    Computes the CLIP image embedding for a given video frame.
+    Streaming variant of `clip_filter` that embeds and filters one batch at a time.
+
+    Only the current batch of frames and the embeddings of the last `compare_window`
+    accepted frames are held in memory. Each batch is compared against the window with
+    one matrix product (see `_select_distinct`), so large windows stay cheap.
+
+    When tracing is on, each batch is recorded as a span like in `hash_filter_stream`.
 
     Args:
-        frame (np.ndarray): A single video frame in BGR format (as returned by OpenCV).
+        records (iterable): Iterable of (frame, frame_idx) tuples, e.g. the output of `hash_filter_stream`.
+        similarity_threshold (float): Max cosine similarity to keep frame distinct.
+        compare_window (int): How many past frames to compare against.
+        batch_size (int, optional): Number of frames to embed per batch, which also bounds the frames in flight.
+            Defaults to `auto_batch_size()`.
+        store (FeatureStore, optional): Store to read and memoize embeddings. Defaults to a fresh store.
+        embedder (ClipEmbedder, optional): Backend to embed with. Defaults to `get_embedder()`.
 
-    Returns:
-        np.ndarray: A normalized 1D NumPy array representing the CLIP image embedding.
+    Yields:
+        tuple: (frame, frame_idx) for each frame with distinct content.
     """
-    images = [Image.fromarray(cv2.cvtColor(f, cv2.COLOR_BGR2RGB)) for f in frames]
-    inputs = clip_processor(images=images, return_tensors="pt", padding=True)
-    with torch.no_grad():
-        features = clip_model.get_image_features(**inputs)
-        normed = torch.nn.functional.normalize(features, p=2, dim=1)
-    return normed.cpu().numpy()
+    store = store if store is not None else FeatureStore()
+    embedder = embedder or get_embedder()
+    batch_size = batch_size or auto_batch_size()
+    window = None
+
+    for chunk in _chunks(records, max(1, batch_size)):
+        with span("clip_filter_stream") as event:
+            batch_embs = store.get_many(f"clip:{embedder.name}", chunk, embedder.embed)
+            keep, window = _select_distinct(batch_embs, window, similarity_threshold, compare_window)
+            kept = [record for record, is_distinct in zip(chunk, keep) if is_distinct]
+            if event is not None:
+                event.update(frames_in=len(chunk), frames_out=len(kept))
+        yield from kept
 
-def clip_filter(records, similarity_threshold=0.85, compare_window=5, batch_size=8):
+@traced(counts=frames_in_out)
+def clip_filter(records, similarity_threshold=0.85, compare_window=5, batch_size=None, store=None, embedder=None):
     """
     Filters frames using CLIP embeddings and cosine similarity in batch mode (CPU-optimized).
 
@@ -84,32 +222,114 @@ def clip_filter(records, similarity_threshold=0.85, compare_window=5, batch_size
         records (list): List of (frame, frame_idx) tuples.
         similarity_threshold (float): Max cosine similarity to keep frame distinct.
         compare_window (int): How many past frames to compare against.
-        batch_size (int): Number of frames to embed per batch (for speed).
+        batch_size (int, optional): Number of frames to embed per batch (for speed). Defaults to `auto_batch_size()`.
+        store (FeatureStore, optional): Store to read and memoize embeddings, shared across calls on the same video. Defaults to a fresh store.
+        embedder (ClipEmbedder, optional): Backend to embed with. Defaults to `get_embedder()`.
 
     Returns:
         list: Filtered list of (frame, frame_idx) tuples with distinct content.
     """
-    frames, frame_idxs = zip(*records)
-    embeddings = []
+    return list(clip_filter_stream(
+        records,
+        similarity_threshold=similarity_threshold,
+        compare_window=compare_window,
+        batch_size=batch_size,
+        store=store,
+        embedder=embedder
+    ))
+
+def _k_center(embeddings, frame_idxs, hashes, k, min_gap, hash_threshold):
+    """
+    Greedy k-center selection over normalized embeddings, in frame order of the input.
 
-    for i in range(0, len(frames), batch_size):
-        batch_frames = frames[i:i+batch_size]
-        batch_embs = _get_clip_embeddings(batch_frames)
-        embeddings.extend(batch_embs)
+    The first frame is taken, then repeatedly the frame farthest (in cosine distance) from
+    every frame taken so far. While possible, frames closer than `min_gap` frames in time or
+    within `hash_threshold` bits of a taken frame are skipped; once only such frames are left,
+    the constraints are dropped so exactly `k` frames are returned.
 
-    distinct = []
-    past_embeddings = []
+    Args:
+        embeddings (np.ndarray): L2-normalized embeddings, one row per frame.
+        frame_idxs (np.ndarray): Frame index of every row.
+        hashes (np.ndarray): uint64 perceptual hash of every row.
+        k (int): Number of frames to select.
+        min_gap (int): Shortest distance in frames between two selected frames.
+        hash_threshold (int): Hamming distance at or below which two frames count as duplicates.
+
+    Returns:
+        list: Positions of the selected rows, in the order they were picked.
+    """
+    k = min(k, len(embeddings))
+    if k <= 0:
+        return []
 
-    for i, emb in enumerate(embeddings):
-        is_distinct = True
-        for prev_emb in past_embeddings[-compare_window:]:
-            sim = cosine_similarity([emb], [prev_emb])[0][0]
-            if sim > similarity_threshold:
-                is_distinct = False
-                break
+    nearest = np.full(len(embeddings), np.inf)
+    allowed = np.ones(len(embeddings), dtype=bool)
+    picked = []
+    pick = 0
+
+    for _ in range(k):
+        picked.append(pick)
+        nearest = np.minimum(nearest, 1.0 - embeddings @ embeddings[pick])
+        nearest[pick] = -np.inf
+        allowed &= np.abs(frame_idxs - frame_idxs[pick]) >= min_gap
+        allowed &= hamming_distance(hashes, hashes[pick]) > hash_threshold
+
+        candidates = np.where(allowed, nearest, -np.inf)
+        if not np.isfinite(candidates.max()):
+            candidates = nearest
+        pick = int(np.argmax(candidates))
+
+    return picked
+
+@traced(counts=frames_in_out)
+def budget_filter(records, k, fps, min_gap_sec=None, hash_threshold=5, batch_size=None, store=None, embedder=None):
+    """
+    Selects exactly `k` diverse keyframes in one pass, instead of tuning filter thresholds.
+
+    Every record is hashed and embedded once (reusing what `store` already holds), then
+    `_k_center` picks the frames that cover the video's content best: each new frame is the
+    one least similar to all frames picked so far. Near-duplicate hashes and frames closer
+    than `min_gap_sec` to a picked frame are only taken if nothing else is left.
+
+    Args:
+        records (list): List of (frame, frame_idx) tuples, e.g. every sampled frame.
+        k (int): Number of keyframes to select; all records are kept if there are fewer.
+        fps (float): Frames per second of the video.
+        min_gap_sec (float, optional): Shortest time between two selected frames while other frames are available.
+            Defaults to two sampling steps (the median gap between records), so neighbouring samples are not both selected.
+        hash_threshold (int, optional): Maximum Hamming distance between perceptual hashes to consider frames as duplicates. Defaults to 5.
+        batch_size (int, optional): Number of frames to embed per batch. Defaults to `auto_batch_size()`.
+        store (FeatureStore, optional): Store to read and memoize hashes and embeddings. Defaults to a fresh store.
+        embedder (ClipEmbedder, optional): Backend to embed with. Defaults to `get_embedder()`.
+
+    Returns:
+        list: The selected (frame, frame_idx) tuples, in frame order.
+    """
+    if len(records) <= k:
+        return list(records)
+
+    store = store if store is not None else FeatureStore()
+    embedder = embedder or get_embedder()
+    batch_size = batch_size or auto_batch_size()
+
+    embeddings, hashes = [], []
+    with ThreadPoolExecutor() as executor:
+        for chunk in _chunks(records, max(1, batch_size)):
+            hashes.extend(store.get_many("phash64", chunk, lambda frames: _compute_hashes(frames, executor)))
+            embeddings.extend(store.get_many(f"clip:{embedder.name}", chunk, embedder.embed))
 
-        if is_distinct:
-            distinct.append((frames[i], frame_idxs[i]))
-            past_embeddings.append(emb)
+    frame_idxs = np.array([frame_idx for _, frame_idx in records])
+    if min_gap_sec is None:
+        min_gap = 2 * int(np.median(np.diff(frame_idxs))) if len(frame_idxs) > 1 else 0
+    else:
+        min_gap = int(round(min_gap_sec * fps))
 
-    return distinct
+    picked = _k_center(
+        _normalize_rows(embeddings).astype(np.float64),
+        frame_idxs,
+        np.array(hashes, dtype=np.uint64),
+        k,
+        min_gap,
+        hash_threshold
+    )
+    return [records[i] for i in sorted(picked)]
@@ -0,0 +1,104 @@
+import cv2
+import numpy as np
+
+# Settings of `skimage.metrics.structural_similarity` for 8-bit grayscale images with default arguments
+SSIM_WIN_SIZE = 7
+_C1 = (0.01 * 255) ** 2
+_C2 = (0.03 * 255) ** 2
+_COV_NORM = SSIM_WIN_SIZE ** 2 / (SSIM_WIN_SIZE ** 2 - 1)
+
+def _box_sums(images):
+    """
+    Sums every full SSIM_WIN_SIZE x SSIM_WIN_SIZE window of a stack of images in one OpenCV call.
+
+    The stack is filtered as one tall image. Only windows that fit entirely inside an image are
+    kept; these are exactly the pixels skimage keeps after cropping the border of its filtered
+    maps, so windows straddling two images of the stack are always cropped away. Inputs hold
+    integers, so the float64 sums are exact.
+
+    Args:
+        images (np.ndarray): float64 array of shape (n, h, w) holding integer values.
+
+    Returns:
+        np.ndarray: float64 array of shape (n, h - SSIM_WIN_SIZE + 1, w - SSIM_WIN_SIZE + 1).
+    """
+    n, h, w = images.shape
+    sums = cv2.boxFilter(np.ascontiguousarray(images).reshape(n * h, w), -1, (SSIM_WIN_SIZE, SSIM_WIN_SIZE),
+                         normalize=False, borderType=cv2.BORDER_REFLECT).reshape(n, h, w)
+    pad = (SSIM_WIN_SIZE - 1) // 2
+    return sums[:, pad:h - pad, pad:w - pad]
+
+class SsimStats:
+    """
+    Per-thumbnail statistics of SSIM, computed once when the thumbnail is created.
+
+    Args:
+        gray (np.ndarray): 8-bit grayscale thumbnail.
+
+    Attributes:
+        pixels (np.ndarray): The thumbnail as float64, for the cross term with other thumbnails.
+        mean (np.ndarray): Local means over every 7x7 window.
+        var (np.ndarray): Local sample variances over every 7x7 window.
+    """
+
+    def __init__(self, gray):
+        self.pixels = np.asarray(gray, dtype=np.float64)
+        sums = _box_sums(np.stack([self.pixels, self.pixels * self.pixels]))
+        n = SSIM_WIN_SIZE ** 2
+        self.mean = sums[0] / n
+        self.var = _COV_NORM * (sums[1] / n - self.mean * self.mean)
+
+class SsimWindow:
+    """
+    The last `size` accepted thumbnails, scored against a candidate in one vectorized pass.
+
+    Scores match `skimage.metrics.structural_similarity(a, b)` on 8-bit images (uniform 7x7
+    window, sample covariance, data range 255, 3-pixel border cropped) to within 1e-9; the
+    window sums are exact here, so the only differences come from skimage's floating-point
+    filtering.
+
+    Args:
+        size (int): Number of most recent thumbnails kept; 0 or less keeps every thumbnail,
+            like the `[-0:]` slice of the filter's original list of accepted frames.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._pixels = self._mean = self._var = None
+
+    def __len__(self):
+        return 0 if self._pixels is None else len(self._pixels)
+
+    def append(self, stats):
+        """Adds an accepted thumbnail, dropping the oldest one beyond `size`."""
+        if self._pixels is None:
+            self._pixels, self._mean, self._var = stats.pixels[None], stats.mean[None], stats.var[None]
+            return
+        if self.size <= 0:
+            keep = slice(None)
+        else:
+            keep = slice(-(self.size - 1), None) if self.size > 1 else slice(0, 0)
+        self._pixels = np.concatenate([self._pixels[keep], stats.pixels[None]])
+        self._mean = np.concatenate([self._mean[keep], stats.mean[None]])
+        self._var = np.concatenate([self._var[keep], stats.var[None]])
+
+    def scores(self, stats):
+        """
+        Computes the SSIM of a candidate against every thumbnail in the window.
+
+        Args:
+            stats (SsimStats): Statistics of the candidate thumbnail.
+
+        Returns:
+            np.ndarray: One mean SSIM score per thumbnail in the window, oldest first.
+        """
+        if self._pixels is None:
+            return np.empty(0)
+
+        n = SSIM_WIN_SIZE ** 2
+        mean_xy = _box_sums(self._pixels * stats.pixels) / n
+        cov = _COV_NORM * (mean_xy - self._mean * stats.mean)
+
+        numerator = (2 * self._mean * stats.mean + _C1) * (2 * cov + _C2)
+        denominator = (self._mean ** 2 + stats.mean ** 2 + _C1) * (self._var + stats.var + _C2)
+        return (numerator / denominator).mean(axis=(1, 2))
@@ -0,0 +1,259 @@
+import os
+import sys
+import json
+import time
+import argparse
+import traceback
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Any, List, Optional
+
+VIDEO_EXTENSIONS = (".mp4", ".mkv", ".mov", ".avi", ".webm", ".m4v")
+
+def find_videos(sources: List[str]) -> List[str]:
+    """Expand directories (their video files) and manifest files (one video path per line, # for comments)."""
+    videos = []
+    for source in sources:
+        if os.path.isdir(source):
+            videos.extend(sorted(os.path.join(source, name) for name in os.listdir(source)
+                                 if name.lower().endswith(VIDEO_EXTENSIONS)))
+        elif source.lower().endswith(VIDEO_EXTENSIONS):
+            videos.append(source)
+        else:
+            base = os.path.dirname(source)
+            with open(source, encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if line and not line.startswith("#"):
+                        videos.append(line if os.path.isabs(line) else os.path.join(base, line))
+    return list(dict.fromkeys(videos))
+
+def output_dirs(videos: List[str], output_root: str) -> Dict[str, str]:
+    """Give every video its own output folder, named after the file (with a suffix if two names clash)."""
+    dirs, used = {}, set()
+    for video in videos:
+        stem = os.path.splitext(os.path.basename(video))[0]
+        name, n = stem, 1
+        while name in used:
+            n += 1
+            name = f"{stem}_{n}"
+        used.add(name)
+        dirs[video] = os.path.join(output_root, name)
+    return dirs
+
+def video_seconds(video_path: str) -> Optional[float]:
+    """Duration of a video from its container metadata, if known."""
+    from KeyFrameSelection.FeatureExtraction import video_duration
+    return video_duration(video_path)
+
+# Seconds the worker process spent loading its models, reported with each of its videos
+_startup_seconds = None
+
+def _init_worker(settings: Dict[str, Any]):
+    """Load everything a video needs once per worker process: the LLM client, the graphs and CLIP."""
+    global _startup_seconds
+    start = time.perf_counter()
+    import torch
+    torch.set_num_threads(settings["torch_threads"])
+
+    # Importing main builds the Gemini client and compiles the frame processor graphs
+    import main
+    from llm.client import configure as configure_llm
+    from llm.cache import ResponseCache
+    from KeyFrameSelection.Embedders import get_embedder
+    from FrameProcessor.gating.pre_classifier import PreClassifier, configure as configure_pre_classifier
+    from config.paths import LLM_CACHE_FILE
+
+    configure_llm(
+        requests_per_minute=settings["requests_per_minute"],
+        max_retries=settings["max_retries"],
+        cache=None if settings["no_llm_cache"] else ResponseCache(LLM_CACHE_FILE, ttl_seconds=settings["llm_cache_ttl_days"] * 86400)
+    )
+    if settings["pre_classifier"]:
+        configure_pre_classifier(PreClassifier.load(
+            settings["pre_classifier"],
+            confidence=settings["pre_classifier_confidence"],
+            audit_rate=settings["pre_classifier_audit_rate"]
+        ))
+    get_embedder(settings["clip_backend"])
+    _startup_seconds = time.perf_counter() - start
+
+def _process_video(video_path: str, output_dir: str, options: Dict[str, Any], resume: bool) -> Dict[str, Any]:
+    """Run the pipeline on one video inside a worker; its console output goes to `output_dir/run.log`."""
+    import main
+
+    result = {"video": video_path, "output_dir": output_dir, "video_seconds": video_seconds(video_path),
+              "pid": os.getpid(), "worker_startup_seconds": _startup_seconds}
+    start = time.perf_counter()
+    try:
+        main.prepare_outputs(output_dir, resume=resume)
+        with open(os.path.join(output_dir, "run.log"), "a", encoding="utf-8") as log, \
+                contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+            result.update(main.main(video_path, output_dir=output_dir, resume=resume, **options))
+        result["status"] = "ok"
+    except Exception as e:
+        result["status"] = "failed"
+        result["error"] = f"{type(e).__name__}: {e}"
+        result["traceback"] = traceback.format_exc()
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+def run_batch(videos: List[str], output_root: str, workers: int, options: Dict[str, Any],
+              settings: Dict[str, Any], resume: bool = False) -> Dict[str, Any]:
+    """Process videos across a pool of worker processes that keep their models loaded between videos.
+
+    Larger videos are started first so the pool does not end waiting on one long video.
+    """
+    dirs = output_dirs(videos, output_root)
+    order = sorted(videos, key=lambda v: os.path.getsize(v) if os.path.exists(v) else 0, reverse=True)
+
+    start = time.perf_counter()
+    results = []
+    # Workers are spawned rather than forked, so torch and the gRPC client start clean in each one
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                             initargs=(settings,)) as pool:
+        futures = [pool.submit(_process_video, video, dirs[video], options, resume) for video in order]
+        for done, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            results.append(result)
+            status = result["status"] if result["status"] == "ok" else f"FAILED ({result['error']})"
+            print(f"[{done}/{len(videos)}] {result['video']}: {status} in {result['seconds']:.1f}s")
+    wall = time.perf_counter() - start
+
+    results.sort(key=lambda r: videos.index(r["video"]))
+    ok = [r for r in results if r["status"] == "ok"]
+    content = sum(r["video_seconds"] or 0 for r in ok)
+    return {
+        "workers": workers,
+        "videos": len(videos),
+        "succeeded": len(ok),
+        "failed": len(results) - len(ok),
+        "wall_seconds": wall,
+        "worker_seconds": sum(r["seconds"] for r in results),
+        "worker_startup_seconds": max((r["worker_startup_seconds"] or 0 for r in results), default=0.0),
+        "videos_per_hour": len(ok) / wall * 3600 if wall else 0.0,
+        "video_seconds": content,
+        "realtime_factor": content / wall if wall else 0.0,
+        "keyframes": sum(r.get("keyframes", 0) for r in ok),
+        "important": sum(r.get("important", 0) for r in ok),
+        "keyframes_per_sec": sum(r.get("keyframes", 0) for r in ok) / wall if wall else 0.0,
+        "results": results,
+    }
+
+def print_report(report: Dict[str, Any]):
+    print(f"\n{'video':<40}{'status':>8}{'keyframes':>11}{'important':>11}{'seconds':>9}{'x realtime':>12}")
+    for r in report["results"]:
+        name = os.path.basename(r["video"])[:39]
+        realtime = f"{r['video_seconds'] / r['seconds']:.1f}" if r["video_seconds"] and r["seconds"] else "-"
+        print(f"{name:<40}{r['status']:>8}{r.get('keyframes', 0):>11}{r.get('important', 0):>11}"
+              f"{r['seconds']:>9.1f}{realtime:>12}")
+    print(f"\n{report['succeeded']} of {report['videos']} videos in {report['wall_seconds']:.1f}s with {report['workers']} workers "
+          f"({report['videos_per_hour']:.0f} videos/hour, {report['realtime_factor']:.1f}x realtime, "
+          f"{report['keyframes_per_sec']:.2f} keyframes/s)")
+    if report["wall_seconds"]:
+        efficiency = report["worker_seconds"] / (report["wall_seconds"] * report["workers"])
+        print(f"Worker time: {report['worker_seconds']:.1f}s, parallel efficiency {efficiency:.0%}, "
+              f"model loading: {report['worker_startup_seconds']:.1f}s once per worker")
+    for r in report["results"]:
+        if r["status"] != "ok":
+            print(f"Failed: {r['video']}: {r['error']} (see {os.path.join(r['output_dir'], 'run.log')})")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Extract and describe keyframes from many videos with a pool of worker processes.")
+    parser.add_argument("sources", nargs="+",
+                        help="Video files, folders of videos, or manifest files listing one video path per line.")
+    parser.add_argument("--output_root", default="batch_outputs",
+                        help="Folder receiving one output folder per video and the combined report.")
+    parser.add_argument("--workers", type=int, default=max(1, min(4, (os.cpu_count() or 1) // 2)),
+                        help="Number of worker processes; each loads CLIP and the LLM client once.")
+    parser.add_argument("--resume", action="store_true",
+                        help="Resume each video from its manifest; finished videos are only re-written from it.")
+    parser.add_argument("--decode_mode", choices=["decode", "seek", "keyframes", "adaptive"], default="decode")
+    parser.add_argument("--scene_threshold", type=float, default=0.02)
+    parser.add_argument("--min_gap_sec", type=float, default=1.0)
+    parser.add_argument("--max_gap_sec", type=float, default=60)
+    budget = parser.add_mutually_exclusive_group()
+    budget.add_argument("--budget", type=int, default=None, help="Keyframes selected per video (see main.py --budget).")
+    budget.add_argument("--budget_per_minute", type=float, default=None, help="Keyframes selected per minute of each video.")
+    parser.add_argument("--decode_workers", type=int, default=1,
+                        help="Decoding processes per video; the pool already runs videos in parallel, so 1 usually suffices.")
+    parser.add_argument("--proxy_filters", action="store_true", help="Run the similarity filters on proxies (see main.py).")
+    parser.add_argument("--spill_frames", action="store_true", help="Keep full-resolution samples in a temporary file (see main.py).")
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--no_cache", action="store_true", help="Do not use the persistent feature cache.")
+    parser.add_argument("--cache_max_gb", type=float, default=2.0)
+    parser.add_argument("--clip_backend", choices=["fp32", "int8", "onnx"], default=None)
+    parser.add_argument("--importance_batch_size", type=int, default=1)
+    parser.add_argument("--max_concurrency", type=int, default=1, help="Frames processed at the same time within each worker.")
+    parser.add_argument("--single_call", action="store_true")
+    parser.add_argument("--results_format", choices=["jsonl", "parquet", "arrow"], default="jsonl")
+    parser.add_argument("--no_save_keyframes", action="store_true")
+    parser.add_argument("--index_dir", default=None, help="Search index shared by all workers (defaults to the one of main.py).")
+    parser.add_argument("--no_index", action="store_true")
+    parser.add_argument("--requests_per_minute", type=float, default=None,
+                        help="LLM request limit for the whole batch; it is split evenly between workers.")
+    parser.add_argument("--max_retries", type=int, default=5)
+    parser.add_argument("--no_llm_cache", action="store_true")
+    parser.add_argument("--llm_cache_ttl_days", type=float, default=30)
+    parser.add_argument("--pre_classifier", default=None, help="Calibrated pre-classifier file to load in every worker.")
+    parser.add_argument("--pre_classifier_confidence", type=float, default=None)
+    parser.add_argument("--pre_classifier_audit_rate", type=float, default=0.0)
+    args = parser.parse_args()
+    if args.stream and (args.budget is not None or args.budget_per_minute is not None):
+        parser.error("--budget and --budget_per_minute select from every sample and cannot be combined with --stream")
+    return args
+
+if __name__ == "__main__":
+    args = parse_args()
+    videos = find_videos(args.sources)
+    if not videos:
+        print("No videos found for processing!")
+        sys.exit(1)
+
+    workers = max(1, min(args.workers, len(videos)))
+    settings = {
+        "torch_threads": max(1, (os.cpu_count() or 1) // workers),
+        "requests_per_minute": args.requests_per_minute / workers if args.requests_per_minute else None,
+        "max_retries": args.max_retries,
+        "no_llm_cache": args.no_llm_cache,
+        "llm_cache_ttl_days": args.llm_cache_ttl_days,
+        "pre_classifier": args.pre_classifier,
+        "pre_classifier_confidence": args.pre_classifier_confidence,
+        "pre_classifier_audit_rate": args.pre_classifier_audit_rate,
+        "clip_backend": args.clip_backend,
+    }
+    options = {
+        "stream": args.stream,
+        "decode_mode": args.decode_mode,
+        "scene_threshold": args.scene_threshold,
+        "min_gap_sec": args.min_gap_sec,
+        "max_gap_sec": args.max_gap_sec,
+        "decode_workers": args.decode_workers,
+        "budget": args.budget,
+        "budget_per_minute": args.budget_per_minute,
+        "proxy_filters": args.proxy_filters,
+        "spill_frames": args.spill_frames,
+        "use_cache": not args.no_cache,
+        "cache_max_gb": args.cache_max_gb,
+        "clip_backend": args.clip_backend,
+        "importance_batch_size": args.importance_batch_size,
+        "max_concurrency": args.max_concurrency,
+        "save_keyframes": not args.no_save_keyframes,
+        "single_call": args.single_call,
+        "results_format": args.results_format,
+    }
+    if args.no_index or args.index_dir:
+        options["index_dir"] = None if args.no_index else args.index_dir
+
+    print(f"Processing {len(videos)} videos with {workers} workers")
+    report = run_batch(videos, args.output_root, workers, options, settings, resume=args.resume)
+    print_report(report)
+
+    os.makedirs(args.output_root, exist_ok=True)
+    report_path = os.path.join(args.output_root, "batch_report.json")
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report: {report_path}")
+    sys.exit(1 if report["failed"] else 0)
@@ -0,0 +1,96 @@
+import re
+import json
+import time
+import random
+import hashlib
+import threading
+from langchain_core.messages import AIMessage
+
+class ResourceExhausted(Exception):
+    """Quota error of the fake model, reported with HTTP status 429 like the Gemini client's."""
+
+    code = 429
+
+class FakeChatModel:
+    """Local stand-in for the Gemini chat model with configurable latency and failure rate.
+
+    Answers every prompt of the frame processor in the format its parser expects. Whether a
+    frame is important is derived from a hash of its image bytes, so repeated runs on the
+    same frames give the same answers. Failures are raised as quota errors, which exercises
+    the rate limiter's backoff in `llm.client`.
+    """
+
+    model = "fake-llm"
+
+    def __init__(self, latency: float = 0.5, jitter: float = 0.2, failure_rate: float = 0.0,
+                 important_rate: float = 0.5, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.important_rate = important_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.failures = 0
+
+    def _is_important(self, image_url: str) -> bool:
+        digest = hashlib.sha1(image_url[-4096:].encode()).digest()
+        return digest[0] / 255 < self.important_rate
+
+    def invoke(self, messages):
+        with self._lock:
+            self.calls += 1
+            delay = self.latency * (1 + self._random.uniform(-self.jitter, self.jitter))
+            fail = self._random.random() < self.failure_rate
+            if fail:
+                self.failures += 1
+        time.sleep(max(0.0, delay))
+        if fail:
+            raise ResourceExhausted("429 RESOURCE_EXHAUSTED: fake quota error")
+
+        response = self._answer(messages)
+        # Rough token counts, reported the way providers fill `usage_metadata`
+        parts = [part for message in messages
+                 for part in (message.content if isinstance(message.content, list) else [{"type": "text", "text": message.content}])]
+        images = sum(part.get("type") == "image_url" for part in parts)
+        input_tokens = sum(len(part.get("text", "")) for part in parts) // 4 + 258 * images
+        output_tokens = len(response.content) // 4
+        response.usage_metadata = {"input_tokens": input_tokens, "output_tokens": output_tokens,
+                                   "total_tokens": input_tokens + output_tokens}
+        return response
+
+    def _answer(self, messages) -> AIMessage:
+        system = messages[0].content if isinstance(messages[0].content, str) else ""
+        parts = messages[-1].content if isinstance(messages[-1].content, list) else []
+        texts = [p["text"] for p in parts if p.get("type") == "text"]
+        images = [p["image_url"]["url"] for p in parts if p.get("type") == "image_url"]
+
+        if "JSON array" in system:
+            names = [t[len("Image Name: "):] for t in texts if t.startswith("Image Name: ")]
+            return AIMessage(content=json.dumps([
+                {"image_name": name, "importance": self._label(url), "reason": "Synthetic batch answer"}
+                for name, url in zip(names, images)
+            ]))
+
+        label = self._label(images[0]) if images else "not_important"
+        if "visual_description" in system:
+            return AIMessage(content=json.dumps({
+                "importance": label,
+                "reason": "Synthetic answer",
+                "extracted_text": "Slide text" if label == "important" else "",
+                "visual_description": "Bar chart" if label == "important" else "",
+            }))
+        if '"importance"' in system:
+            return AIMessage(content=json.dumps({"importance": label, "reason": "Synthetic answer"}))
+
+        name = re.search(r"Image Name:\s*(.*)", texts[0]) if texts else None
+        return AIMessage(content=f"Image Name: {name.group(1).strip() if name else 'frame'}\n"
+                                 f"Extracted Text: Slide text\nVisual Description: Bar chart")
+
+    def _label(self, image_url: str) -> str:
+        return "important" if self._is_important(image_url) else "not_important"
+
+def install(fake: FakeChatModel):
+    """Route every LLM call through `fake`; `llm.client.invoke_model` looks the model up on each call."""
+    import llm.model
+    llm.model.model = fake
@@ -0,0 +1,257 @@
+import os
+import sys
+import json
+import time
+import platform
+import tempfile
+import threading
+import argparse
+import numpy as np
+from typing import Dict, Any, List, Optional
+
+# llm.model builds the Gemini client on import; the benchmark never calls it
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+
+from KeyFrameSelection.FeatureExtraction import process_video, keyframe_name
+from KeyFrameSelection.Similarties import hash_filter, clip_filter
+from KeyFrameSelection.Embedders import get_embedder
+from FrameProcessor.processor.multi_frame import process_frames
+from FrameProcessor.utils.image_utils import FrameImage
+from llm.client import configure as configure_llm
+from benchmarks.fake_llm import FakeChatModel, install as install_fake_llm
+from benchmarks.synthetic_videos import make_scenarios, SCENARIOS, QUICK_SCENARIOS
+
+STAGES = ["process_video", "hash_filter", "clip_filter", "process_frames"]
+
+def _rss_bytes() -> Optional[int]:
+    """Current resident set size of this process, if the platform exposes it."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def _max_rss_bytes(peaks: List[Optional[int]]) -> Optional[int]:
+    """Peak resident set size of the whole run; `peaks` (sampled per stage) is the last resort."""
+    try:
+        import resource
+        # ru_maxrss is in KiB on Linux, bytes on macOS
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 2 ** 10)
+    except ImportError:
+        pass
+    try:
+        import psutil
+        # Only Windows, where `resource` is missing, reports the peak working set
+        return psutil.Process().memory_info().peak_wset
+    except (ImportError, AttributeError):
+        pass
+    peaks = [peak for peak in peaks if peak is not None]
+    return max(peaks) if peaks else None
+
+class _Measure:
+    """Times a block and samples the peak RSS reached while it runs."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.peak_rss = None
+        self.seconds = 0.0
+        self._done = threading.Event()
+
+    def _sample(self):
+        while True:
+            rss = _rss_bytes()
+            if rss is not None:
+                self.peak_rss = max(self.peak_rss or 0, rss)
+            if self._done.wait(self.interval):
+                return
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self._start
+        self._done.set()
+        self._thread.join()
+
+def _summarize(calls: List[Dict[str, float]]) -> Dict[str, Any]:
+    """Aggregate the measured calls of one stage."""
+    seconds = np.array([call["seconds"] for call in calls])
+    frames = sum(call["frames"] for call in calls)
+    peaks = [call["peak_rss"] for call in calls if call["peak_rss"] is not None]
+    return {
+        "calls": len(calls),
+        "frames": frames,
+        "seconds": float(seconds.sum()),
+        "frames_per_sec": frames / seconds.sum() if seconds.sum() else 0.0,
+        "latency_ms": {f"p{q}": float(np.percentile(seconds, q) * 1000) for q in (50, 90, 99)},
+        "peak_rss_mb": max(peaks) / 2 ** 20 if peaks else None,
+    }
+
+def run_benchmarks(video_paths: List[str], repeats: int = 3, interval_sec: float = 2, decode_mode: str = "seek",
+                   clip_backend: Optional[str] = None, llm_latency: float = 0.5, llm_failure_rate: float = 0.0,
+                   importance_batch_size: int = 1, max_concurrency: int = 4, single_call: bool = False,
+                   decode_workers: int = 1) -> Dict[str, Any]:
+    """Run every stage on every video `repeats` times and return per-stage statistics.
+
+    Stages run without feature or LLM caches, so each repeat measures the full cost. Each
+    measured call is one stage applied to one video; its input frame count is used for
+    throughput, and the call durations give the latency percentiles.
+    """
+    fake = FakeChatModel(latency=llm_latency, failure_rate=llm_failure_rate)
+    install_fake_llm(fake)
+    configure_llm(max_retries=10, base_delay=0.05, max_delay=1.0, cache=None)
+
+    # Model loading is a one-off cost, kept out of the clip_filter numbers
+    embedder = get_embedder(clip_backend)
+
+    calls = {stage: [] for stage in STAGES}
+    videos = []
+
+    def measured(stage, frames, fn):
+        with _Measure() as m:
+            result = fn()
+        calls[stage].append({"seconds": m.seconds, "frames": frames, "peak_rss": m.peak_rss})
+        return result
+
+    for video_path in video_paths:
+        print(f"Benchmarking {os.path.basename(video_path)}")
+        for _ in range(repeats):
+            records, fps = measured("process_video", 0, lambda: process_video(video_path, interval_sec=interval_sec, mode=decode_mode,
+                                                                                 workers=decode_workers))
+            calls["process_video"][-1]["frames"] = len(records)
+
+            hashed = measured("hash_filter", len(records), lambda: hash_filter(records, ssim_compare_window=5))
+            kept = measured("clip_filter", len(hashed), lambda: clip_filter(hashed, compare_window=5, embedder=embedder))
+
+            frames = [FrameImage(frame, name=keyframe_name(frame_idx, fps)) for frame, frame_idx in kept]
+            results = measured("process_frames", len(frames), lambda: process_frames(
+                frames, importance_batch_size=importance_batch_size, max_concurrency=max_concurrency, single_call=single_call))
+
+        videos.append({
+            "video": os.path.basename(video_path),
+            "sampled": len(records),
+            "after_hash_filter": len(hashed),
+            "after_clip_filter": len(kept),
+            "important": sum(r["importance"] == "important" for r in results),
+        })
+
+    max_rss = _max_rss_bytes([call["peak_rss"] for stage_calls in calls.values() for call in stage_calls])
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "repeats": repeats,
+            "interval_sec": interval_sec,
+            "decode_mode": decode_mode,
+            "decode_workers": decode_workers,
+            "clip_backend": embedder.backend,
+            "llm_latency": llm_latency,
+            "llm_failure_rate": llm_failure_rate,
+            "importance_batch_size": importance_batch_size,
+            "max_concurrency": max_concurrency,
+            "single_call": single_call,
+        },
+        "stages": {stage: _summarize(stage_calls) for stage, stage_calls in calls.items() if stage_calls},
+        "videos": videos,
+        "llm": {"requests": fake.calls, "failures": fake.failures},
+        # Peak resident memory of the whole run, in MiB
+        "max_rss_mb": max_rss / 2 ** 20 if max_rss is not None else None,
+    }
+
+def print_report(report: Dict[str, Any]):
+    print(f"\n{'stage':<16}{'calls':>6}{'frames':>8}{'frames/s':>10}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'peak MB':>9}")
+    for stage, s in report["stages"].items():
+        peak = f"{s['peak_rss_mb']:.0f}" if s["peak_rss_mb"] is not None else "-"
+        print(f"{stage:<16}{s['calls']:>6}{s['frames']:>8}{s['frames_per_sec']:>10.1f}"
+              f"{s['latency_ms']['p50']:>10.1f}{s['latency_ms']['p90']:>10.1f}{s['latency_ms']['p99']:>10.1f}{peak:>9}")
+    max_rss = f"{report['max_rss_mb']:.0f} MB" if report["max_rss_mb"] is not None else "-"
+    print(f"LLM requests: {report['llm']['requests']} ({report['llm']['failures']} injected failures), "
+          f"max RSS: {max_rss}")
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = 0.15) -> List[str]:
+    """List the stages whose throughput, p90 latency or peak RSS is worse than the baseline by more than `tolerance`."""
+    regressions = []
+    for stage, current in report["stages"].items():
+        before = baseline.get("stages", {}).get(stage)
+        if before is None:
+            continue
+
+        checks = [
+            ("frames/s", before["frames_per_sec"], current["frames_per_sec"], False),
+            ("p90 ms", before["latency_ms"]["p90"], current["latency_ms"]["p90"], True),
+            ("peak MB", before["peak_rss_mb"], current["peak_rss_mb"], True),
+        ]
+        for metric, old, new, higher_is_worse in checks:
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (change > tolerance) if higher_is_worse else (change < -tolerance):
+                regressions.append(f"{stage} {metric}: {old:.1f} -> {new:.1f} ({change:+.0%})")
+    return regressions
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline on synthetic videos with a local fake LLM.")
+    parser.add_argument("--videos", nargs="*", default=None,
+                        help="Videos to benchmark (default: generated synthetic videos).")
+    parser.add_argument("--video_dir", default=os.path.join(tempfile.gettempdir(), "vee-benchmark-videos"),
+                        help="Where synthetic videos are generated and reused.")
+    parser.add_argument("--quick", action="store_true", help="Use short, low-resolution synthetic videos.")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--interval_sec", type=float, default=2, help="Sampling interval (the longest gap in adaptive mode).")
+    parser.add_argument("--decode_mode", choices=["decode", "seek", "keyframes", "adaptive"], default="decode")
+    parser.add_argument("--decode_workers", type=int, default=1, help="Processes decoding segments of each video in parallel.")
+    parser.add_argument("--clip_backend", choices=["fp32", "int8", "onnx"], default=None)
+    parser.add_argument("--llm_latency", type=float, default=0.5, help="Mean seconds per fake LLM request.")
+    parser.add_argument("--llm_failure_rate", type=float, default=0.0, help="Share of fake LLM requests failing with a quota error.")
+    parser.add_argument("--importance_batch_size", type=int, default=1)
+    parser.add_argument("--max_concurrency", type=int, default=4)
+    parser.add_argument("--single_call", action="store_true")
+    parser.add_argument("--output", default=os.path.join("benchmarks", "results", "latest.json"),
+                        help="Where the report is written.")
+    parser.add_argument("--baseline", default=None, help="Report of an earlier run to compare against.")
+    parser.add_argument("--save_baseline", default=None, help="Also write the report to this baseline file.")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Relative change reported as a regression.")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    video_paths = args.videos or make_scenarios(args.video_dir, QUICK_SCENARIOS if args.quick else SCENARIOS)
+
+    report = run_benchmarks(
+        video_paths,
+        repeats=args.repeats,
+        interval_sec=args.interval_sec,
+        decode_mode=args.decode_mode,
+        decode_workers=args.decode_workers,
+        clip_backend=args.clip_backend,
+        llm_latency=args.llm_latency,
+        llm_failure_rate=args.llm_failure_rate,
+        importance_batch_size=args.importance_batch_size,
+        max_concurrency=args.max_concurrency,
+        single_call=args.single_call
+    )
+    print_report(report)
+
+    for path in filter(None, [args.output, args.save_baseline]):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {path}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.baseline}")
@@ -0,0 +1,115 @@
+import os
+import av
+import cv2
+import numpy as np
+from typing import List, Tuple
+
+KINDS = ("slides", "fades", "repeats")
+
+def _slide(index: int, width: int, height: int) -> np.ndarray:
+    """Draw a deterministic presentation-like slide: colored background, title, text lines and a chart."""
+    rng = np.random.default_rng(index)
+    slide = np.empty((height, width, 3), np.uint8)
+    slide[:] = rng.integers(40, 230, 3)
+
+    scale = height / 360
+    cv2.putText(slide, f"Slide {index}", (int(20 * scale), int(50 * scale)), cv2.FONT_HERSHEY_SIMPLEX,
+                1.2 * scale, (0, 0, 0), max(1, int(2 * scale)))
+    for line in range(int(rng.integers(2, 6))):
+        y = int((90 + 30 * line) * scale)
+        words = " ".join(f"item{rng.integers(100)}" for _ in range(4))
+        cv2.putText(slide, words, (int(30 * scale), y), cv2.FONT_HERSHEY_SIMPLEX, 0.6 * scale, (20, 20, 20), 1)
+
+    # A small bar chart so slides differ in structure, not only in text
+    base = int(height * 0.9)
+    for bar in range(int(rng.integers(3, 8))):
+        x = int(width * 0.55) + bar * int(width * 0.05)
+        top = base - int(rng.integers(int(height * 0.1), int(height * 0.5)))
+        cv2.rectangle(slide, (x, top), (x + int(width * 0.035), base), tuple(int(c) for c in rng.integers(0, 255, 3)), -1)
+
+    return slide
+
+def _schedule(kind: str, n_slides: int) -> List[int]:
+    if kind == "repeats":
+        # Scenes come back, e.g. a presenter returning to an agenda slide: 0 1 0 2 0 1 ...
+        return [0 if i % 2 == 0 else 1 + (i // 2) % max(1, n_slides - 1) for i in range(n_slides * 2)]
+    return list(range(n_slides))
+
+def make_video(path: str, kind: str = "slides", duration_sec: float = 60, resolution: Tuple[int, int] = (640, 360),
+               fps: int = 25, slide_sec: float = 5, fade_sec: float = 1.0, seed: int = 0) -> str:
+    """Write a synthetic test video.
+
+    "slides" cuts between distinct slides, "fades" cross-fades between them over `fade_sec`, and
+    "repeats" keeps returning to earlier slides. A moving pointer and mild noise make consecutive
+    frames of a slide similar but not identical, as in a screen recording.
+    """
+    if kind not in KINDS:
+        raise ValueError(f"Unknown video kind: {kind}")
+
+    width, height = resolution
+    total = int(duration_sec * fps)
+    per_slide = max(1, int(slide_sec * fps))
+    fade = int(fade_sec * fps) if kind == "fades" else 0
+    schedule = _schedule(kind, max(1, total // per_slide + 1))
+    slides = {}
+    rng = np.random.default_rng(seed)
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with av.open(path, "w") as container:
+        try:
+            stream = container.add_stream("libx264", rate=fps)
+        except Exception:
+            stream = container.add_stream("mpeg4", rate=fps)
+        stream.width, stream.height, stream.pix_fmt = width, height, "yuv420p"
+
+        for i in range(total):
+            position = i // per_slide
+            slide_idx = schedule[position % len(schedule)]
+            if slide_idx not in slides:
+                slides[slide_idx] = _slide(slide_idx + seed * 1000, width, height)
+            frame = slides[slide_idx].copy()
+
+            into_next = i % per_slide - (per_slide - fade)
+            if fade and into_next >= 0:
+                next_idx = schedule[(position + 1) % len(schedule)]
+                if next_idx not in slides:
+                    slides[next_idx] = _slide(next_idx + seed * 1000, width, height)
+                alpha = (into_next + 1) / (fade + 1)
+                frame = cv2.addWeighted(frame, 1 - alpha, slides[next_idx], alpha, 0)
+
+            pointer = (int((i * 7) % width), int(height / 2 + height / 4 * np.sin(i / fps)))
+            cv2.circle(frame, pointer, max(3, height // 60), (0, 0, 255), -1)
+            noise = rng.integers(-3, 4, frame.shape, dtype=np.int16)
+            frame = np.clip(frame.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+
+            for packet in stream.encode(av.VideoFrame.from_ndarray(frame, format="bgr24")):
+                container.mux(packet)
+
+        for packet in stream.encode():
+            container.mux(packet)
+
+    return path
+
+# (kind, duration in seconds, resolution) of the default benchmark videos
+SCENARIOS = [
+    ("slides", 120, (640, 360)),
+    ("fades", 120, (640, 360)),
+    ("repeats", 120, (1280, 720)),
+]
+
+QUICK_SCENARIOS = [
+    ("slides", 30, (320, 180)),
+    ("fades", 30, (320, 180)),
+    ("repeats", 30, (640, 360)),
+]
+
+def make_scenarios(output_dir: str, scenarios=SCENARIOS, fps: int = 25) -> List[str]:
+    """Write one video per scenario, reusing files left by earlier runs."""
+    paths = []
+    for kind, duration_sec, (width, height) in scenarios:
+        path = os.path.join(output_dir, f"{kind}_{duration_sec}s_{width}x{height}_{fps}fps.mp4")
+        if not os.path.exists(path):
+            print(f"Generating {path}")
+            make_video(path, kind=kind, duration_sec=duration_sec, resolution=(width, height), fps=fps)
+        paths.append(path)
+    return paths
@@ -0,0 +1,85 @@
+import os
+import json
+import time
+import sqlite3
+from typing import Dict, Any, Optional
+
+# Reasons the frame processor records when a frame could not be evaluated
+FAILURE_REASONS = ("Failed to evaluate", "Error processing response", "Processing error")
+
+def is_complete(result: Dict[str, Any]) -> bool:
+    """Whether a frame result is final, i.e. not the product of an error that a rerun could fix."""
+    if result.get("importance") not in ("important", "not_important"):
+        return False
+    if str(result.get("reason", "")).startswith(FAILURE_REASONS):
+        return False
+    description = result.get("description")
+    return not (isinstance(description, dict) and "error" in description)
+
+class RunManifest:
+    """Durable record of a run's progress, so an interrupted run can resume where it stopped.
+
+    Finished pipeline stages are stored with the data later stages need (e.g. the selected
+    frame indices), and every frame result is committed as soon as it is produced. Each commit
+    is its own SQLite transaction, so a crash loses at most the frame being processed.
+
+    A manifest belongs to one run configuration (video content and the settings that change
+    the selected frames); resuming with a different configuration raises ValueError.
+
+    Args:
+        path (str): SQLite file holding the manifest.
+        config (dict): JSON-serializable description of the run.
+        resume (bool): Continue the run recorded in `path` instead of starting a new one.
+    """
+
+    def __init__(self, path: str, config: Dict[str, Any], resume: bool = False):
+        self.path = path
+        if not resume and os.path.exists(path):
+            os.remove(path)
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS run (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS stages (name TEXT PRIMARY KEY, data TEXT, finished REAL);
+            CREATE TABLE IF NOT EXISTS frames (name TEXT PRIMARY KEY, result TEXT, committed REAL);
+        """)
+
+        recorded = self._db.execute("SELECT value FROM run WHERE key = 'config'").fetchone()
+        config_json = json.dumps(config, sort_keys=True)
+        if recorded is None:
+            with self._db:
+                self._db.execute("INSERT INTO run (key, value) VALUES ('config', ?)", (config_json,))
+        elif recorded[0] != config_json:
+            self._db.close()
+            raise ValueError(f"{path} belongs to a run with different settings ({recorded[0]}); start a new run instead of resuming")
+
+    def stage_done(self, name: str) -> bool:
+        return self._db.execute("SELECT 1 FROM stages WHERE name = ?", (name,)).fetchone() is not None
+
+    def stage_data(self, name: str) -> Optional[Dict[str, Any]]:
+        """Return the data stored when stage `name` finished, or None if it has not."""
+        row = self._db.execute("SELECT data FROM stages WHERE name = ?", (name,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def finish_stage(self, name: str, data: Optional[Dict[str, Any]] = None):
+        with self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO stages (name, data, finished) VALUES (?, ?, ?)",
+                (name, json.dumps(data or {}), time.time())
+            )
+
+    def commit_frame(self, name: str, result: Dict[str, Any]):
+        """Store the result of one frame durably."""
+        with self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO frames (name, result, committed) VALUES (?, ?, ?)",
+                (name, json.dumps(result, ensure_ascii=False, default=str), time.time())
+            )
+
+    def committed_results(self) -> Dict[str, Dict[str, Any]]:
+        """Return the committed results, keyed by frame name."""
+        return {name: json.loads(result) for name, result in self._db.execute("SELECT name, result FROM frames")}
+
+    def close(self):
+        self._db.close()
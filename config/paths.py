@@ -6,4 +6,33 @@ os.makedirs(OUTPUT_DIR, exist_ok=True)
 
 # Output file paths
 output_csv_file = os.path.join(OUTPUT_DIR, "important_frames.csv")
-output_json_file = os.path.join(OUTPUT_DIR, "results.json")
+# Frame results, streamed while the run progresses (the extension follows the chosen format)
+output_results_file = os.path.join(OUTPUT_DIR, "results.jsonl")
+
+# Persistent cache of keyframe selection features, kept across runs (outside "outputs", which is wiped on start)
+FEATURE_CACHE_DIR = os.path.join("cache", "features")
+
+# Persistent cache of LLM responses, keyed by image content, prompt and model
+LLM_CACHE_FILE = os.path.join("cache", "llm_responses.sqlite")
+
+# Searchable index of the CLIP embeddings and LLM answers of every processed keyframe, kept across runs
+KEYFRAME_INDEX_DIR = os.path.join("index", "keyframes")
+
+# Calibrated local pre-classifier that decides clear-cut frames without the LLM
+PRE_CLASSIFIER_FILE = os.path.join("models", "pre_classifier.json")
+
+# Per-stage trace of a run (see tracing/tracer.py), written with --trace
+TRACE_FILE = os.path.join(OUTPUT_DIR, "trace.jsonl")
+
+def run_paths(root: str = "outputs") -> dict:
+    """Output files of one run under `root`; with the default root these are the paths above."""
+    output_dir = os.path.join(root, "final_output")
+    return {
+        "keyframe_dir": os.path.join(root, "keyframes"),
+        "keyframes_csv": os.path.join(root, "keyframes.csv"),
+        "output_dir": output_dir,
+        "csv": os.path.join(output_dir, "important_frames.csv"),
+        "results": os.path.join(output_dir, "results.jsonl"),
+        "trace": os.path.join(output_dir, "trace.jsonl"),
+        "manifest": os.path.join(root, "run_manifest.sqlite"),  # finished stages and per-frame results, used by --resume
+    }
@@ -0,0 +1,111 @@
+import os
+import time
+import base64
+import hashlib
+import sqlite3
+import threading
+from typing import Dict, Optional
+
+class ResponseCache:
+    """SQLite-backed cache of LLM responses keyed by image content, prompt text and model name.
+
+    Entries older than `ttl_seconds` are ignored and purged; beyond `max_entries`, the least
+    recently used entries are evicted. `hits` and `misses` count lookups since creation.
+    """
+
+    def __init__(self, path: str, ttl_seconds: Optional[float] = None, max_entries: int = 100_000):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY, model TEXT, content TEXT, created REAL, last_used REAL
+            )
+        """)
+        self._db.commit()
+
+    @staticmethod
+    def make_key(model_name: str, messages, variables: Optional[Dict[str, str]] = None) -> str:
+        """Hash the model name, every text part and the decoded bytes of every image in `messages`.
+
+        Values of `variables` (e.g. the frame's file name) are replaced by their placeholder
+        before hashing, so they do not prevent hits for identical images and prompts.
+        """
+        digest = hashlib.sha256(model_name.encode())
+
+        for message in messages:
+            digest.update(type(message).__name__.encode())
+            parts = message.content if isinstance(message.content, list) else [{"type": "text", "text": message.content}]
+
+            for part in parts:
+                if part.get("type") == "image_url":
+                    url = part["image_url"]["url"] if isinstance(part["image_url"], dict) else part["image_url"]
+                    data = url.split(",", 1)[1] if url.startswith("data:") else url
+                    image_bytes = base64.b64decode(data) if url.startswith("data:") else data.encode()
+                    digest.update(b"image:" + hashlib.sha256(image_bytes).digest())
+                else:
+                    digest.update(b"text:" + _template(part.get("text", ""), variables).encode())
+
+        return digest.hexdigest()
+
+    def get(self, key: str, variables: Optional[Dict[str, str]] = None) -> Optional[str]:
+        """Return the cached response content for `key`, or None."""
+        with self._lock:
+            row = self._db.execute("SELECT content, created FROM responses WHERE key = ?", (key,)).fetchone()
+            now = time.time()
+
+            if row is None or (self.ttl_seconds is not None and now - row[1] > self.ttl_seconds):
+                self.misses += 1
+                return None
+
+            self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self.hits += 1
+
+        return _fill(row[0], variables)
+
+    def put(self, key: str, model_name: str, content: str, variables: Optional[Dict[str, str]] = None):
+        """Store a response and apply the TTL and size limits."""
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, model, content, created, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, model_name, _template(content, variables), now, now)
+            )
+            if self.ttl_seconds is not None:
+                self._db.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl_seconds,))
+            self._db.execute("""
+                DELETE FROM responses WHERE key IN (
+                    SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,))
+            self._db.commit()
+
+    def stats(self) -> Dict[str, float]:
+        """Return hit/miss counters and the number of stored entries."""
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+        }
+
+def _template(text: str, variables: Optional[Dict[str, str]]) -> str:
+    for name, value in (variables or {}).items():
+        if value:
+            text = text.replace(value, "{" + name + "}")
+    return text
+
+def _fill(text: str, variables: Optional[Dict[str, str]]) -> str:
+    for name, value in (variables or {}).items():
+        text = text.replace("{" + name + "}", value)
+    return text
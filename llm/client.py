@@ -0,0 +1,170 @@
+import time
+import random
+import threading
+from langchain_core.messages import AIMessage
+import llm.model as model_module
+from tracing.tracer import span
+
+class TokenBucket:
+    """Thread-safe token bucket allowing `rate_per_minute` acquisitions per minute with bursts up to `capacity`."""
+
+    def __init__(self, rate_per_minute: float, capacity: float = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else max(1.0, rate_per_minute / 6.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then take it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+
+            time.sleep(wait)
+
+_settings = {
+    "max_retries": 5,
+    "base_delay": 2.0,
+    "max_delay": 60.0,
+}
+_bucket = None
+_cache = None
+
+def configure(requests_per_minute: float = None, max_retries: int = 5, base_delay: float = 2.0, max_delay: float = 60.0,
+              cache=None):
+    """Set the request rate limit, the backoff policy and the response cache used by `invoke_model`.
+
+    `requests_per_minute=None` disables rate limiting and `cache=None` disables caching.
+    """
+    global _bucket, _cache
+    _bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+    _cache = cache
+    _settings.update(max_retries=max_retries, base_delay=base_delay, max_delay=max_delay)
+
+def get_cache():
+    """Return the configured `ResponseCache`, or None."""
+    return _cache
+
+def model_name() -> str:
+    model = model_module.model
+    return str(getattr(model, "model", None) or getattr(model, "model_name", None) or type(model).__name__)
+
+# Quota errors of the Gemini clients (and other providers), matched by class name so none of them has to be installed
+_QUOTA_ERRORS = ("ResourceExhausted", "TooManyRequests", "RateLimitError", "ModelRateLimitError")
+
+def _status_code(e: Exception):
+    for value in (getattr(e, "code", None), getattr(e, "status_code", None),
+                  getattr(getattr(e, "response", None), "status_code", None)):
+        if isinstance(value, int):
+            return value
+    return None
+
+def _is_quota_error(e: Exception) -> bool:
+    """Whether an error, or an error it was raised from, is a quota error (by type or HTTP status 429)."""
+    while e is not None:
+        if any(cls.__name__ in _QUOTA_ERRORS for cls in type(e).__mro__) or _status_code(e) == 429:
+            return True
+        e = e.__cause__
+    return False
+
+def content_text(content) -> str:
+    """Text of a response's content, which some providers return as a list of parts."""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(part if isinstance(part, str) else str(part.get("text", "")) for part in content)
+    return str(content)
+
+def invoke_model(messages, cache_vars=None, validate=None):
+    """Send messages to the configured LLM, respecting the rate limit and backing off on quota errors.
+
+    If a response cache is configured, identical requests (same image bytes, prompt text and
+    model) are answered from it without a network call. `cache_vars` maps placeholder names to
+    values that vary between otherwise identical requests, such as the frame's file name; they
+    are left out of the cache key and substituted back into cached responses.
+
+    The returned message's content is always a string. `validate(content)` tells whether the
+    caller could parse a response; responses it rejects are not cached, so a bad answer is
+    asked again on the next run instead of being replayed.
+
+    Quota errors are retried with exponential backoff and jitter; any other error is raised
+    immediately, as are quota errors once `max_retries` is exhausted.
+    """
+    with span("llm") as event:
+        if event is not None:
+            event["request_bytes"] = _request_bytes(messages)
+
+        if _cache is not None:
+            name = model_name()
+            key = _cache.make_key(name, messages, cache_vars)
+            content = _cache.get(key, cache_vars)
+            if content is not None:
+                if event is not None:
+                    event.update(cache_hits=1, response_bytes=len(content.encode("utf-8")))
+                return AIMessage(content=content)
+
+            response = _invoke_with_retries(messages, event)
+            if validate is None or validate(response.content):
+                _cache.put(key, name, response.content, cache_vars)
+        else:
+            response = _invoke_with_retries(messages, event)
+
+        if event is not None:
+            _record_response(event, response)
+        return response
+
+def _request_bytes(messages) -> int:
+    """Size of the text and image payloads of a request."""
+    size = 0
+    for message in messages:
+        parts = message.content if isinstance(message.content, list) else [{"type": "text", "text": message.content}]
+        for part in parts:
+            if part.get("type") == "image_url":
+                url = part["image_url"]["url"] if isinstance(part["image_url"], dict) else part["image_url"]
+                size += len(url)
+            else:
+                size += len(part.get("text", "").encode("utf-8"))
+    return size
+
+def _record_response(event, response):
+    event["response_bytes"] = len(response.content.encode("utf-8"))
+
+    # Token counts, when the provider reports them
+    usage = getattr(response, "usage_metadata", None) or {}
+    if usage:
+        event["input_tokens"] = usage.get("input_tokens", 0)
+        event["output_tokens"] = usage.get("output_tokens", 0)
+
+def _invoke_with_retries(messages, event=None):
+    attempt = 0
+    while True:
+        if _bucket is not None:
+            _bucket.acquire()
+
+        try:
+            response = model_module.model.invoke(messages)
+            response.content = content_text(response.content)
+            if event is not None:
+                event["requests"] = attempt + 1
+                event["retries"] = attempt
+            return response
+        except Exception as e:
+            if not _is_quota_error(e) or attempt >= _settings["max_retries"]:
+                if event is not None:
+                    event["requests"] = attempt + 1
+                    event["retries"] = attempt
+                raise
+
+            delay = min(_settings["max_delay"], _settings["base_delay"] * (2 ** attempt))
+            delay *= random.uniform(0.5, 1.0)
+            print(f"  Quota error, retrying in {delay:.1f}s ({attempt + 1}/{_settings['max_retries']}): {str(e)[:80]}")
+            time.sleep(delay)
+            attempt += 1
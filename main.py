@@ -2,26 +2,65 @@ import warnings
 warnings.filterwarnings("ignore")
 import os 
 import shutil
-import json
+import argparse
 
 
 import time
-from KeyFrameSelection.FeatureExtraction import process_video, save_records
-from KeyFrameSelection.Similarties import hash_filter, clip_filter
-from FrameProcessor.utils.io_utils import get_frames_from_folder, save_description_to_csv
+import numpy as np
+from KeyFrameSelection.FeatureExtraction import process_video, save_records, materialize_records, keyframe_name, sampler_key, video_duration
+from KeyFrameSelection.FrameSpill import FrameSpill
+from KeyFrameSelection.Similarties import hash_filter, clip_filter, budget_filter
+from KeyFrameSelection.Pipeline import stream_keyframes, open_feature_store
+from KeyFrameSelection.Embedders import get_embedder
+from FrameProcessor.utils.result_sinks import CsvSink, open_results_sink
+from FrameProcessor.utils.image_utils import FrameImage
 from FrameProcessor.processor.multi_frame import process_frames
-from config.paths import output_csv_file, output_json_file
+from llm.client import configure as configure_llm, get_cache as get_llm_cache
+from llm.cache import ResponseCache
+from FrameProcessor.gating.pre_classifier import PreClassifier, configure as configure_pre_classifier, get_pre_classifier
+from tracing.tracer import configure as configure_tracing, get_tracer
+from checkpoint.manifest import RunManifest, is_complete
+from search.index import KeyframeIndex
+from KeyFrameSelection.FeatureCache import video_fingerprint
+from config.paths import FEATURE_CACHE_DIR, LLM_CACHE_FILE, PRE_CLASSIFIER_FILE, TRACE_FILE, KEYFRAME_INDEX_DIR, run_paths
 
 # Input/output paths
+output_root = 'outputs'
 keyframe_dir = 'outputs/keyframes'
 csv_path = 'outputs/keyframes.csv'
 video_path = 'RawVideos\Filters - Mohammad Ayed (720p, h264).mp4'  # Adjust as needed
 
-def main():
-    # Step 1: Extract raw keyframes from video
-    records, fps = process_video(video_path, interval_sec=10)
+# Sampling interval in budget mode, where samples are only candidates for the budgeted selection
+BUDGET_INTERVAL_SEC = 2
 
-    # Step 2: Filter keyframes
+def sampling_interval(decode_mode, max_gap_sec=60, budgeted=False):
+    """Seconds between samples of a run; the adaptive sampler follows content changes, so its interval is only the longest gap."""
+    if decode_mode == "adaptive":
+        return max_gap_sec
+    return BUDGET_INTERVAL_SEC if budgeted else 10
+
+def select_keyframes(video_path, stream=False, max_in_flight=16, decode_mode="decode", use_cache=True, cache_max_gb=2.0,
+                     clip_backend=None, scene_threshold=0.02, min_gap_sec=1.0, max_gap_sec=60, decode_workers=1,
+                     budget=None, budget_per_minute=None, with_embeddings=True, proxy_filters=False, spill_frames=False):
+    """Steps 1 & 2: extract raw keyframes from the video and filter them. Returns (records, fps, embeddings).
+
+    With `budget` (a keyframe count) or `budget_per_minute`, the samples are reduced to that many
+    keyframes by `budget_filter` instead of the threshold tuning loop; it selects from every sample,
+    so it cannot be combined with `stream`. `embeddings` holds the CLIP
+    embeddings of the keyframes if `with_embeddings` is set, otherwise None; the CLIP model is only
+    loaded if a filter or the embeddings need it.
+
+    With `proxy_filters`, the filters run on small proxies instead of the full-resolution samples,
+    which may select slightly different keyframes. The selected keyframes are then decoded again at
+    full resolution (see `materialize_records`), unless `spill_frames` (which implies
+    `proxy_filters`) keeps every sampled frame in a temporary spill file to read them back from.
+    """
+    budgeted = budget is not None or budget_per_minute is not None
+    if budgeted and stream:
+        raise ValueError("A keyframe budget selects from every sample and cannot be combined with stream")
+    proxies = proxy_filters or spill_frames
+
+    interval_sec = sampling_interval(decode_mode, max_gap_sec, budgeted)
     min_frames = 10
     max_iterations = 20
     iteration = 0
@@ -30,62 +69,357 @@ def main():
     ssim_threshold = 0.95
     clip_threshold = 0.90
 
-    filtered = records
+    # Hashes, thumbnails and embeddings are computed once and reused by every tuning iteration (and by later runs if cached)
+    store = open_feature_store(
+        video_path,
+        cache_dir=FEATURE_CACHE_DIR if use_cache else None,
+        cache_max_bytes=int(cache_max_gb * 1024 ** 3),
+        proxies=proxies
+    )
+    # With a spill, full-resolution frames wait on disk until the filters have picked the survivors from the proxies
+    spill = FrameSpill() if spill_frames else None
 
-    while len(filtered) >= min_frames and iteration < max_iterations:
-        filtered = hash_filter(
-            filtered,
+    if stream:
+        # First filtering pass runs while decoding, so only survivors are ever kept in memory
+        filtered, fps = stream_keyframes(
+            video_path,
+            interval_sec=interval_sec,
+            max_in_flight=max_in_flight,
+            mode=decode_mode,
+            scene_threshold=scene_threshold,
+            min_gap_sec=min_gap_sec,
+            decode_workers=decode_workers,
+            spill=spill,
+            proxies=proxies,
             hash_threshold=hash_threshold,
             ssim_threshold=ssim_threshold,
-            ssim_compare_window=5
+            ssim_compare_window=5,
+            clip_threshold=clip_threshold,
+            clip_compare_window=5,
+            store=store,
+            embedder=get_embedder(clip_backend)
         )
 
-        filtered = clip_filter(
-            filtered,
-            similarity_threshold=clip_threshold,
-            compare_window=5
-        )
-
-        # Threshold tuning
         hash_threshold = max(1, hash_threshold - 1)
         ssim_threshold = max(0.5, ssim_threshold - 0.05)
         clip_threshold = min(0.99, clip_threshold + 0.03)
 
         iteration += 1
         print(f"Iter {iteration}: {len(filtered)} frames")
+    else:
+        records, fps = process_video(video_path, interval_sec=interval_sec, mode=decode_mode, store=store,
+                                     scene_threshold=scene_threshold, min_gap_sec=min_gap_sec, workers=decode_workers,
+                                     spill=spill, proxies=proxies)
+        filtered = records
+
+    if budgeted:
+        # One k-center pass over the candidates' hashes and embeddings replaces the threshold tuning
+        if budget is None:
+            # Container duration, or up to the last sample if the metadata does not give it
+            seconds = video_duration(video_path) or ((filtered[-1][1] + 1) / fps if filtered else 0)
+            budget = max(1, round(budget_per_minute * seconds / 60)) if filtered else 0
+        candidates = len(filtered)
+        filtered = budget_filter(filtered, budget, fps, hash_threshold=hash_threshold, store=store,
+                                 embedder=get_embedder(clip_backend))
+        print(f"Budget: {len(filtered)} of {candidates} frames")
+    else:
+        while len(filtered) >= min_frames and iteration < max_iterations:
+            filtered = hash_filter(
+                filtered,
+                hash_threshold=hash_threshold,
+                ssim_threshold=ssim_threshold,
+                ssim_compare_window=5,
+                store=store
+            )
+
+            filtered = clip_filter(
+                filtered,
+                similarity_threshold=clip_threshold,
+                compare_window=5,
+                store=store,
+                embedder=get_embedder(clip_backend)
+            )
+
+            # Threshold tuning
+            hash_threshold = max(1, hash_threshold - 1)
+            ssim_threshold = max(0.5, ssim_threshold - 0.05)
+            clip_threshold = min(0.99, clip_threshold + 0.03)
+
+            iteration += 1
+            print(f"Iter {iteration}: {len(filtered)} frames")
+
+    # CLIP embeddings of the survivors for the keyframe index, mostly computed by the filters already
+    embeddings = None
+    if with_embeddings:
+        embedder = get_embedder(clip_backend)
+        embeddings = np.asarray(store.get_many(f"clip:{embedder.name}", filtered, embedder.embed), dtype=np.float32)
+    store.flush()
+
+    if spill is not None:
+        filtered = spill.materialize(filtered)
+        spill.close()
+    elif proxies:
+        # Proxies are dropped, so the caller decodes the keyframes at full resolution
+        filtered = [(None, frame_idx) for _, frame_idx in filtered]
+    return filtered, fps, embeddings
+
+def prepare_outputs(root=output_root, resume=False):
+    """Create the output folders of a run under `root`, wiping an earlier run's outputs unless resuming."""
+    if os.path.exists(root) and not resume:
+        shutil.rmtree(root)
+    os.makedirs(run_paths(root)["output_dir"], exist_ok=True)
+
+def _frame_images(records, fps, video_path, keyframe_dir=keyframe_dir):
+    """Wrap keyframes for the frame processor, decoding only frames that are neither in memory nor on disk."""
+    paths = [os.path.join(keyframe_dir, keyframe_name(frame_idx, fps)) for _, frame_idx in records]
+    missing = [(frame, frame_idx) for (frame, frame_idx), path in zip(records, paths) if frame is None and not os.path.exists(path)]
+    decoded = {frame_idx: frame for frame, frame_idx in materialize_records(missing, video_path)}
+
+    frames = []
+    for (frame, frame_idx), path in zip(records, paths):
+        name = keyframe_name(frame_idx, fps)
+        frame = frame if frame is not None else decoded.get(frame_idx)
+        frames.append(FrameImage(frame, name=name, path=path if os.path.exists(path) else None))
+    return frames
+
+def main(video_path=video_path, stream=False, max_in_flight=16, decode_mode="decode", use_cache=True, cache_max_gb=2.0,
+         clip_backend=None, importance_batch_size=1, max_concurrency=1, save_keyframes=True, single_call=False, resume=False,
+         results_format="jsonl", output_dir=output_root, scene_threshold=0.02, min_gap_sec=1.0, max_gap_sec=60,
+         index_dir=KEYFRAME_INDEX_DIR, decode_workers=1, budget=None, budget_per_minute=None, proxy_filters=False,
+         spill_frames=False):
+    """Run the whole pipeline on one video, writing its outputs under `output_dir`. Returns the run's counts."""
+    paths = run_paths(output_dir)
+    budgeted = budget is not None or budget_per_minute is not None
+    proxies = proxy_filters or spill_frames
+    sampler = sampler_key(decode_mode, sampling_interval(decode_mode, max_gap_sec, budgeted), scene_threshold, min_gap_sec)
 
-    # Step 3: Save filtered keyframes
-    save_records(filtered, keyframe_dir, csv_path, fps)
-    print("Keyframe selection process completed successfully.")
+    video_id = video_fingerprint(video_path)
 
-    # Step 4: Process keyframes using FrameProcessor
+    # Progress is committed to the manifest as it happens, so `resume` skips finished stages and frames
+    manifest = RunManifest(
+        paths["manifest"],
+        config={"video": video_id, "stream": stream, "sampler": sampler, "clip_backend": clip_backend,
+                **({"budget": budget, "budget_per_minute": budget_per_minute} if budgeted else {}),
+                **({"proxy_filters": True} if proxies else {})},
+        resume=resume
+    )
+    # Keyframes are added to the search index with their embeddings, and get their LLM answers as frames finish
+    index = KeyframeIndex(index_dir) if index_dir else None
+
+    if manifest.stage_done("keyframes"):
+        keyframes = manifest.stage_data("keyframes")
+        fps = keyframes["fps"]
+        filtered = [(None, frame_idx) for frame_idx in keyframes["frame_idxs"]]
+        print(f"Resuming: keyframe selection already done ({len(filtered)} keyframes)")
+    else:
+        filtered, fps, embeddings = select_keyframes(video_path, stream=stream, max_in_flight=max_in_flight, decode_mode=decode_mode,
+                                                     use_cache=use_cache, cache_max_gb=cache_max_gb, clip_backend=clip_backend,
+                                                     scene_threshold=scene_threshold, min_gap_sec=min_gap_sec,
+                                                     max_gap_sec=max_gap_sec, decode_workers=decode_workers,
+                                                     budget=budget, budget_per_minute=budget_per_minute,
+                                                     with_embeddings=index is not None, proxy_filters=proxy_filters,
+                                                     spill_frames=spill_frames)
+
+        # Step 3: Decode filtered keyframes if the samples came from the cache, and optionally save them
+        filtered = materialize_records(filtered, video_path)
+        if save_keyframes:
+            save_records(filtered, paths["keyframe_dir"], paths["keyframes_csv"], fps)
+        if index is not None:
+            index.add_video(video_id, os.path.abspath(video_path), fps, [frame_idx for _, frame_idx in filtered],
+                            embeddings, get_embedder(clip_backend).name)
+        manifest.finish_stage("keyframes", {"fps": fps, "frame_idxs": [int(frame_idx) for _, frame_idx in filtered]})
+        print("Keyframe selection process completed successfully.")
+
+    # Step 4: Process keyframes using FrameProcessor, handing over the decoded frames directly
     print("\n--- Frame Processing Started ---")
-    frame_paths = get_frames_from_folder(keyframe_dir)
-    results = process_frames(frame_paths)
+    names = [keyframe_name(frame_idx, fps) for _, frame_idx in filtered]
+    committed = manifest.committed_results()
+    pending = [record for record, name in zip(filtered, names) if name not in committed]
+    if manifest.stage_done("frames"):
+        print(f"Resuming: all {len(names)} frames already processed")
+    elif committed:
+        print(f"Resuming: {len(names) - len(pending)} of {len(names)} frames already processed")
 
-    # Step 5: Show final summary
-    important_frames = [r for r in results if r["importance"] == "important"]
+    # Results are streamed to the output files in keyframe order: a result is held back only until
+    # the frames before it are done, and frames committed by an earlier attempt are merged in, so
+    # a resumed run writes the same outputs as an uninterrupted one
+    results_sink = open_results_sink(paths["results"], results_format)
+    csv_sink = CsvSink(paths["csv"])
+    counts = {"total": 0, "important": 0, "complete": 0}
+    ready = {name: committed[name] for name in names if name in committed}
+    written = 0
+
+    def write(result):
+        results_sink.write(result)
+        csv_sink.write(result)
+        counts["total"] += 1
+        counts["important"] += result["importance"] == "important"
+        counts["complete"] += is_complete(result)
+
+    def write_ready():
+        nonlocal written
+        while written < len(names) and names[written] in ready:
+            write(ready.pop(names[written]))
+            written += 1
+
+    def commit(result):
+        # Errors are not committed, so a resumed run retries those frames
+        if is_complete(result):
+            manifest.commit_frame(result["frame"], result)
+        if index is not None:
+            index.update_frame(video_id, result)
+        ready[result["frame"]] = result
+        write_ready()
+
+    write_ready()
+    try:
+        process_frames(_frame_images(pending, fps, video_path, paths["keyframe_dir"]),
+                       importance_batch_size=importance_batch_size, max_concurrency=max_concurrency,
+                       single_call=single_call, on_result=commit)
+    finally:
+        # Frames that produced no result leave a gap; the results after it are still written in order
+        for name in names[written:]:
+            if name in ready:
+                write(ready.pop(name))
+        results_sink.close()
+        csv_sink.close()
+    if counts["complete"] == len(names):
+        manifest.finish_stage("frames")
 
-    for result in important_frames:
-        save_description_to_csv(result, output_csv_file)
-    
-    with open(output_json_file, 'w', encoding='utf-8') as f:
-        json.dump(results, f, indent=2, ensure_ascii=False)
+    # Step 5: Show final summary
+    manifest.close()
+    if index is not None:
+        index.close()
 
     print("\n--- Final Summary ---")
-    print(f"Total frames processed: {len(results)}")
-    print(f"Important frames: {len(important_frames)}")
-    print(f"Output CSV: {output_csv_file}")
-    print(f"Output JSON: {output_json_file}")
+    print(f"Total frames processed: {counts['total']}")
+    print(f"Important frames: {counts['important']}")
+    print(f"Output CSV: {csv_sink.path}")
+    print(f"Output results: {results_sink.path}")
+
+    llm_cache = get_llm_cache()
+    if llm_cache is not None:
+        stats = llm_cache.stats()
+        print(f"LLM cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries")
+
+    pre_classifier = get_pre_classifier()
+    if pre_classifier is not None:
+        stats = pre_classifier.stats()
+        print(f"Pre-classifier: saved {stats['calls_saved']} of {stats['evaluated']} importance calls ({stats['saved_rate']:.0%})")
+        if stats["audited"]:
+            print(f"Pre-classifier audit: disagreed with the LLM on {stats['disagreements']} of {stats['audited']} frames")
+
+    return {"keyframes": len(names), "frames": counts["total"], "important": counts["important"], "results": results_sink.path}
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Extract and describe keyframes from a video.")
+    parser.add_argument("--video_path", default=video_path, help="Path to the input video file.")
+    parser.add_argument("--stream", action="store_true",
+                        help="Filter frames while decoding instead of holding every sampled frame in memory.")
+    parser.add_argument("--max_in_flight", type=int, default=16,
+                        help="Maximum number of frames buffered per stage in streaming mode.")
+    parser.add_argument("--decode_mode", choices=["decode", "seek", "keyframes", "adaptive"], default="decode",
+                        help="How frames are sampled: decode every frame, seek to each sample, decode keyframes only, "
+                             "or decode every frame and sample on content changes.")
+    parser.add_argument("--scene_threshold", type=float, default=0.02,
+                        help="Adaptive sampling: mean thumbnail difference (0-1) from the last sample that counts as a change.")
+    parser.add_argument("--min_gap_sec", type=float, default=1.0,
+                        help="Adaptive sampling: shortest time between samples.")
+    parser.add_argument("--max_gap_sec", type=float, default=60,
+                        help="Adaptive sampling: longest time between samples, even without changes.")
+    budget = parser.add_mutually_exclusive_group()
+    budget.add_argument("--budget", type=int, default=None,
+                        help="Select exactly this many keyframes in one pass over frames sampled every "
+                             f"{BUDGET_INTERVAL_SEC}s, instead of tuning the filter thresholds.")
+    budget.add_argument("--budget_per_minute", type=float, default=None,
+                        help="Like --budget, with the number of keyframes given per minute of video.")
+    parser.add_argument("--decode_workers", type=int, default=1,
+                        help="Processes decoding keyframe-aligned segments of the video in parallel (not used in adaptive mode).")
+    parser.add_argument("--proxy_filters", action="store_true",
+                        help="Run the similarity filters on 224-pixel proxies of the samples and decode the selected "
+                             "keyframes again at full resolution; faster and lighter, but may select slightly different keyframes.")
+    parser.add_argument("--spill_frames", action="store_true",
+                        help="With --proxy_filters (implied), keep full-resolution samples in a temporary file (about 1 GB "
+                             "per hour of 1080p at the default interval) instead of decoding the selected keyframes again.")
+    parser.add_argument("--no_cache", action="store_true",
+                        help="Do not read or write the persistent feature cache.")
+    parser.add_argument("--cache_max_gb", type=float, default=2.0,
+                        help="Size limit of the persistent feature cache in GiB.")
+    parser.add_argument("--clip_backend", choices=["fp32", "int8", "onnx"], default=None,
+                        help="CLIP embedding backend (defaults to the CLIP_BACKEND environment variable, or fp32).")
+    parser.add_argument("--importance_batch_size", type=int, default=1,
+                        help="Number of frames evaluated per importance request to the LLM.")
+    parser.add_argument("--max_concurrency", type=int, default=1,
+                        help="Number of frames (or importance batches) processed at the same time.")
+    parser.add_argument("--requests_per_minute", type=float, default=None,
+                        help="Maximum number of LLM requests per minute (no limit by default).")
+    parser.add_argument("--max_retries", type=int, default=5,
+                        help="Retries with exponential backoff when the LLM reports a quota error.")
+    parser.add_argument("--no_llm_cache", action="store_true",
+                        help="Always call the LLM instead of reusing cached responses.")
+    parser.add_argument("--llm_cache_ttl_days", type=float, default=30,
+                        help="Days after which cached LLM responses expire.")
+    parser.add_argument("--pre_classifier", nargs="?", const=PRE_CLASSIFIER_FILE, default=None,
+                        help="Decide clear-cut frames with a calibrated local classifier instead of the LLM "
+                             f"(defaults to {PRE_CLASSIFIER_FILE}; calibrate with python -m FrameProcessor.gating.pre_classifier).")
+    parser.add_argument("--pre_classifier_confidence", type=float, default=None,
+                        help="Probability the pre-classifier needs to decide a frame (defaults to the calibrated value).")
+    parser.add_argument("--pre_classifier_audit_rate", type=float, default=0.0,
+                        help="Share of locally decided frames still sent to the LLM to measure disagreement.")
+    parser.add_argument("--single_call", action="store_true",
+                        help="Classify and describe each frame with one LLM request instead of two for important frames.")
+    parser.add_argument("--trace", nargs="?", const=TRACE_FILE, default=None,
+                        help=f"Record per-stage timings, frame counts and LLM sizes/tokens/retries as JSONL (defaults to {TRACE_FILE}) "
+                             "and print a summary table at the end.")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue the previous run from its manifest instead of wiping outputs; finished stages and frames are skipped.")
+    parser.add_argument("--results_format", choices=["jsonl", "parquet", "arrow"], default="jsonl",
+                        help="Format of the results file, written incrementally during the run (parquet and arrow need pyarrow).")
+    parser.add_argument("--index_dir", default=KEYFRAME_INDEX_DIR,
+                        help="Search index the keyframes are added to (see search/index.py).")
+    parser.add_argument("--no_index", action="store_true", help="Do not add the keyframes to the search index.")
+    parser.add_argument("--no_save_keyframes", action="store_true",
+                        help="Do not write keyframe images and their CSV; frames are processed from memory either way.")
+    args = parser.parse_args()
+    if args.stream and (args.budget is not None or args.budget_per_minute is not None):
+        parser.error("--budget and --budget_per_minute select from every sample and cannot be combined with --stream")
+    return args
 
 if __name__ == "__main__":
+    args = parse_args()
+    configure_llm(
+        requests_per_minute=args.requests_per_minute,
+        max_retries=args.max_retries,
+        cache=None if args.no_llm_cache else ResponseCache(LLM_CACHE_FILE, ttl_seconds=args.llm_cache_ttl_days * 86400)
+    )
+    if args.pre_classifier:
+        configure_pre_classifier(PreClassifier.load(
+            args.pre_classifier,
+            confidence=args.pre_classifier_confidence,
+            audit_rate=args.pre_classifier_audit_rate
+        ))
     start = time.time()
 
-    if os.path.exists("outputs"):
-        shutil.rmtree("outputs")
-    os.makedirs("outputs/final_output", exist_ok=True)
+    prepare_outputs(output_root, resume=args.resume)
+
+    if args.trace:
+        configure_tracing(args.trace)
 
-    main()
+    main(args.video_path, stream=args.stream, max_in_flight=args.max_in_flight, decode_mode=args.decode_mode,
+         use_cache=not args.no_cache, cache_max_gb=args.cache_max_gb, clip_backend=args.clip_backend,
+         importance_batch_size=args.importance_batch_size, max_concurrency=args.max_concurrency,
+         save_keyframes=not args.no_save_keyframes, single_call=args.single_call, resume=args.resume,
+         results_format=args.results_format, scene_threshold=args.scene_threshold, min_gap_sec=args.min_gap_sec,
+         max_gap_sec=args.max_gap_sec, index_dir=None if args.no_index else args.index_dir, decode_workers=args.decode_workers,
+         budget=args.budget, budget_per_minute=args.budget_per_minute, proxy_filters=args.proxy_filters,
+         spill_frames=args.spill_frames)
 
     end = time.time()
+
+    tracer = get_tracer()
+    if tracer is not None:
+        tracer.print_summary()
+        tracer.close()
+        print(f"Trace: {args.trace}")
+
     print(f"\nTotal time: {end - start:.2f} sec")
@@ -0,0 +1,253 @@
+import os
+import time
+import uuid
+import sqlite3
+import numpy as np
+from typing import List, Dict, Any, Optional, Union
+from config.paths import KEYFRAME_INDEX_DIR
+
+class KeyframeIndex:
+    """Persistent vector index of the CLIP embeddings of selected keyframes, searchable by text or image.
+
+    Embeddings are appended to one raw float32 file that is memory-mapped for queries; the
+    video, frame index, timestamp and LLM answer of every row are kept in SQLite. Appends run
+    in a SQLite write transaction, so several processes (e.g. batch workers) can add videos
+    to the same index. Re-adding a video replaces its rows: the file is rewritten without the
+    old vectors under a new name, so readers still mapping the previous file are unaffected.
+
+    An index holds the embeddings of one embedder (`ClipEmbedder.name`, which tells quantized
+    backends apart), and queries are embedded with the same backend.
+
+    Queries compare against every row with one matrix product, which stays well under a
+    second for hundreds of thousands of keyframes.
+
+    Args:
+        path (str): Folder of the index.
+        embedder (ClipEmbedder, optional): Embedder for queries; loaded with `get_embedder` on the first query.
+    """
+
+    def __init__(self, path: str = KEYFRAME_INDEX_DIR, embedder=None):
+        self.path = path
+        self.embedder = embedder
+        os.makedirs(path, exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(path, "index.sqlite"), timeout=30, isolation_level=None)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS frames (
+                row INTEGER PRIMARY KEY, video_id TEXT, video_path TEXT, name TEXT, frame_idx INTEGER,
+                timestamp REAL, importance TEXT, extracted_text TEXT, visual_description TEXT
+            );
+            CREATE INDEX IF NOT EXISTS frames_video ON frames (video_id, name);
+        """)
+        self._loaded_version = ""
+        self._matrix = None
+        self._rows = None
+
+    def _meta(self, key: str) -> Optional[str]:
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value):
+        self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def _vectors_path(self) -> str:
+        return os.path.join(self.path, self._meta("vectors") or "embeddings.f32")
+
+    def _compact(self, video_id: str, dim: int) -> int:
+        """Drop the rows of a video and write the remaining vectors to a new file. Returns their count.
+
+        The previous file stays in place until the caller commits, so a rollback leaves the index intact."""
+        old_path = self._vectors_path()
+        rows = int(self._meta("rows") or 0)
+        live = [row for (row,) in self._db.execute("SELECT row FROM frames WHERE video_id != ? ORDER BY row", (video_id,))]
+
+        filename = f"embeddings-{uuid.uuid4().hex[:8]}.f32"
+        with open(os.path.join(self.path, filename), "wb") as f:
+            if live:
+                vectors = np.memmap(old_path, dtype=np.float32, mode="r", shape=(rows, dim))
+                f.write(np.ascontiguousarray(vectors[live]).tobytes())
+                del vectors
+
+        self._db.execute("DELETE FROM frames WHERE video_id = ?", (video_id,))
+        # Rows only move down and are renumbered in order, so no two rows ever share a number
+        self._db.executemany("UPDATE frames SET row = ? WHERE row = ?", [(i, row) for i, row in enumerate(live)])
+        self._set_meta("vectors", filename)
+        self._set_meta("rows", len(live))
+        return len(live)
+
+    def add_video(self, video_id: str, video_path: str, fps: float, frame_idxs: List[int], embeddings: np.ndarray,
+                  embedder_name: str) -> int:
+        """Append the keyframes of a video with their CLIP embeddings (from the embedder named `embedder_name`),
+        replacing rows it had before."""
+        if len(frame_idxs) == 0:
+            return 0
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        if len(embeddings) != len(frame_idxs):
+            raise ValueError("One embedding per frame is needed")
+
+        from KeyFrameSelection.FeatureExtraction import keyframe_name
+
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            indexed_embedder = self._meta("embedder")
+            if indexed_embedder is None:
+                self._set_meta("embedder", embedder_name)
+                self._set_meta("dim", embeddings.shape[1])
+            elif indexed_embedder != embedder_name or int(self._meta("dim")) != embeddings.shape[1]:
+                raise ValueError(f"{self.path} holds {indexed_embedder} embeddings; cannot add {embedder_name} embeddings")
+
+            replaced = None
+            if self._db.execute("SELECT 1 FROM frames WHERE video_id = ? LIMIT 1", (video_id,)).fetchone():
+                replaced = self._vectors_path()
+                start = self._compact(video_id, embeddings.shape[1])
+            else:
+                # Rows are placed by the count in SQLite, so bytes left by an interrupted append are overwritten
+                start = int(self._meta("rows") or 0)
+            vectors_path = self._vectors_path()
+            mode = "r+b" if os.path.exists(vectors_path) else "wb"
+            with open(vectors_path, mode) as f:
+                f.seek(start * embeddings.shape[1] * 4)
+                f.write(embeddings.tobytes())
+
+            self._db.executemany(
+                "INSERT INTO frames (row, video_id, video_path, name, frame_idx, timestamp) VALUES (?, ?, ?, ?, ?, ?)",
+                [(start + i, video_id, video_path, keyframe_name(frame_idx, fps), int(frame_idx), frame_idx / fps)
+                 for i, frame_idx in enumerate(frame_idxs)]
+            )
+            self._set_meta("rows", start + len(frame_idxs))
+            self._set_meta("version", int(self._meta("version") or 0) + 1)
+            self._db.execute("COMMIT")
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+
+        if replaced is not None:
+            try:
+                os.remove(replaced)
+            except OSError:
+                # Still memory-mapped by a reader (e.g. on Windows); it is only an orphaned file then
+                pass
+        return len(frame_idxs)
+
+    def update_frame(self, video_id: str, result: Dict[str, Any]):
+        """Attach the LLM answer of a processed frame (a frame processor result) to its row."""
+        description = result.get("description") or {}
+        self._db.execute(
+            "UPDATE frames SET importance = ?, extracted_text = ?, visual_description = ? WHERE video_id = ? AND name = ?",
+            (result.get("importance"), description.get("extracted_text"), description.get("visual_description"),
+             video_id, result.get("frame"))
+        )
+
+    def _load(self):
+        """Memory-map the embeddings again if another writer changed the index since the last query."""
+        version = self._meta("version") or "0"
+        if version == self._loaded_version:
+            return
+
+        rows = int(self._meta("rows") or 0)
+        live = np.array([row for (row,) in self._db.execute("SELECT row FROM frames ORDER BY row")], dtype=np.int64)
+        if rows == 0 or len(live) == 0:
+            self._matrix, self._rows = np.empty((0, 0), dtype=np.float32), live
+        else:
+            vectors = np.memmap(self._vectors_path(), dtype=np.float32, mode="r", shape=(rows, int(self._meta("dim"))))
+            # Rows without a frame are skipped; while there are none the file is used in place
+            self._matrix = vectors if len(live) == rows else np.ascontiguousarray(vectors[live])
+            self._rows = live
+        self._loaded_version = version
+
+    def _query_vector(self, query: Union[str, np.ndarray]) -> np.ndarray:
+        indexed_embedder = self._meta("embedder")
+        if self.embedder is None:
+            from KeyFrameSelection.Embedders import get_embedder
+            # Names of non-fp32 backends end with "@<backend>" (see `ClipEmbedder.name`)
+            backend = (indexed_embedder.rpartition("@")[2] if "@" in indexed_embedder else "fp32") if indexed_embedder else None
+            self.embedder = get_embedder(backend)
+
+        if indexed_embedder is not None and indexed_embedder != self.embedder.name:
+            raise ValueError(f"{self.path} holds {indexed_embedder} embeddings, the query embedder is {self.embedder.name}")
+
+        if isinstance(query, str):
+            return self.embedder.embed_text([query])[0]
+        return self.embedder.embed([query])[0]
+
+    def search(self, query: Union[str, np.ndarray], k: int = 10, important_only: bool = False) -> List[Dict[str, Any]]:
+        """Return the `k` keyframes closest to a text query or a BGR image, best first."""
+        vector = self._query_vector(query)
+        self._load()
+        if len(self._rows) == 0:
+            return []
+
+        scores = self._matrix @ vector
+        if important_only:
+            important = {row for (row,) in self._db.execute("SELECT row FROM frames WHERE importance = 'important'")}
+            scores = np.where(np.isin(self._rows, list(important)), scores, -np.inf)
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        top = [i for i in top if np.isfinite(scores[i])]
+        if not top:
+            return []
+
+        rows = {row[0]: row for row in self._db.execute(
+            f"SELECT row, video_id, video_path, name, frame_idx, timestamp, importance, extracted_text, visual_description "
+            f"FROM frames WHERE row IN ({','.join('?' * len(top))})", [int(self._rows[i]) for i in top]
+        )}
+        results = []
+        for i in top:
+            row = rows.get(int(self._rows[i]))
+            if row is None:
+                continue
+            _, video_id, video_path, name, frame_idx, timestamp, importance, extracted_text, visual_description = row
+            results.append({
+                "score": float(scores[i]),
+                "video_id": video_id,
+                "video_path": video_path,
+                "frame": name,
+                "frame_idx": frame_idx,
+                "timestamp": timestamp,
+                "importance": importance,
+                "extracted_text": extracted_text,
+                "visual_description": visual_description,
+            })
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        videos, frames = self._db.execute("SELECT COUNT(DISTINCT video_id), COUNT(*) FROM frames").fetchone()
+        return {"videos": videos, "frames": frames, "embedder": self._meta("embedder")}
+
+    def close(self):
+        self._matrix = None
+        self._db.close()
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Search indexed keyframes by text or by image.")
+    parser.add_argument("query", help="Text query, or with --image the path of an image to find similar keyframes.")
+    parser.add_argument("--image", action="store_true", help="Treat the query as the path of an image.")
+    parser.add_argument("--k", type=int, default=10, help="Number of keyframes returned.")
+    parser.add_argument("--important_only", action="store_true", help="Only return frames the LLM marked important.")
+    parser.add_argument("--index_dir", default=KEYFRAME_INDEX_DIR, help="Folder of the keyframe index.")
+    args = parser.parse_args()
+
+    query = args.query
+    if args.image:
+        import cv2
+        query = cv2.imread(args.query)
+        if query is None:
+            raise SystemExit(f"Could not read image {args.query}")
+
+    index = KeyframeIndex(args.index_dir)
+    stats = index.stats()
+    print(f"Index: {stats['frames']} keyframes from {stats['videos']} videos")
+
+    index.search(query, k=1)  # loads the model and the embeddings once
+    start = time.perf_counter()
+    results = index.search(query, k=args.k, important_only=args.important_only)
+    print(f"Query took {(time.perf_counter() - start) * 1000:.1f} ms\n")
+
+    for result in results:
+        description = (result["visual_description"] or result["extracted_text"] or "")[:80]
+        print(f"{result['score']:.3f}  {result['video_path']} @ {result['timestamp']:.1f}s ({result['frame']})"
+              f"  {result['importance'] or '-'}  {description}")
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Tests import the packages of the repository root, like main.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# llm.model builds the Gemini client at import time; tests install a fake model instead
+os.environ.setdefault("GOOGLE_API_KEY", "test")
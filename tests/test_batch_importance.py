@@ -0,0 +1,96 @@
+import json
+import numpy as np
+import pytest
+from langchain_core.messages import AIMessage
+
+import llm.model
+from FrameProcessor.graph.steps.evaluate_importance import evaluate_importance_batch
+from FrameProcessor.utils.image_utils import FrameImage
+
+class BatchModel:
+    """Answers batch requests from `labels` (by image name), leaving out the names in `omit`, in reverse order."""
+
+    model = "batch"
+
+    def __init__(self, labels, omit=()):
+        self.labels = labels
+        self.omit = set(omit)
+        self.requests = []
+
+    def invoke(self, messages):
+        parts = messages[-1].content
+        names = [p["text"][len("Image Name: "):] for p in parts if p.get("type") == "text" and p["text"].startswith("Image Name: ")]
+        images = sum(p.get("type") == "image_url" for p in parts)
+        self.requests.append(names or images)
+        if "JSON array" in messages[0].content:
+            return AIMessage(content=json.dumps([
+                {"image_name": name, "importance": self.labels[_frame_name(name)], "reason": f"Batch: {name}"}
+                for name in reversed(names) if _frame_name(name) not in self.omit
+            ]))
+        # Single-frame request: the frame is recognized by its pixels
+        url = next(p["image_url"]["url"] for p in parts if p.get("type") == "image_url")
+        name = next(n for n, u in _URLS.items() if u == url)
+        return AIMessage(content=json.dumps({"importance": self.labels[name], "reason": f"Single: {name}"}))
+
+_URLS = {}
+
+def _frame_name(name):
+    # Duplicate names are prefixed with their position in the batch
+    return name.split("_", 1)[1] if name[0].isdigit() and "_" in name else name
+
+def _states(names):
+    states = []
+    for i, name in enumerate(names):
+        image = FrameImage(pixels=np.full((8, 8, 3), i * 20, dtype=np.uint8), name=name)
+        _URLS[name] = image.data_url()
+        states.append({"frame_path": name, "frame_data": {"image": image, "file_name": name},
+                       "frame_features": {"dark_ratio": 0.0}, "importance": "", "reason": "", "description": {},
+                       "next_step": ""})
+    return states
+
+@pytest.fixture
+def install(monkeypatch):
+    def install(model):
+        monkeypatch.setattr(llm.model, "model", model)
+        return model
+    yield install
+    _URLS.clear()
+
+def test_answers_are_matched_by_image_name(install):
+    labels = {"a.jpg": "important", "b.jpg": "not_important", "c.jpg": "important"}
+    model = install(BatchModel(labels))
+
+    states = evaluate_importance_batch(_states(list(labels)))
+
+    assert len(model.requests) == 1
+    assert [state["importance"] for state in states] == list(labels.values())
+    assert [state["reason"] for state in states] == [f"Batch: {name}" for name in labels]
+    assert [state["next_step"] for state in states] == ["describe_frame", "__end__", "describe_frame"]
+
+def test_frames_missing_from_the_answer_fall_back_to_single_requests(install):
+    labels = {"a.jpg": "not_important", "b.jpg": "important", "c.jpg": "not_important"}
+    model = install(BatchModel(labels, omit=["b.jpg"]))
+
+    states = evaluate_importance_batch(_states(list(labels)))
+
+    assert len(model.requests) == 2 and model.requests[1] == 1
+    assert [state["importance"] for state in states] == list(labels.values())
+    assert [state["reason"] for state in states] == ["Batch: a.jpg", "Single: b.jpg", "Batch: c.jpg"]
+
+def test_duplicate_names_are_made_unique(install):
+    model = install(BatchModel({"frame.jpg": "important"}))
+
+    states = evaluate_importance_batch(_states(["frame.jpg", "frame.jpg"]))
+
+    assert model.requests[0] == ["1_frame.jpg", "2_frame.jpg"]
+    assert [state["reason"] for state in states] == ["Batch: 1_frame.jpg", "Batch: 2_frame.jpg"]
+
+def test_dark_frames_are_not_sent(install):
+    model = install(BatchModel({"a.jpg": "important", "b.jpg": "important"}))
+    states = _states(["a.jpg", "b.jpg"])
+    states[0]["frame_features"]["dark_ratio"] = 0.95
+
+    evaluate_importance_batch(states)
+
+    assert model.requests == [["b.jpg"]]
+    assert states[0]["importance"] == "not_important" and states[1]["importance"] == "important"
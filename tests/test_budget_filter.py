@@ -0,0 +1,48 @@
+import cv2
+import numpy as np
+from KeyFrameSelection.FeatureStore import FeatureStore
+from KeyFrameSelection.Similarties import budget_filter
+
+FPS = 25.0
+STEP = 50  # frames between samples, i.e. a sample every 2 seconds
+
+class _StoredEmbedder:
+    """Embedder whose embeddings are all in the store already."""
+    name = "stored"
+
+    def embed(self, frames):
+        raise AssertionError("embeddings should come from the store")
+
+def _records_and_store(embeddings, seed=0):
+    rng = np.random.default_rng(seed)
+    frames = [cv2.resize(rng.integers(0, 256, size=(6, 8, 3), dtype=np.uint8), (160, 120), interpolation=cv2.INTER_NEAREST)
+              for _ in embeddings]
+    records = [(frame, i * STEP) for i, frame in enumerate(frames)]
+    store = FeatureStore()
+    store.get_many(f"clip:{_StoredEmbedder.name}", records, lambda frames: list(embeddings))
+    return records, store
+
+def _embeddings():
+    """Ten samples showing one scene, except for two neighbouring samples that each show a different one."""
+    rng = np.random.default_rng(1)
+    embeddings = np.tile(np.eye(8)[0], (10, 1)) + rng.normal(scale=0.05, size=(10, 8))
+    embeddings[4], embeddings[5] = np.eye(8)[1], np.eye(8)[2]
+    embeddings[8] += 0.5 * np.eye(8)[3]
+    return embeddings
+
+def test_neighbouring_samples_are_not_both_picked():
+    records, store = _records_and_store(_embeddings())
+    picked = [frame_idx for _, frame_idx in budget_filter(records, 3, FPS, store=store, embedder=_StoredEmbedder())]
+    assert len(picked) == 3
+    assert (4 * STEP in picked) != (5 * STEP in picked)
+    assert min(np.diff(picked)) >= 2 * STEP
+
+    # Without the gap, the two most distinct samples are taken even though they are neighbours
+    picked = [frame_idx for _, frame_idx in budget_filter(records, 3, FPS, min_gap_sec=0, store=store, embedder=_StoredEmbedder())]
+    assert 4 * STEP in picked and 5 * STEP in picked
+
+def test_budget_is_met_when_only_close_frames_are_left():
+    records, store = _records_and_store(_embeddings())
+    picked = budget_filter(records, 9, FPS, store=store, embedder=_StoredEmbedder())
+    assert len(picked) == 9
+    assert [frame_idx for _, frame_idx in picked] == sorted(frame_idx for _, frame_idx in picked)
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+from sklearn.metrics.pairwise import cosine_similarity
+from KeyFrameSelection.Similarties import clip_filter
+
+class _IdentityEmbedder:
+    """Embedder whose "frames" already are their embeddings."""
+    name = "identity"
+
+    def embed(self, frames):
+        return np.stack(frames)
+
+def _pairwise_clip_filter(embeddings, similarity_threshold, compare_window):
+    """The pairwise loop `clip_filter` used before its comparisons were vectorized."""
+    distinct, past_embeddings = [], []
+    for i, emb in enumerate(embeddings):
+        is_distinct = True
+        for prev_emb in past_embeddings[-compare_window:]:
+            if cosine_similarity([emb], [prev_emb])[0][0] > similarity_threshold:
+                is_distinct = False
+                break
+        if is_distinct:
+            distinct.append(i)
+            past_embeddings.append(emb)
+    return distinct
+
+def _embeddings(count, dim=64, seed=0):
+    """Unnormalized float32 embeddings drifting around a few scenes, so similarities straddle the thresholds."""
+    rng = np.random.default_rng(seed)
+    scenes = rng.normal(size=(6, dim))
+    picks = rng.integers(0, len(scenes), size=count)
+    noise = rng.normal(scale=rng.uniform(0.2, 1.0, size=(count, 1)), size=(count, dim))
+    return list(((scenes[picks] + noise) * rng.uniform(0.5, 3.0, size=(count, 1))).astype(np.float32))
+
+@pytest.mark.parametrize("compare_window", [0, 1, 3, 5, 40])
+@pytest.mark.parametrize("similarity_threshold", [0.5, 0.7, 0.85])
+def test_matches_pairwise_cosine_similarity(compare_window, similarity_threshold):
+    embeddings = _embeddings(150, seed=compare_window)
+    records = [(emb, frame_idx) for frame_idx, emb in enumerate(embeddings)]
+    expected = _pairwise_clip_filter(embeddings, similarity_threshold, compare_window)
+    assert 0 < len(expected) < len(embeddings)
+
+    # Batch boundaries must not change decisions, including windows spanning several batches
+    for batch_size in (1, 7, 64):
+        kept = clip_filter(records, similarity_threshold=similarity_threshold, compare_window=compare_window,
+                           batch_size=batch_size, embedder=_IdentityEmbedder())
+        assert [frame_idx for _, frame_idx in kept] == expected
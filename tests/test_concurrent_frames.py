@@ -0,0 +1,48 @@
+import threading
+import numpy as np
+import pytest
+
+import llm.model
+from benchmarks.fake_llm import FakeChatModel
+from FrameProcessor.processor.multi_frame import process_frames
+from FrameProcessor.utils.image_utils import FrameImage
+
+class OverlapCountingModel(FakeChatModel):
+    """Fake model with random latencies, so requests finish out of order, that records how many requests overlap."""
+
+    def __init__(self):
+        super().__init__(latency=0.05, jitter=0.9, important_rate=0.3, seed=1)
+        self.active = 0
+        self.max_active = 0
+        self._count_lock = threading.Lock()
+
+    def invoke(self, messages):
+        with self._count_lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            return super().invoke(messages)
+        finally:
+            with self._count_lock:
+                self.active -= 1
+
+def _frames(count=12):
+    rng = np.random.default_rng(0)
+    return [FrameImage(pixels=rng.integers(0, 256, size=(48, 64, 3), dtype=np.uint8), name=f"frame_{i:02d}.jpg")
+            for i in range(count)]
+
+@pytest.mark.parametrize("importance_batch_size", [1, 3])
+def test_results_keep_the_input_order(monkeypatch, importance_batch_size):
+    sequential_model = FakeChatModel(latency=0, jitter=0, important_rate=0.3)
+    monkeypatch.setattr(llm.model, "model", sequential_model)
+    expected = process_frames(_frames(), importance_batch_size=importance_batch_size)
+
+    model = OverlapCountingModel()
+    monkeypatch.setattr(llm.model, "model", model)
+    seen = []
+    results = process_frames(_frames(), importance_batch_size=importance_batch_size, max_concurrency=4, on_result=seen.append)
+
+    assert model.max_active > 1
+    assert [result["frame"] for result in results] == [f"frame_{i:02d}.jpg" for i in range(12)]
+    assert results == expected
+    assert seen == results
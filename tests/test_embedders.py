@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+import torch
+from transformers import CLIPConfig, CLIPImageProcessor, CLIPModel, CLIPProcessor
+import KeyFrameSelection.Embedders as Embedders
+
+class _ImageProcessor:
+    """CLIPProcessor without a tokenizer, which would have to be downloaded."""
+
+    def __init__(self):
+        self.image_processor = CLIPImageProcessor()
+
+    def __call__(self, images=None, return_tensors="pt", **kwargs):
+        return self.image_processor(images=images, return_tensors=return_tensors)
+
+@pytest.fixture
+def tiny_clip(monkeypatch):
+    """Replace the pretrained CLIP model with a small randomly initialized one."""
+    torch.manual_seed(0)
+    config = CLIPConfig(
+        text_config=dict(hidden_size=32, intermediate_size=64, num_hidden_layers=2, num_attention_heads=2, projection_dim=64),
+        vision_config=dict(hidden_size=64, intermediate_size=128, num_hidden_layers=2, num_attention_heads=2,
+                           image_size=224, patch_size=32, projection_dim=64),
+        projection_dim=64
+    )
+    state = CLIPModel(config).state_dict()
+
+    def from_pretrained(cls, *args, **kwargs):
+        model = CLIPModel(config)
+        model.load_state_dict(state)
+        return model
+
+    monkeypatch.setattr(CLIPModel, "from_pretrained", classmethod(from_pretrained))
+    monkeypatch.setattr(CLIPProcessor, "from_pretrained", classmethod(lambda cls, *args, **kwargs: _ImageProcessor()))
+    monkeypatch.setattr(Embedders, "_loaded", {})
+
+def _frames(count=6, seed=0):
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:120, 0:160]
+    frames = []
+    for _ in range(count):
+        a, b, c = rng.uniform(0.02, 0.2, size=3)
+        frames.append(np.stack([np.sin(a * x) * 127 + 128, np.cos(b * y) * 127 + 128, np.sin(c * (x + y)) * 127 + 128],
+                               axis=-1).astype(np.uint8))
+    return frames
+
+def test_embeddings_are_normalized_and_named_per_backend(tiny_clip):
+    fp32 = Embedders.get_embedder("fp32")
+    int8 = Embedders.get_embedder("int8")
+
+    embeddings = fp32.embed(_frames())
+    assert embeddings.dtype == np.float32 and embeddings.shape == (6, 64)
+    np.testing.assert_allclose(np.linalg.norm(embeddings, axis=1), 1.0, atol=1e-5)
+    # Cached embeddings of different backends are kept apart
+    assert fp32.name == Embedders.CLIP_MODEL_ID and int8.name == f"{Embedders.CLIP_MODEL_ID}@int8"
+
+def test_int8_backend_stays_close_to_fp32(tiny_clip):
+    int8 = Embedders.get_embedder("int8")
+    assert any(isinstance(module, torch.ao.nn.quantized.dynamic.Linear) for module in int8.model.modules())
+
+    drift = Embedders.embedding_drift(_frames(), int8, reference=Embedders.get_embedder("fp32"))
+
+    assert drift["frames"] == 6
+    assert drift["min_cosine"] > 0.98
+
+def test_backend_is_loaded_once_and_chosen_by_environment(tiny_clip, monkeypatch):
+    monkeypatch.setenv("CLIP_BACKEND", "int8")
+    assert Embedders.get_embedder() is Embedders.get_embedder("int8")
+    assert Embedders.get_embedder().backend == "int8"
+
+    with pytest.raises(ValueError):
+        Embedders.get_embedder("fp16")
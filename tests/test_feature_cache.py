@@ -0,0 +1,62 @@
+import os
+import types
+import numpy as np
+import KeyFrameSelection.FeatureCache as feature_cache
+from KeyFrameSelection.FeatureCache import FeatureCache
+
+def _features():
+    return {frame_idx: np.full(1024, frame_idx, dtype=np.uint8) for frame_idx in range(4)}
+
+def _clock(monkeypatch, start=1_000_000.0):
+    clock = types.SimpleNamespace(now=start)
+    monkeypatch.setattr(feature_cache, "time", types.SimpleNamespace(time=lambda: clock.now))
+    return clock
+
+def test_evict_removes_idle_videos_first(tmp_path, monkeypatch):
+    clock = _clock(monkeypatch)
+    cache = FeatureCache(str(tmp_path), max_bytes=9000, min_idle_seconds=60)
+    for video in ("old", "older", "new"):
+        cache.save(video, "hash", _features())
+    # "older" was used last two hours ago, "old" one hour ago and "new" just now
+    clock.now += 3600
+    cache.save("old", "hash", _features())
+    clock.now += 3600
+    cache.save("new", "hash", _features())
+
+    assert cache.evict() == 1
+    assert cache.load("older", "hash") == {}
+    assert not os.path.exists(tmp_path / "older")
+    assert cache.load("old", "hash") != {}
+    cache.close()
+
+def test_evict_skips_videos_another_worker_uses(tmp_path, monkeypatch):
+    clock = _clock(monkeypatch)
+    ours = FeatureCache(str(tmp_path), max_bytes=0, min_idle_seconds=600)
+    theirs = FeatureCache(str(tmp_path), max_bytes=0, min_idle_seconds=600)
+    theirs.save("theirs", "hash", _features())
+    ours.save("ours", "hash", _features())
+
+    # The cache is over its limit, but the other worker's video was used a minute ago
+    clock.now += 60
+    assert ours.evict(keep=("ours",)) == 0
+    assert theirs.load("theirs", "hash") != {}
+
+    # Once both have been idle long enough, only the video in use is kept
+    clock.now += 3600
+    assert ours.evict(keep=("ours",)) == 1
+    assert theirs.load("theirs", "hash") == {}
+    assert ours.load("ours", "hash") != {}
+    ours.close()
+    theirs.close()
+
+def test_evict_leaves_no_open_transaction(tmp_path):
+    cache = FeatureCache(str(tmp_path), max_bytes=0, min_idle_seconds=0)
+    cache.save("video", "hash", _features())
+    other = FeatureCache(str(tmp_path))
+
+    assert cache.evict() == 1
+    # The write lock is released, so another process can write right away
+    other.save("video", "hash", _features())
+    assert cache.load("video", "hash") != {}
+    cache.close()
+    other.close()
@@ -0,0 +1,67 @@
+import collections
+import cv2
+import numpy as np
+import pytest
+import main
+import KeyFrameSelection.Similarties as Similarties
+from benchmarks.synthetic_videos import make_video
+from KeyFrameSelection.FeatureStore import FeatureStore
+
+class CountingEmbedder:
+    """Stand-in for CLIP that embeds a frame as its 8x8 color thumbnail and counts the frames it embeds."""
+    name = "counting"
+
+    def __init__(self):
+        self.embedded = collections.Counter()
+
+    def embed(self, frames):
+        for frame in frames:
+            self.embedded[frame.tobytes()] += 1
+        return np.stack([cv2.resize(frame, (8, 8), interpolation=cv2.INTER_AREA).astype(np.float32).ravel() - 128
+                         for frame in frames])
+
+@pytest.fixture(scope="module")
+def video(tmp_path_factory):
+    return make_video(str(tmp_path_factory.mktemp("video") / "slides.mp4"), "slides", duration_sec=300,
+                      resolution=(160, 90), slide_sec=10)
+
+def test_every_frame_is_hashed_and_embedded_once_per_run(video, monkeypatch):
+    embedder = CountingEmbedder()
+    hashed = collections.Counter()
+    compute_hashes = Similarties._compute_hashes
+
+    def counting_hashes(frames, executor):
+        for frame in frames:
+            hashed[frame.tobytes()] += 1
+        return compute_hashes(frames, executor)
+
+    monkeypatch.setattr(Similarties, "_compute_hashes", counting_hashes)
+    monkeypatch.setattr(main, "get_embedder", lambda backend=None: embedder)
+    iterations = []
+    hash_filter = main.hash_filter
+    monkeypatch.setattr(main, "hash_filter", lambda *args, **kwargs: iterations.append(1) or hash_filter(*args, **kwargs))
+
+    records, _, embeddings = main.select_keyframes(video, decode_mode="decode", use_cache=False)
+
+    # The threshold tuning loop ran over the same frames several times (every 10 s sample shows another slide),
+    # and the keyframes were embedded once more for the index
+    assert len(iterations) > 1
+    assert len(embeddings) == len(records)
+    assert hashed and max(hashed.values()) == 1
+    assert embedder.embedded and max(embedder.embedded.values()) == 1
+
+def test_store_computes_missing_features_only():
+    frames = [np.full((4, 4, 3), i, dtype=np.uint8) for i in range(6)]
+    computed = []
+
+    def compute(batch):
+        computed.extend(int(frame[0, 0, 0]) for frame in batch)
+        return [int(frame.sum()) for frame in batch]
+
+    store = FeatureStore()
+    first = store.get_many("sum", [(frame, i) for i, frame in enumerate(frames[:4])], compute)
+    second = store.get_many("sum", [(None, 1), (frames[4], 4), (None, 3), (frames[5], 5)], compute)
+
+    assert computed == [0, 1, 2, 3, 4, 5]
+    assert second == [first[1], 4 * 48, first[3], 5 * 48]
+    assert (store.hits, store.misses) == (2, 6)
@@ -0,0 +1,61 @@
+import threading
+import cv2
+import numpy as np
+import FrameProcessor.graph.steps.extract_features as extract_features
+from FrameProcessor.graph.steps.extract_features import compute_batch_features, compute_frame_features, extract_batch_features
+from FrameProcessor.processor.single_frame import _initial_state
+from FrameProcessor.utils.image_utils import FrameImage
+
+def _images():
+    rng = np.random.default_rng(0)
+    images = [rng.integers(0, 256, size=(90, 160, 3), dtype=np.uint8) for _ in range(3)]
+    images.append(np.zeros((90, 160, 3), dtype=np.uint8))
+    images.append(rng.integers(0, 60, size=(120, 100, 3), dtype=np.uint8))
+    return images
+
+def _reference(img):
+    """The statistics as the frame processor computed them one frame at a time, in floating point."""
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    return {
+        "contrast": float(np.std(gray)),
+        "brightness": float(np.mean(gray)),
+        "dark_ratio": float(np.sum(gray < 30) / gray.size),
+        "color_variance": float(np.var(img.reshape(-1, 3), axis=0).sum()),
+    }
+
+def test_batch_statistics_match_the_per_frame_formulas():
+    images = _images()
+    features = compute_batch_features(images)
+
+    for img, frame_features in zip(images, features):
+        assert frame_features["dimensions"] == {"height": img.shape[0], "width": img.shape[1]}
+        for name, value in _reference(img).items():
+            assert abs(frame_features[name] - value) <= 1e-9 * max(1.0, abs(value)), name
+        assert frame_features == compute_frame_features(img)
+
+def test_face_cascade_is_loaded_once_per_thread(monkeypatch):
+    loads = []
+    cascade = cv2.CascadeClassifier
+    monkeypatch.setattr(cv2, "CascadeClassifier", lambda path: loads.append(path) or cascade(path))
+    monkeypatch.setattr(extract_features, "_local", threading.local())
+
+    compute_batch_features(_images())
+    compute_batch_features(_images())
+    assert len(loads) == 1
+
+    thread = threading.Thread(target=compute_batch_features, args=(_images(),))
+    thread.start()
+    thread.join()
+    assert len(loads) == 2
+
+def test_unreadable_frames_get_an_error_and_the_others_their_features(tmp_path):
+    images = _images()
+    states = [_initial_state(FrameImage(img, name=f"{i}.jpg")) for i, img in enumerate(images)]
+    states.insert(2, _initial_state(str(tmp_path / "missing.jpg")))
+
+    extract_batch_features(states)
+
+    assert states[2]["frame_features"] == {"error": "Failed to load frame"}
+    others = [state["frame_features"] for i, state in enumerate(states) if i != 2]
+    assert others == compute_batch_features(images)
+    assert all(state["next_step"] == "evaluate_importance" for state in states)
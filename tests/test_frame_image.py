@@ -0,0 +1,57 @@
+import base64
+import cv2
+import numpy as np
+import pytest
+
+import llm.model
+from benchmarks.fake_llm import FakeChatModel
+from FrameProcessor.processor.multi_frame import process_frames
+from FrameProcessor.utils.image_utils import FrameImage, as_frame_image
+
+def _pixels(value=0, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.clip(rng.normal(value, 30, size=(48, 64, 3)), 0, 255).astype(np.uint8)
+
+def test_memory_frames_are_encoded_once_on_first_use(monkeypatch):
+    encodes = []
+    imencode = cv2.imencode
+    monkeypatch.setattr(cv2, "imencode", lambda *args: encodes.append(1) or imencode(*args))
+    frame = FrameImage(_pixels(128), name="frame.jpg", quality=70)
+    assert not encodes
+
+    url = frame.data_url()
+    assert frame.data_url() == url and frame.base64 == url.split(",", 1)[1]
+    assert len(encodes) == 1
+    assert url.startswith("data:image/jpeg;base64,")
+    decoded = cv2.imdecode(np.frombuffer(base64.b64decode(frame.base64), np.uint8), cv2.IMREAD_COLOR)
+    assert decoded.shape == (48, 64, 3)
+
+def test_file_frames_are_sent_as_their_own_bytes(tmp_path):
+    path = str(tmp_path / "frame.png")
+    cv2.imwrite(path, _pixels(128))
+
+    frame = as_frame_image(path)
+
+    assert frame.name == "frame.png" and frame.mime_type == "image/png"
+    with open(path, "rb") as f:
+        assert base64.b64decode(frame.base64) == f.read()
+    np.testing.assert_array_equal(frame.pixels, cv2.imread(path))
+    assert as_frame_image(frame) is frame
+
+    with pytest.raises(ValueError):
+        FrameImage()
+
+def test_frames_decided_without_the_llm_are_never_encoded(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    model = FakeChatModel(latency=0, jitter=0, important_rate=0.0)
+    monkeypatch.setattr(llm.model, "model", model)
+    dark = FrameImage(np.zeros((48, 64, 3), dtype=np.uint8), name="dark.jpg")
+    bright = FrameImage(_pixels(128), name="bright.jpg")
+
+    results = process_frames([dark, bright])
+
+    assert [result["frame"] for result in results] == ["dark.jpg", "bright.jpg"]
+    assert dark._base64 is None and bright._base64 is not None
+    assert model.calls == 1
+    # Frames are handed over in memory: nothing is written to disk
+    assert not list(tmp_path.iterdir())
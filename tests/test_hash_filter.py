@@ -0,0 +1,43 @@
+import cv2
+import numpy as np
+from KeyFrameSelection.FeatureCache import FeatureCache
+from KeyFrameSelection.FeatureStore import FeatureStore
+from KeyFrameSelection.Similarties import hash_filter, hash_filter_stream
+
+def _frames(count, seed=0):
+    """Blocky random frames, each shown twice in a row so the filters have duplicates to drop."""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for _ in range(count):
+        blocks = rng.integers(0, 256, size=(6, 8, 3), dtype=np.uint8)
+        frame = cv2.resize(blocks, (160, 120), interpolation=cv2.INTER_NEAREST)
+        frames += [frame, frame.copy()]
+    return frames
+
+def test_cached_rerun_loads_frames_once_per_chunk(tmp_path):
+    frames = _frames(20)
+    records = list(zip(frames, range(len(frames))))
+
+    cache = FeatureCache(str(tmp_path))
+    first = FeatureStore(cache=cache, video_key="video")
+    # Every frame is within 64 bits of the first one, so only the first thumbnail is computed
+    hash_filter(records, hash_threshold=64, store=first)
+    first.flush()
+
+    calls = []
+    def frame_loader(frame_idxs):
+        calls.append(list(frame_idxs))
+        return [frames[frame_idx] for frame_idx in frame_idxs]
+
+    # Only the thresholds change, so hashes come from the cache and the missing thumbnails are
+    # decoded through the loader; records carry no pixels, as on a cached rerun
+    rerun = FeatureStore(cache=cache, video_key="video", frame_loader=frame_loader)
+    kept = list(hash_filter_stream([(None, frame_idx) for frame_idx in range(len(frames))],
+                                   hash_threshold=0, ssim_threshold=0.99, max_in_flight=8, store=rerun))
+
+    expected = hash_filter(records, hash_threshold=0, ssim_threshold=0.99)
+    assert [frame_idx for _, frame_idx in kept] == [frame_idx for _, frame_idx in expected]
+    assert len(kept) > 1
+    # One loader call per chunk of 8 records at most, never one per frame
+    assert 0 < len(calls) <= -(-len(frames) // 8)
+    cache.close()
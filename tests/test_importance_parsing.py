@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+from langchain_core.messages import AIMessage
+
+import llm.client
+import llm.model
+from llm.cache import ResponseCache
+from FrameProcessor.graph.steps.evaluate_importance import _evaluate_with_llm, is_labelled_json, parse_json_answer
+from FrameProcessor.utils.image_utils import FrameImage
+
+
+class CannedModel:
+    """Chat model returning the same answer to every request."""
+
+    model = "canned"
+
+    def __init__(self, content):
+        self.content = content
+
+    def invoke(self, messages):
+        return AIMessage(content=self.content)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ResponseCache(str(tmp_path / "responses.sqlite"))
+    llm.client.configure(cache=cache)
+    yield cache
+    llm.client.configure()
+
+
+def _state():
+    image = FrameImage(pixels=np.full((16, 16, 3), 128, dtype=np.uint8), name="frame_0001.jpg")
+    return {"frame_path": image.name, "frame_data": {"image": image, "file_name": image.name},
+            "frame_features": {}, "importance": "not_important", "reason": "", "description": {}, "next_step": ""}
+
+
+def test_unparseable_answer_is_never_cached(cache, monkeypatch):
+    monkeypatch.setattr(llm.model, "model", CannedModel('{"importance": "important", "reason": broken}'))
+
+    state = _evaluate_with_llm(_state())
+
+    assert state["reason"].startswith("Error processing response")
+    assert cache.stats()["entries"] == 0
+
+
+def test_answer_with_raw_control_characters_is_read_and_cached(cache, monkeypatch):
+    answer = '{\n  "importance": "important",\n  "reason": "Title\tslide"\n}'
+    monkeypatch.setattr(llm.model, "model", CannedModel(answer))
+
+    state = _evaluate_with_llm(_state())
+
+    assert state["importance"] == "important"
+    assert state["reason"] == "Title\tslide"
+    assert cache.stats()["entries"] == 1
+
+
+def test_validator_accepts_exactly_what_the_parser_reads():
+    for text in ['{"importance": "important", "reason": "a\tb"}', '{"importance": "maybe"}',
+                 '{"importance": "important", "reason": broken}', "important"]:
+        try:
+            readable = (parse_json_answer(text) or {}).get("importance") in ("important", "not_important")
+        except ValueError:
+            readable = False
+        assert is_labelled_json(text) == readable
@@ -0,0 +1,161 @@
+import base64
+import time
+import pytest
+from google.genai.errors import ClientError
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langchain_google_genai.chat_models import GoogleRateLimitError
+
+import llm.cache
+import llm.client
+import llm.model
+from benchmarks.fake_llm import ResourceExhausted
+from llm.cache import ResponseCache
+from llm.client import TokenBucket, _is_quota_error, configure, invoke_model
+
+class FlakyModel:
+    """Raises `errors` one after the other, then answers."""
+
+    model = "flaky"
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def invoke(self, messages):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return AIMessage(content="answer")
+
+class EchoModel:
+    """Answers with the text of the request's first part."""
+
+    model = "echo"
+
+    def __init__(self):
+        self.calls = 0
+
+    def invoke(self, messages):
+        self.calls += 1
+        return AIMessage(content=messages[-1].content[0]["text"])
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+    monkeypatch.setattr(llm.client.time, "sleep", delays.append)
+    yield delays
+    configure()
+
+def _messages(image=b"\x89PNG pixels", name="frame_0001.jpg"):
+    url = "data:image/png;base64," + base64.b64encode(image).decode()
+    return [SystemMessage(content="Classify the frame."),
+            HumanMessage(content=[{"type": "text", "text": f"Image Name: {name}"},
+                                  {"type": "image_url", "image_url": {"url": url}}])]
+
+def test_token_bucket_limits_the_rate():
+    bucket = TokenBucket(rate_per_minute=1200, capacity=2)  # 20 per second
+    start = time.monotonic()
+    for _ in range(6):
+        bucket.acquire()
+    elapsed = time.monotonic() - start
+    # Two tokens are available at once, the other four come in at 50 ms each
+    assert 0.18 <= elapsed < 1.0
+
+def test_quota_errors_are_retried_with_exponential_backoff(monkeypatch, sleeps):
+    model = FlakyModel(ResourceExhausted("quota"), ResourceExhausted("quota"), ResourceExhausted("quota"))
+    monkeypatch.setattr(llm.model, "model", model)
+    configure(max_retries=3, base_delay=2.0, max_delay=5.0)
+
+    assert invoke_model(_messages()).content == "answer"
+
+    assert model.calls == 4
+    for delay, full in zip(sleeps, [2.0, 4.0, 5.0]):
+        assert full / 2 <= delay <= full
+
+def test_retries_are_limited(monkeypatch, sleeps):
+    model = FlakyModel(*(ResourceExhausted("quota") for _ in range(3)))
+    monkeypatch.setattr(llm.model, "model", model)
+    configure(max_retries=2)
+
+    with pytest.raises(ResourceExhausted):
+        invoke_model(_messages())
+    assert model.calls == 3 and len(sleeps) == 2
+
+def test_other_errors_are_raised_at_once(monkeypatch, sleeps):
+    # Mentioning a quota or 429 does not make an error a quota error
+    model = FlakyModel(ValueError("Invalid image: quota.png is 429 bytes"))
+    monkeypatch.setattr(llm.model, "model", model)
+    configure(max_retries=3)
+
+    with pytest.raises(ValueError):
+        invoke_model(_messages())
+    assert model.calls == 1 and not sleeps
+
+def test_quota_errors_are_recognized_by_type_and_status():
+    client_error = ClientError(429, {"error": {"code": 429, "message": "Quota exceeded", "status": "RESOURCE_EXHAUSTED"}})
+    try:
+        raise GoogleRateLimitError("Error calling model") from client_error
+    except GoogleRateLimitError as e:
+        wrapped = e
+
+    assert _is_quota_error(client_error)
+    assert _is_quota_error(wrapped)
+    assert _is_quota_error(ResourceExhausted("quota"))
+    assert not _is_quota_error(ClientError(400, {"error": {"code": 400, "message": "429 quota", "status": "INVALID_ARGUMENT"}}))
+    assert not _is_quota_error(RuntimeError("429 RESOURCE_EXHAUSTED"))
+
+def test_cache_key_ignores_the_image_name_but_not_the_image():
+    key = ResponseCache.make_key("model", _messages(name="a.jpg"), {"image_name": "a.jpg"})
+
+    assert ResponseCache.make_key("model", _messages(name="b.jpg"), {"image_name": "b.jpg"}) == key
+    assert ResponseCache.make_key("model", _messages(image=b"other", name="a.jpg"), {"image_name": "a.jpg"}) != key
+    assert ResponseCache.make_key("other model", _messages(name="a.jpg"), {"image_name": "a.jpg"}) != key
+    assert ResponseCache.make_key("model", _messages(name="b.jpg")) != ResponseCache.make_key("model", _messages(name="a.jpg"))
+
+def test_cached_answers_get_the_requesting_frame_name(tmp_path, monkeypatch):
+    cache = ResponseCache(str(tmp_path / "responses.sqlite"))
+    model = EchoModel()
+    monkeypatch.setattr(llm.model, "model", model)
+    configure(cache=cache)
+    try:
+        first = invoke_model(_messages(name="a.jpg"), cache_vars={"image_name": "a.jpg"})
+        second = invoke_model(_messages(name="b.jpg"), cache_vars={"image_name": "b.jpg"})
+    finally:
+        configure()
+
+    assert model.calls == 1
+    assert (first.content, second.content) == ("Image Name: a.jpg", "Image Name: b.jpg")
+    assert cache.stats()["hits"] == 1
+
+def test_entries_expire_after_the_ttl(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(llm.cache.time, "time", lambda: now[0])
+    cache = ResponseCache(str(tmp_path / "responses.sqlite"), ttl_seconds=60)
+
+    cache.put("old", "model", "old answer")
+    now[0] += 30
+    cache.put("new", "model", "new answer")
+    assert cache.get("old") == "old answer"
+
+    now[0] += 45
+    assert cache.get("old") is None
+    assert cache.get("new") == "new answer"
+    # Expired entries are purged on the next write
+    cache.put("newest", "model", "newest answer")
+    assert cache.stats()["entries"] == 2
+
+def test_least_recently_used_entries_are_evicted(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(llm.cache.time, "time", lambda: now[0])
+    cache = ResponseCache(str(tmp_path / "responses.sqlite"), max_entries=2)
+
+    for key in ("a", "b"):
+        now[0] += 1
+        cache.put(key, "model", key)
+    now[0] += 1
+    cache.get("a")
+    now[0] += 1
+    cache.put("c", "model", "c")
+
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == ("a", None, "c")
+    assert cache.stats()["entries"] == 2
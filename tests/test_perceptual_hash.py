@@ -0,0 +1,51 @@
+import cv2
+import numpy as np
+import pytest
+from PIL import Image
+from KeyFrameSelection.PerceptualHash import hash_thumbnail, phash64, hamming_distance, HammingIndex
+
+imagehash = pytest.importorskip("imagehash")
+
+def _frames(count, seed=0):
+    """BGR frames of assorted sizes: noise, smooth gradients and blocky slides."""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for i in range(count):
+        h, w = [(120, 160), (224, 398), (360, 640), (101, 77)][i % 4]
+        kind = i % 3
+        if kind == 0:
+            frame = rng.integers(0, 256, size=(h, w, 3), dtype=np.uint8)
+        elif kind == 1:
+            y, x = np.mgrid[0:h, 0:w]
+            a, b = rng.uniform(0.01, 0.2, size=2)
+            channels = [128 + 100 * np.sin(a * x + b * y + phase) for phase in rng.uniform(0, 6, size=3)]
+            frame = np.stack(channels, axis=-1).astype(np.uint8)
+        else:
+            blocks = rng.integers(0, 256, size=(4, 6, 3), dtype=np.uint8)
+            frame = cv2.resize(blocks, (w, h), interpolation=cv2.INTER_NEAREST)
+        frames.append(frame)
+    return frames
+
+def test_phash64_matches_imagehash():
+    frames = _frames(48)
+    hashes = phash64([hash_thumbnail(frame) for frame in frames])
+    for frame, h in zip(frames, hashes):
+        expected = imagehash.phash(Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)))
+        assert f"{int(h):016x}" == str(expected)
+
+def test_hamming_index_matches_brute_force():
+    rng = np.random.default_rng(1)
+    stored = rng.integers(0, 2 ** 63, size=200, dtype=np.uint64)
+    index = HammingIndex(5)
+    for h in stored:
+        index.add(h)
+
+    # Queries at 0..8 bits from stored hashes, plus unrelated ones
+    queries = list(rng.integers(0, 2 ** 63, size=50, dtype=np.uint64))
+    for distance in range(9):
+        for h in stored[:10]:
+            flips = rng.choice(64, size=distance, replace=False)
+            queries.append(np.uint64(int(h) ^ sum(1 << int(bit) for bit in flips)))
+
+    for h in queries:
+        assert index.contains_near(h) == bool((hamming_distance(stored, h) <= 5).any())
@@ -0,0 +1,124 @@
+import json
+import cv2
+import numpy as np
+import pytest
+from langchain_core.messages import AIMessage
+
+import llm.model
+from FrameProcessor.gating import pre_classifier
+from FrameProcessor.gating.pre_classifier import FEATURE_NAMES, PreClassifier, load_labelled_frames
+from FrameProcessor.graph.steps.evaluate_importance import evaluate_importance
+from FrameProcessor.utils.image_utils import FrameImage
+
+def _features(text_density, **extra):
+    return {"contrast": 40.0, "brightness": 120.0, "dark_ratio": 0.1, "color_variance": 500.0, "blur": 200.0,
+            "text_density": text_density, "face_count": 0, **extra}
+
+def _classifier(confidence=0.95, audit_rate=0.0):
+    """Classifier whose probability is sigmoid(10 * text_density - 5)."""
+    coef = [10.0 if name == "text_density" else 0.0 for name in FEATURE_NAMES]
+    return PreClassifier([0.0] * len(FEATURE_NAMES), [1.0] * len(FEATURE_NAMES), coef, -5.0,
+                         confidence=confidence, audit_rate=audit_rate)
+
+class CountingModel:
+    model = "counting"
+
+    def __init__(self, importance):
+        self.importance = importance
+        self.calls = 0
+
+    def invoke(self, messages):
+        self.calls += 1
+        return AIMessage(content=json.dumps({"importance": self.importance, "reason": "LLM answer"}))
+
+@pytest.fixture
+def gate(monkeypatch):
+    def install(classifier, importance="important"):
+        model = CountingModel(importance)
+        monkeypatch.setattr(llm.model, "model", model)
+        pre_classifier.configure(classifier)
+        return model
+    yield install
+    pre_classifier.configure(None)
+
+def _state(frame_features):
+    image = FrameImage(pixels=np.zeros((8, 8, 3), dtype=np.uint8), name="frame.jpg")
+    return {"frame_path": image.name, "frame_data": {"image": image, "file_name": image.name},
+            "frame_features": frame_features, "importance": "not_important", "reason": "", "description": {}, "next_step": ""}
+
+def test_decide_only_clear_cut_frames():
+    classifier = _classifier(confidence=0.95)
+    assert classifier.decide(_features(1.0))[0] == "important"
+    assert classifier.decide(_features(0.0))[0] == "not_important"
+    assert classifier.decide(_features(0.5)) is None
+    # p(0.8) is about 0.95: decided at a lower confidence only
+    assert _classifier(confidence=0.99).decide(_features(0.8)) is None
+    assert _classifier(confidence=0.9).decide(_features(0.8))[0] == "important"
+    assert classifier.stats()["evaluated"] == 3 and classifier.stats()["calls_saved"] == 2
+
+def test_fit_separates_labelled_frames():
+    rng = np.random.default_rng(0)
+    densities = rng.uniform(0, 1, size=60)
+    features = [_features(d) for d in densities]
+    labels = ["important" if d > 0.5 else "not_important" for d in densities]
+
+    classifier = PreClassifier.fit(features, labels, confidence=0.9)
+
+    assert classifier.decide(_features(0.99))[0] == "important"
+    assert classifier.decide(_features(0.01))[0] == "not_important"
+    assert classifier.calibration["frames"] == 60
+    assert classifier.calibration["disagreement_rate"] < 0.1
+
+    with pytest.raises(ValueError):
+        PreClassifier.fit(features[:5], ["important"] * 4 + ["not_important"])
+
+def test_confident_gate_makes_no_call(gate):
+    model = gate(_classifier())
+    state = evaluate_importance(_state(_features(1.0)))
+    assert model.calls == 0
+    assert state["importance"] == "important"
+    assert state["reason"].startswith("Pre-classifier")
+
+    state = evaluate_importance(_state(_features(0.5)))
+    assert model.calls == 1
+    assert state["reason"] == "LLM answer"
+
+def test_audited_frames_are_sent_and_compared(gate):
+    classifier = _classifier(audit_rate=1.0)
+    model = gate(classifier, importance="not_important")
+
+    state = evaluate_importance(_state(_features(1.0)))
+
+    assert model.calls == 1
+    assert state["importance"] == "not_important"
+    stats = classifier.stats()
+    assert (stats["audited"], stats["disagreements"], stats["calls_saved"]) == (1, 1, 0)
+
+def test_audit_rate_is_the_share_of_audited_frames():
+    assert not any(_classifier(audit_rate=0.0).should_audit() for _ in range(1000))
+    rate = np.mean([_classifier(audit_rate=0.2).should_audit() for _ in range(5000)])
+    assert 0.17 < rate < 0.23
+
+def test_failed_and_local_answers_are_not_training_labels(tmp_path):
+    image = np.zeros((90, 160, 3), dtype=np.uint8)
+    image[30:60, 40:120] = 255
+    cv2.imwrite(str(tmp_path / "g.jpg"), image)
+    results = [
+        {"frame": "a.jpg", "importance": "important", "reason": "Chart", "frame_features": _features(0.9)},
+        {"frame": "b.jpg", "importance": "not_important", "reason": "Blurry", "frame_features": _features(0.1)},
+        {"frame": "c.jpg", "importance": "not_important", "reason": "Failed to evaluate: 429", "frame_features": _features(0.8)},
+        {"frame": "d.jpg", "importance": "not_important", "reason": "Error processing response: bad JSON", "frame_features": _features(0.8)},
+        {"frame": "e.jpg", "importance": "error", "reason": "Processing error: boom"},
+        {"frame": "f.jpg", "importance": "important", "reason": "Pre-classifier: important with probability 0.99", "frame_features": _features(0.9)},
+        # Results do not record features; they are measured from the saved keyframe
+        {"frame": "g.jpg", "path": str(tmp_path / "g.jpg"), "importance": "important", "reason": "Slide"},
+        {"frame": "h.jpg", "path": str(tmp_path / "missing.jpg"), "importance": "important", "reason": "Slide"},
+    ]
+    path = tmp_path / "results.jsonl"
+    path.write_text("".join(json.dumps(result) + "\n" for result in results), encoding="utf-8")
+
+    features, labels = load_labelled_frames([str(path)])
+
+    assert labels == ["important", "not_important", "important"]
+    assert [f["text_density"] for f in features[:2]] == [0.9, 0.1]
+    assert features[2]["dimensions"] == {"height": 90, "width": 160}
@@ -0,0 +1,55 @@
+import csv
+import pytest
+from FrameProcessor.utils.result_sinks import CSV_FIELDS, CsvSink, open_results_sink, read_results
+
+def _results(count=5):
+    results = []
+    for i in range(count):
+        name = f"00-00-{i:02d}-000.jpg"
+        result = {"frame": name, "path": f"outputs/keyframes/{name}", "importance": "not_important", "reason": f"Reason {i}"}
+        if i % 2 == 0:
+            result.update(importance="important", description={
+                "image_name": name, "extracted_text": "نص \"text\"", "visual_description": "مخطط\nbar chart"})
+        results.append(result)
+    results.append({"frame": "bad.jpg", "path": "bad.jpg", "importance": "error", "reason": "Processing error: boom",
+                    "error": "boom"})
+    return results
+
+@pytest.mark.parametrize("fmt", ["jsonl", "parquet", "arrow"])
+def test_results_round_trip(tmp_path, fmt):
+    if fmt != "jsonl":
+        pytest.importorskip("pyarrow")
+    results = _results()
+
+    with open_results_sink(str(tmp_path / "results.jsonl"), fmt, max_buffered=2) as sink:
+        for result in results:
+            sink.write(result)
+
+    assert sink.written == len(results)
+    assert read_results(sink.path) == results
+
+@pytest.mark.parametrize("fmt", ["jsonl", "arrow"])
+def test_flushed_results_are_readable_during_the_run(tmp_path, fmt):
+    if fmt != "jsonl":
+        pytest.importorskip("pyarrow")
+    results = _results()
+    sink = open_results_sink(str(tmp_path / "results.jsonl"), fmt, max_buffered=2, max_seconds=3600)
+
+    for result in results[:3]:
+        sink.write(result)
+    assert read_results(sink.path) == results[:2]
+
+    sink.close()
+    assert read_results(sink.path) == results[:3]
+
+def test_csv_lists_the_important_frames(tmp_path):
+    results = _results()
+    with CsvSink(str(tmp_path / "important_frames.csv"), max_buffered=2) as sink:
+        for result in results:
+            sink.write(result)
+
+    with open(sink.path, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    important = [result for result in results if result["importance"] == "important"]
+    assert rows == [dict(zip(CSV_FIELDS, (r["frame"], r["description"]["extracted_text"], r["description"]["visual_description"])))
+                    for r in important]
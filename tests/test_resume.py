@@ -0,0 +1,70 @@
+import json
+import os
+import pytest
+import llm.model
+import main
+from benchmarks.fake_llm import FakeChatModel
+from benchmarks.synthetic_videos import make_video
+from checkpoint.manifest import is_complete
+from config.paths import run_paths
+
+class InterruptingModel(FakeChatModel):
+    """Fake model whose process is interrupted once it has answered `limit` requests."""
+
+    def __init__(self, limit):
+        super().__init__(latency=0, jitter=0, important_rate=0.5)
+        self.limit = limit
+
+    def invoke(self, messages):
+        if self.calls >= self.limit:
+            raise KeyboardInterrupt
+        return super().invoke(messages)
+
+FPS = 25
+
+@pytest.fixture(scope="module")
+def video(tmp_path_factory):
+    return make_video(str(tmp_path_factory.mktemp("video") / "slides.mp4"), "slides", duration_sec=30,
+                      resolution=(160, 90), fps=FPS, slide_sec=2)
+
+@pytest.fixture
+def run(video, monkeypatch):
+    # Every second of video is a keyframe; the selection itself is not what is resumed here
+    monkeypatch.setattr(main, "select_keyframes",
+                        lambda *args, **kwargs: ([(None, i * FPS) for i in range(30)], float(FPS), None))
+
+    def run(output_dir, model, resume=False):
+        monkeypatch.setattr(llm.model, "model", model)
+        main.prepare_outputs(str(output_dir), resume=resume)
+        main.main(video, use_cache=False, index_dir=None, output_dir=str(output_dir), resume=resume)
+        with open(run_paths(str(output_dir))["results"], encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+    return run
+
+def _comparable(results):
+    return [{**result, "path": os.path.basename(result["path"])} for result in results]
+
+def test_resumed_run_writes_the_same_results_as_an_uninterrupted_one(tmp_path, run):
+    uninterrupted = FakeChatModel(latency=0, jitter=0, important_rate=0.5)
+    expected = run(tmp_path / "uninterrupted", uninterrupted)
+    assert len(expected) == 30
+    assert all(set(result) <= {"frame", "path", "importance", "reason", "description"} for result in expected)
+
+    with pytest.raises(KeyboardInterrupt):
+        run(tmp_path / "resumed", InterruptingModel(limit=12))
+    interrupted = run_paths(str(tmp_path / "resumed"))["results"]
+    with open(interrupted, encoding="utf-8") as f:
+        assert 0 < sum(1 for _ in f) < 30
+
+    model = FakeChatModel(latency=0, jitter=0, important_rate=0.5)
+    resumed = run(tmp_path / "resumed", model, resume=True)
+
+    assert _comparable(resumed) == _comparable(expected)
+    # Frames committed before the interruption are not sent again
+    assert 0 < model.calls < uninterrupted.calls
+
+@pytest.mark.parametrize("reason", ["Failed to evaluate: timeout", "Error processing response: bad JSON",
+                                    "Processing error: boom"])
+def test_failed_frames_are_not_complete(reason):
+    assert not is_complete({"importance": "not_important", "reason": reason})
+    assert is_complete({"importance": "not_important", "reason": "Blurry transition"})
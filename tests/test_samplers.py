@@ -0,0 +1,94 @@
+import av
+import numpy as np
+import pytest
+from KeyFrameSelection.FeatureExtraction import iter_video
+
+FPS = 25
+
+@pytest.fixture(scope="module")
+def bframe_clip(tmp_path_factory):
+    """An 8 second H.264 clip with B-frames and a keyframe every 30 frames, whose frames all differ."""
+    path = str(tmp_path_factory.mktemp("samplers") / "bframes.mp4")
+    y, x = np.mgrid[0:96, 0:128]
+    with av.open(path, "w") as container:
+        stream = container.add_stream("libx264", rate=FPS, options={"g": "30", "keyint_min": "30", "bf": "3", "sc_threshold": "0"})
+        stream.width, stream.height, stream.pix_fmt = 128, 96, "yuv420p"
+        for i in range(8 * FPS):
+            image = np.stack([(x * 2 + i * 3) % 256, (y * 2 + i * 5) % 256, np.full_like(x, (i * 11) % 256)], axis=-1)
+            for packet in stream.encode(av.VideoFrame.from_ndarray(image.astype(np.uint8), format="rgb24")):
+                container.mux(packet)
+        for packet in stream.encode():
+            container.mux(packet)
+    return path
+
+def test_clip_has_b_frames(bframe_clip):
+    # B-frames are stored after the frames they refer to, so packets are not in presentation order
+    with av.open(bframe_clip) as container:
+        pts = [packet.pts for packet in container.demux(video=0) if packet.pts is not None]
+    assert pts != sorted(pts)
+
+@pytest.mark.parametrize("seek_min_gap", [0, None])
+@pytest.mark.parametrize("interval_sec", [0.36, 1.0, 2.6])
+def test_seek_lands_on_the_frames_decode_samples(bframe_clip, interval_sec, seek_min_gap):
+    decoded, fps = iter_video(bframe_clip, interval_sec, mode="decode")
+    decoded = list(decoded)
+    sought, seek_fps = iter_video(bframe_clip, interval_sec, mode="seek", seek_min_gap=seek_min_gap)
+    sought = list(sought)
+
+    assert seek_fps == fps
+    interval = int(fps * interval_sec)
+    assert [frame_idx for _, frame_idx in sought] == list(range(0, 8 * FPS, interval))
+    assert [frame_idx for _, frame_idx in sought] == [frame_idx for _, frame_idx in decoded]
+    for (frame, _), (expected, _) in zip(sought, decoded):
+        np.testing.assert_array_equal(frame, expected)
+
+def test_keyframes_mode_takes_the_first_keyframe_at_or_after_each_target(bframe_clip):
+    with av.open(bframe_clip) as container:
+        stream = container.streams.video[0]
+        keyframes = sorted(int(round(float(packet.pts * stream.time_base) * FPS))
+                           for packet in container.demux(stream) if packet.is_keyframe and packet.pts is not None)
+    assert keyframes == list(range(0, 8 * FPS, 30))
+
+    sampled, fps = iter_video(bframe_clip, interval_sec=1, mode="keyframes")
+    sampled = list(sampled)
+    decoded = {frame_idx: frame for frame, frame_idx in iter_video(bframe_clip, 1 / FPS, mode="decode")[0]}
+
+    target, expected = 0, []
+    for keyframe in keyframes:
+        if keyframe >= target:
+            expected.append(keyframe)
+            target = (keyframe // FPS + 1) * FPS
+    assert [frame_idx for _, frame_idx in sampled] == expected
+    for frame, frame_idx in sampled:
+        np.testing.assert_array_equal(frame, decoded[frame_idx])
+
+@pytest.fixture(scope="module")
+def slides_clip(tmp_path_factory):
+    """35 seconds of slides, cutting to the next slide every 5 seconds (125 frames)."""
+    from benchmarks.synthetic_videos import make_video
+    return make_video(str(tmp_path_factory.mktemp("samplers") / "slides.mp4"), "slides", duration_sec=35,
+                      resolution=(320, 180), fps=FPS, slide_sec=5)
+
+def _adaptive(path, max_gap_sec=60, min_gap_sec=1.0):
+    frames, _ = iter_video(path, interval_sec=max_gap_sec, mode="adaptive", min_gap_sec=min_gap_sec)
+    return [frame_idx for _, frame_idx in frames]
+
+def test_adaptive_sampler_takes_each_slide_once_shortly_after_the_cut(slides_clip):
+    cut = 5 * FPS
+    samples = _adaptive(slides_clip)
+
+    assert samples[0] == 0
+    assert [frame_idx // cut for frame_idx in samples] == list(range(7))
+    # Sampled once the picture has settled, within a second of the cut
+    assert all(0 < frame_idx % cut <= FPS for frame_idx in samples[1:])
+
+def test_adaptive_sampler_respects_the_gaps(slides_clip):
+    # Static stretches are sampled at least every max_gap_sec
+    samples = _adaptive(slides_clip, max_gap_sec=2)
+    assert max(np.diff(samples)) <= 2 * FPS
+    assert len(samples) > 14
+
+    # Cuts closer than min_gap_sec to the last sample are skipped
+    samples = _adaptive(slides_clip, min_gap_sec=8)
+    assert min(np.diff(samples)) >= 8 * FPS
+    assert 1 < len(samples) < 7
@@ -0,0 +1,62 @@
+import os
+import numpy as np
+import pytest
+from search.index import KeyframeIndex
+
+DIM = 16
+
+class _FakeEmbedder:
+    """Embeds a "frame" that already is a vector, and text through a fixed lookup."""
+
+    def __init__(self, name="fake", texts=None):
+        self.name = name
+        self.texts = texts or {}
+
+    def embed(self, frames):
+        return np.stack(frames)
+
+    def embed_text(self, texts):
+        return np.stack([self.texts[text] for text in texts])
+
+def _vectors(count, seed):
+    vectors = np.random.default_rng(seed).normal(size=(count, DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def _vector_files(path):
+    return [name for name in os.listdir(path) if name.endswith(".f32")]
+
+def test_readding_a_video_compacts_the_vectors(tmp_path):
+    index = KeyframeIndex(str(tmp_path), embedder=_FakeEmbedder())
+    first, second, replacement = _vectors(5, 0), _vectors(3, 1), _vectors(2, 2)
+    index.add_video("a", "a.mp4", 25.0, [0, 250, 500, 750, 1000], first, "fake")
+    index.add_video("b", "b.mp4", 25.0, [0, 250, 500], second, "fake")
+    index.add_video("a", "a.mp4", 25.0, [100, 200], replacement, "fake")
+
+    files = _vector_files(str(tmp_path))
+    assert len(files) == 1
+    assert os.path.getsize(os.path.join(str(tmp_path), files[0])) == 5 * DIM * 4
+    assert index.stats()["frames"] == 5
+
+    # Every remaining vector still finds its own frame
+    for video_id, frame_idxs, vectors in (("b", [0, 250, 500], second), ("a", [100, 200], replacement)):
+        for frame_idx, vector in zip(frame_idxs, vectors):
+            best = index.search(vector, k=1)[0]
+            assert (best["video_id"], best["frame_idx"]) == (video_id, frame_idx)
+            assert best["score"] == pytest.approx(1.0, abs=1e-5)
+    index.close()
+
+def test_empty_video_is_not_added(tmp_path):
+    index = KeyframeIndex(str(tmp_path), embedder=_FakeEmbedder())
+    assert index.add_video("a", "a.mp4", 25.0, [], np.empty((0,)), "fake") == 0
+    assert index.stats() == {"videos": 0, "frames": 0, "embedder": None}
+    assert index.search(_vectors(1, 0)[0]) == []
+    index.close()
+
+def test_embedders_are_not_mixed(tmp_path):
+    index = KeyframeIndex(str(tmp_path), embedder=_FakeEmbedder(name="clip@int8"))
+    index.add_video("a", "a.mp4", 25.0, [0], _vectors(1, 0), "clip")
+    with pytest.raises(ValueError):
+        index.add_video("b", "b.mp4", 25.0, [0], _vectors(1, 1), "clip@int8")
+    with pytest.raises(ValueError):
+        index.search(_vectors(1, 2)[0])
+    index.close()
@@ -0,0 +1,67 @@
+import itertools
+import av
+import numpy as np
+import pytest
+import KeyFrameSelection.SegmentDecoding as SegmentDecoding
+from KeyFrameSelection.FeatureExtraction import iter_video, process_video
+from KeyFrameSelection.FrameSpill import FrameSpill
+
+FPS = 25
+
+@pytest.fixture(scope="module")
+def clip(tmp_path_factory):
+    """A 6 second H.264 clip with a keyframe every 15 frames, whose frames all differ."""
+    path = str(tmp_path_factory.mktemp("clip") / "clip.mp4")
+    y, x = np.mgrid[0:96, 0:128]
+    with av.open(path, "w") as container:
+        stream = container.add_stream("libx264", rate=FPS, options={"g": "15", "keyint_min": "15", "sc_threshold": "0"})
+        stream.width, stream.height, stream.pix_fmt = 128, 96, "yuv420p"
+        for i in range(6 * FPS):
+            image = np.stack([(x * 2 + i * 3) % 256, (y * 2 + i * 5) % 256, np.full_like(x, (i * 11) % 256)], axis=-1)
+            frame = av.VideoFrame.from_ndarray(image.astype(np.uint8), format="rgb24")
+            for packet in stream.encode(frame):
+                container.mux(packet)
+        for packet in stream.encode():
+            container.mux(packet)
+    return path
+
+@pytest.mark.parametrize("mode", SegmentDecoding.PARALLEL_MODES)
+def test_parallel_samples_match_sequential(clip, mode):
+    assert SegmentDecoding.plan_segments(clip, 4) is not None
+
+    sequential, fps = process_video(clip, interval_sec=0.4, mode=mode)
+    parallel, parallel_fps = process_video(clip, interval_sec=0.4, mode=mode, workers=2)
+
+    assert parallel_fps == fps
+    assert [frame_idx for _, frame_idx in parallel] == [frame_idx for _, frame_idx in sequential]
+    for (frame, _), (expected, _) in zip(parallel, sequential):
+        np.testing.assert_array_equal(frame, expected)
+
+def test_fallback_does_not_spill_frames_twice(clip, monkeypatch):
+    interval_sec = 0.4
+    expected, _ = iter_video(clip, interval_sec, mode="seek")
+    expected = list(expected)
+
+    def mismatching_segments(video_path, mode, interval, workers, plan, proxies=False, full_frames=True):
+        # The first samples come through, then a segment does not match its plan
+        with FrameSpill() as spill:
+            frames, _ = iter_video(video_path, interval_sec, mode=mode, spill=spill)
+            first = list(itertools.islice(frames, 4))
+            full = spill.load([frame_idx for _, frame_idx in first])
+        for (small, frame_idx), frame in zip(first, full):
+            yield small, frame_idx, frame
+        raise SegmentDecoding.SegmentMismatch("forced")
+
+    monkeypatch.setattr(SegmentDecoding, "iter_segments", mismatching_segments)
+    with FrameSpill() as spill:
+        frames, _ = iter_video(clip, interval_sec, mode="seek", workers=2, spill=spill)
+        records = list(frames)
+
+        assert [frame_idx for _, frame_idx in records] == [frame_idx for _, frame_idx in expected]
+        assert len(spill) == len(expected)
+        full = spill.load([frame_idx for _, frame_idx in expected])
+        # The 4 frames of the parallel pass are spilled as BGR, the rest once each in their YUV 4:2:0 layout
+        bgr = full[0].size
+        assert spill.bytes == 4 * bgr + (len(expected) - 4) * bgr // 2
+        for frame, (reference, _) in zip(full, expected):
+            np.testing.assert_array_equal(frame, reference)
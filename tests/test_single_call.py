@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+from langchain_core.messages import AIMessage
+
+import llm.model
+from benchmarks.fake_llm import FakeChatModel
+from FrameProcessor.processor.single_frame import process_single_frame
+from FrameProcessor.utils.image_utils import FrameImage
+
+def _frame(name="frame.jpg"):
+    rng = np.random.default_rng(0)
+    return FrameImage(rng.integers(0, 256, size=(48, 64, 3), dtype=np.uint8), name=name)
+
+class FreeTextModel(FakeChatModel):
+    """Answers the classify-and-describe prompt in prose instead of JSON."""
+
+    def _answer(self, messages):
+        if "visual_description" in messages[0].content:
+            return AIMessage(content="This frame is important: it shows a chart.")
+        return super()._answer(messages)
+
+@pytest.mark.parametrize("important_rate", [0.0, 1.0])
+def test_single_call_output_has_the_two_call_shape(monkeypatch, important_rate):
+    two_calls = FakeChatModel(latency=0, jitter=0, important_rate=important_rate)
+    monkeypatch.setattr(llm.model, "model", two_calls)
+    expected = process_single_frame(_frame())
+
+    single = FakeChatModel(latency=0, jitter=0, important_rate=important_rate)
+    monkeypatch.setattr(llm.model, "model", single)
+    result = process_single_frame(_frame(), single_call=True)
+
+    assert single.calls == 1
+    assert two_calls.calls == (2 if important_rate else 1)
+    assert set(result) == set(expected)
+    assert result["frame"] == "frame.jpg" and result["importance"] == expected["importance"]
+    if important_rate:
+        assert set(result["description"]) == set(expected["description"])
+        assert result["description"]["image_name"] == "frame.jpg"
+        assert result["description"]["extracted_text"] == "Slide text"
+        assert result["description"]["visual_description"] == "Bar chart"
+
+def test_answers_without_json_are_described_separately(monkeypatch):
+    model = FreeTextModel(latency=0, jitter=0, important_rate=1.0)
+    monkeypatch.setattr(llm.model, "model", model)
+
+    result = process_single_frame(_frame(), single_call=True)
+
+    assert model.calls == 2
+    assert result["importance"] == "important"
+    assert result["description"]["extracted_text"] == "Slide text"
@@ -0,0 +1,62 @@
+import cv2
+import numpy as np
+import pytest
+from KeyFrameSelection.FeatureStore import FeatureStore
+from KeyFrameSelection.StructuralSimilarity import SsimStats, SsimWindow
+import KeyFrameSelection.Similarties as Similarties
+
+structural_similarity = pytest.importorskip("skimage.metrics").structural_similarity
+
+def _thumbnails(count, seed=0):
+    """128x128 grayscale thumbnails: smooth gradients with noise, plus a flat and a near-copy thumbnail."""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:128, 0:128]
+    thumbs = []
+    for _ in range(count):
+        a, b, c = rng.uniform(-1, 1, size=3)
+        base = 128 + 60 * np.sin(a * x / 10 + b * y / 13 + c)
+        thumbs.append(np.clip(base + rng.normal(0, 20, size=base.shape), 0, 255).astype(np.uint8))
+    thumbs.append(np.full((128, 128), 200, dtype=np.uint8))
+    thumbs.append(np.clip(thumbs[0].astype(int) + rng.integers(-3, 4, size=(128, 128)), 0, 255).astype(np.uint8))
+    return thumbs
+
+def test_window_scores_match_skimage():
+    thumbs = _thumbnails(6)
+    window = SsimWindow(len(thumbs))
+    for candidate in thumbs:
+        expected = [structural_similarity(previous, candidate) for previous in thumbs[:len(window)]]
+        np.testing.assert_allclose(window.scores(SsimStats(candidate)), expected, rtol=0, atol=1e-9)
+        window.append(SsimStats(candidate))
+
+def test_window_keeps_most_recent():
+    thumbs = _thumbnails(5, seed=1)
+    window = SsimWindow(2)
+    for thumb in thumbs[:4]:
+        window.append(SsimStats(thumb))
+    expected = [structural_similarity(previous, thumbs[4]) for previous in thumbs[2:4]]
+    np.testing.assert_allclose(window.scores(SsimStats(thumbs[4])), expected, rtol=0, atol=1e-9)
+
+@pytest.mark.parametrize("size", [0, -1])
+def test_window_without_size_keeps_everything(size):
+    thumbs = _thumbnails(5, seed=2)
+    window = SsimWindow(size)
+    for thumb in thumbs[:-1]:
+        window.append(SsimStats(thumb))
+    assert len(window) == len(thumbs) - 1
+    expected = [structural_similarity(previous, thumbs[-1]) for previous in thumbs[:-1]]
+    np.testing.assert_allclose(window.scores(SsimStats(thumbs[-1])), expected, rtol=0, atol=1e-9)
+
+def test_ssim_stats_are_memoized_per_store(monkeypatch):
+    built = []
+    def counting_stats(gray):
+        built.append(gray)
+        return SsimStats(gray)
+    monkeypatch.setattr(Similarties, "SsimStats", counting_stats)
+
+    records = [(cv2.cvtColor(thumb, cv2.COLOR_GRAY2BGR), frame_idx) for frame_idx, thumb in enumerate(_thumbnails(8, seed=2))]
+    store = FeatureStore()
+    Similarties.hash_filter(records, hash_threshold=0, ssim_threshold=0.9, store=store)
+    first = len(built)
+    Similarties.hash_filter(records, hash_threshold=0, ssim_threshold=0.5, store=store)
+    assert first > 0
+    assert len(built) == first
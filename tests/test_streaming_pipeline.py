@@ -0,0 +1,77 @@
+import cv2
+import numpy as np
+import pytest
+from benchmarks.synthetic_videos import make_video
+from KeyFrameSelection.FeatureExtraction import iter_video, process_video
+from KeyFrameSelection.Pipeline import stream_keyframes
+from KeyFrameSelection.Similarties import clip_filter, clip_filter_stream, hash_filter, hash_filter_stream
+from tracing import tracer
+
+class ThumbnailEmbedder:
+    """Stand-in for CLIP that embeds a frame as its 8x8 color thumbnail."""
+    name = "thumbnail"
+
+    def embed(self, frames):
+        return np.stack([cv2.resize(frame, (8, 8), interpolation=cv2.INTER_AREA).astype(np.float32).ravel() - 128
+                         for frame in frames])
+
+@pytest.fixture(scope="module")
+def video(tmp_path_factory):
+    return make_video(str(tmp_path_factory.mktemp("video") / "slides.mp4"), "repeats", duration_sec=40,
+                      resolution=(160, 90), slide_sec=3)
+
+def test_stream_selects_the_same_keyframes_as_the_batch_filters(video):
+    records, fps = process_video(video, interval_sec=1)
+    expected = clip_filter(hash_filter(records, hash_threshold=5, ssim_threshold=0.9, ssim_compare_window=3),
+                           similarity_threshold=0.9, compare_window=5, embedder=ThumbnailEmbedder())
+
+    streamed, stream_fps = stream_keyframes(video, interval_sec=1, max_in_flight=4, hash_threshold=5, ssim_threshold=0.9,
+                                            ssim_compare_window=3, clip_threshold=0.9, clip_compare_window=5,
+                                            embedder=ThumbnailEmbedder())
+
+    assert stream_fps == fps
+    assert 1 < len(streamed) < len(records)
+    assert [frame_idx for _, frame_idx in streamed] == [frame_idx for _, frame_idx in expected]
+    for (frame, _), (expected_frame, _) in zip(streamed, expected):
+        np.testing.assert_array_equal(frame, expected_frame)
+
+@pytest.mark.parametrize("stage", ["hash", "clip"])
+def test_stages_read_at_most_one_chunk_ahead(video, stage):
+    max_in_flight = 4
+    frames, _ = iter_video(video, interval_sec=0.5)
+    positions, pulled = {}, []
+
+    def counted():
+        for frame, frame_idx in frames:
+            positions[frame_idx] = len(pulled)
+            pulled.append(frame_idx)
+            yield frame, frame_idx
+
+    if stage == "hash":
+        distinct = hash_filter_stream(counted(), max_in_flight=max_in_flight)
+    else:
+        distinct = clip_filter_stream(counted(), similarity_threshold=0.9, batch_size=max_in_flight,
+                                      embedder=ThumbnailEmbedder())
+
+    emitted = 0
+    for _, frame_idx in distinct:
+        emitted += 1
+        assert len(pulled) - positions[frame_idx] <= max_in_flight
+    assert emitted > 1
+
+def test_stream_filters_are_traced_per_chunk(video):
+    records, _ = process_video(video, interval_sec=1)
+    tracer.configure()
+    try:
+        streamed, _ = stream_keyframes(video, interval_sec=1, max_in_flight=4, embedder=ThumbnailEmbedder())
+        rows = {row["name"]: row for row in tracer.get_tracer().summary()}
+        events = tracer.get_tracer()._events
+    finally:
+        tracer.configure(enabled=False)
+
+    hashed, clipped = rows["hash_filter_stream"], rows["clip_filter_stream"]
+    assert hashed["frames_in"] == len(records)
+    assert clipped["frames_in"] == hashed["frames_out"]
+    assert clipped["frames_out"] == len(streamed)
+    # Spans close before frames are handed on, so neither stage is nested in the other
+    assert all(event["parent"] is None for event in events if event["name"].endswith("_filter_stream"))
@@ -0,0 +1,148 @@
+import json
+import time
+import threading
+import functools
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Callable
+import numpy as np
+
+class Tracer:
+    """Records timed spans of pipeline stages and LLM requests.
+
+    Every span becomes one JSON line in `path` (if given) with its name, the enclosing span on
+    the same thread ("parent"), start offset and duration in seconds, and any counters the
+    stage attached (frames, bytes, tokens, retries). `summary` aggregates them per name.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._file = open(path, "w", encoding="utf-8") if path else None
+        self._events = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._origin = time.perf_counter()
+
+    def _stack(self) -> List[str]:
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextmanager
+    def span(self, name: str, **fields):
+        """Time the enclosed block; the yielded dict takes counters to record with the span."""
+        stack = self._stack()
+        event = {"name": name, "parent": stack[-1] if stack else None, **fields}
+        stack.append(name)
+        start = time.perf_counter()
+        try:
+            yield event
+        except Exception as e:
+            event["error"] = type(e).__name__
+            raise
+        finally:
+            stack.pop()
+            event["start"] = round(start - self._origin, 6)
+            event["seconds"] = time.perf_counter() - start
+            event["thread"] = threading.current_thread().name
+            with self._lock:
+                self._events.append(event)
+                if self._file is not None:
+                    self._file.write(json.dumps(event, default=str) + "\n")
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """Aggregate spans per name; LLM requests are grouped by the stage that sent them."""
+        groups = {}
+        with self._lock:
+            events = list(self._events)
+        for event in events:
+            key = f"llm <- {event['parent']}" if event["name"] == "llm" and event["parent"] else event["name"]
+            groups.setdefault(key, []).append(event)
+
+        rows = []
+        for key, group in groups.items():
+            seconds = np.array([event["seconds"] for event in group])
+            counters = {}
+            for event in group:
+                for field, value in event.items():
+                    if field not in ("start", "seconds") and isinstance(value, (int, float)):
+                        counters[field] = counters.get(field, 0) + value
+            rows.append({
+                "name": key,
+                "calls": len(group),
+                "total_s": float(seconds.sum()),
+                "mean_ms": float(seconds.mean() * 1000),
+                "p95_ms": float(np.percentile(seconds, 95) * 1000),
+                "errors": sum("error" in event for event in group),
+                **counters,
+            })
+        return sorted(rows, key=lambda row: -row["total_s"])
+
+    def print_summary(self):
+        rows = self.summary()
+        if not rows:
+            return
+        print(f"\n{'stage':<36}{'calls':>7}{'total s':>10}{'mean ms':>10}{'p95 ms':>10}  counters")
+        for row in rows:
+            counters = ", ".join(
+                f"{field}={value:g}" for field, value in row.items()
+                if field not in ("name", "calls", "total_s", "mean_ms", "p95_ms") and value
+            )
+            print(f"{row['name']:<36}{row['calls']:>7}{row['total_s']:>10.2f}{row['mean_ms']:>10.1f}{row['p95_ms']:>10.1f}  {counters}")
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+_tracer = None
+
+def configure(path: Optional[str] = None, enabled: bool = True) -> Optional[Tracer]:
+    """Start recording spans (to a JSONL file if `path` is given), or stop with `enabled=False`."""
+    global _tracer
+    if _tracer is not None:
+        _tracer.close()
+    _tracer = Tracer(path) if enabled else None
+    return _tracer
+
+def get_tracer() -> Optional[Tracer]:
+    """Return the active tracer, or None when tracing is off."""
+    return _tracer
+
+@contextmanager
+def _no_span():
+    yield None
+
+def span(name: str, **fields):
+    """Time a block if tracing is on; yields the span's counter dict, or None when tracing is off."""
+    return _tracer.span(name, **fields) if _tracer is not None else _no_span()
+
+def traced(name: Optional[str] = None, counts: Optional[Callable] = None):
+    """Decorator recording each call of a function as a span.
+
+    `counts(args, kwargs, result)` returns counters to attach, e.g. frames in and out. When
+    tracing is off, the wrapper only checks a global and calls the function.
+    """
+    def decorate(fn):
+        span_name = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _tracer is None:
+                return fn(*args, **kwargs)
+            with _tracer.span(span_name) as event:
+                result = fn(*args, **kwargs)
+                if counts is not None:
+                    event.update(counts(args, kwargs, result))
+                return result
+
+        return wrapper
+    return decorate
+
+def one_frame(args, kwargs, result) -> Dict[str, int]:
+    """Counters of a step that handles a single frame."""
+    return {"frames": 1}
+
+def frames_in_out(args, kwargs, result) -> Dict[str, int]:
+    """Counters of a filter taking a list of records and returning the kept ones."""
+    return {"frames_in": len(args[0] if args else kwargs.get("records", [])), "frames_out": len(result)}